@@ -0,0 +1,339 @@
+'''
+Asyncio version of the SkyX transport and of the mount and camera helpers.
+
+Everything here is a coroutine, so one event loop can keep an eye on the mount,
+the camera and the guider at the same time, for example:
+
+    ra_dec_az_alt, cam_status, guide_error = await asyncio.gather(
+        getPosition(), getCameraStatus(), getGuiderError())
+
+Packets and replies are exactly the ones PySkyX_ks uses.
+'''
+import asyncio
+import time
+
+import PySkyX_ks
+from PySkyX_ks import _TSXPacket, _TSXVerbose, _TSXParseReply, _TSXReplyComplete, _TSXSplitHost, \
+    _TSXRemoteEncoding, _TSXBatchScript, _TSXBatchResults, _TSXUnparkIfParked, _TSXRetryDelay, timeStamp, \
+    TSXBreaker, TSXConnectionError, TSXCircuitOpenError, TSXTimeoutError
+
+TSXTimeout = 10.0  # Default deadline of a single request, [s]
+
+
+class TSXAsyncConnectionPool:
+    '''
+    Keep-alive StreamReader/StreamWriter pairs per (host, port).
+
+    A connection serves one request at a time; concurrent requests to the same host
+    open extra connections, which are kept for reuse afterwards (up to maxIdle).
+    '''
+    def __init__(self, maxIdle=4):
+        self.maxIdle = maxIdle
+        self._idle = {}
+
+    async def checkout(self, host, port, timeout):
+        '''
+        Return (reader, writer, reused), opening a new connection if no idle one is left.
+        '''
+        idle = self._idle.get((host, port))
+        while idle:
+            reader, writer = idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer, True
+            writer.close()
+
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port),
+                                                    min(timeout, PySkyX_ks.TSXConnectTimeout))
+        except (OSError, asyncio.TimeoutError) as error:
+            raise TSXConnectionError("Unable to establish a connection to " + host + ":" + str(port)
+                                     + ". Is SkyX running? Is the TCP Server Listening? (" + repr(error) + ")") \
+                from error
+        return reader, writer, False
+
+    def checkin(self, host, port, reader, writer):
+        idle = self._idle.setdefault((host, port), [])
+        if len(idle) < self.maxIdle:
+            idle.append((reader, writer))
+        else:
+            writer.close()
+
+    async def close(self):
+        '''
+        Close every idle connection.
+        '''
+        for idle in self._idle.values():
+            for _, writer in idle:
+                writer.close()
+                try:
+                    await writer.wait_closed()
+                except OSError:
+                    pass
+        self._idle = {}
+
+    async def exchange(self, host, port, fullMessage, timeout):
+        '''
+        Send one packet and return the raw reply bytes, within timeout seconds.
+        Raises TSXConnectionError or TSXTimeoutError, like the blocking pool.
+        '''
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            reader, writer, reused = await self.checkout(host, port, max(deadline - loop.time(), 0.001))
+            try:
+                writer.write(fullMessage)
+                await asyncio.wait_for(writer.drain(), deadline - loop.time())
+            except asyncio.TimeoutError as error:
+                writer.close()
+                raise TSXTimeoutError("Unable to send to " + host + ":" + str(port) + " within "
+                                      + str(timeout) + " s.") from error
+            except OSError as error:
+                # Nothing ran, SkyX only runs whole packets: sent again over a new connection.
+                writer.close()
+                if reused:
+                    continue
+                raise TSXConnectionError("Connection to " + host + ":" + str(port) + " lost: " + str(error)) \
+                    from error
+
+            # Once sent, SkyX may have run the command: it is never sent again.
+            try:
+                data = await asyncio.wait_for(_TSXReceive(reader), deadline - loop.time())
+            except asyncio.TimeoutError as error:
+                # A late reply would be read as the answer to the next request.
+                writer.close()
+                raise TSXTimeoutError("No reply from " + host + ":" + str(port) + " within "
+                                      + str(timeout) + " s.") from error
+            except OSError as error:
+                writer.close()
+                raise TSXConnectionError("Connection to " + host + ":" + str(port) + " lost: " + str(error),
+                                         sent=True) from error
+
+            if not data:
+                writer.close()
+                raise TSXConnectionError("SkyX closed the connection without replying.", sent=True)
+
+            self.checkin(host, port, reader, writer)
+            return data
+
+
+TSXTransport = TSXAsyncConnectionPool()  # Shared by all the coroutines below
+
+
+async def _TSXReceive(reader):
+    '''
+    Read until the end-of-reply marker or until the server closes the connection.
+    The reply is collected in one growing bytearray and decoded once by the caller.
+    '''
+    data = bytearray()
+    while True:
+        chunk = await reader.read(65536)
+        if not chunk:
+            return bytes(data)
+        data += chunk
+        if _TSXReplyComplete(data, len(data)):
+            return bytes(data)
+
+
+async def _TSXRoundTrip(host, port, message, encoding, timeout):
+    fullMessage = _TSXPacket(message).encode()
+
+    if timeout is None:
+        timeout = TSXTimeout
+    breaker = TSXBreaker(host, port)
+
+    # Same retry rules as PySkyX_ks._TSXRoundTrip: only undelivered commands are sent again.
+    start = time.perf_counter()
+    attempt = 0
+    while True:
+        probe = False
+        try:
+            probe = breaker.allow(host + ":" + str(port))
+            data = await TSXTransport.exchange(host, port, fullMessage, timeout)
+            break
+        except TSXConnectionError as error:
+            if not isinstance(error, TSXCircuitOpenError):
+                breaker.failure()
+            if error.sent or attempt >= PySkyX_ks.TSXRetries:
+                PySkyX_ks.TSXStats.record(message, host, time.perf_counter() - start, len(fullMessage), 0, True)
+                raise
+        except TSXTimeoutError:
+            breaker.failure()
+            PySkyX_ks.TSXStats.record(message, host, time.perf_counter() - start, len(fullMessage), 0, True)
+            raise
+        except BaseException:
+            # Cancelled or interrupted: another probe may go
+            if probe:
+                breaker.release()
+            PySkyX_ks.TSXStats.record(message, host, time.perf_counter() - start, len(fullMessage), 0, True)
+            raise
+
+        await asyncio.sleep(_TSXRetryDelay(attempt))
+        attempt += 1
+
+    if breaker.success():
+        PySkyX_ks.TSXCache.invalidate(host + ":" + str(port))
+
+    newData = data.decode(encoding)
+
+    PySkyX_ks.TSXStats.record(message, host, time.perf_counter() - start, len(fullMessage), len(data),
+                              "No error." not in newData.rpartition("|")[2])
+
+    if PySkyX_ks.verbose:
+        _TSXVerbose(fullMessage.decode(), newData)
+
+    return _TSXParseReply(newData)
+
+
+async def TSXSend(message, timeout=None):
+    '''
+    Async counterpart of PySkyX_ks.TSXSend, sends to PySkyX_ks.TSXHost:TSXPort.
+    Raises TSXTimeoutError if SkyX does not answer within timeout seconds.
+    '''
+    return await _TSXRoundTrip(PySkyX_ks.TSXHost, PySkyX_ks.TSXPort, message, "latin-1", timeout)
+
+
+async def TSXSendRemote(host, message, timeout=None):
+    '''
+    Async counterpart of PySkyX_ks.TSXSendRemote, host is "XXX.XXX.XXX.XXX:YYYY".
+    '''
+    remoteHost, remotePort = _TSXSplitHost(host)
+    return await _TSXRoundTrip(remoteHost, remotePort, message, _TSXRemoteEncoding, timeout)
+
+
+async def TSXSendBatch(expressions, timeout=None):
+    '''
+    Async counterpart of PySkyX_ks.TSXSendBatch.
+    '''
+    return _TSXBatchResults(expressions, await TSXSend(_TSXBatchScript(expressions), timeout))
+
+
+async def TSXSendBatchRemote(host, expressions, timeout=None):
+    '''
+    Async counterpart of PySkyX_ks.TSXSendBatchRemote.
+    '''
+    return _TSXBatchResults(expressions, await TSXSendRemote(host, _TSXBatchScript(expressions), timeout))
+
+
+#--------------## Mount ##-------------
+async def getPosition():
+    '''
+    Return [RA, Dec, Az, Alt] of the mount.
+    '''
+    _, mntAz, mntAlt, _, mntRa, mntDec = await TSXSendBatch([
+        "sky6RASCOMTele.GetAzAlt()",
+        "sky6RASCOMTele.dAz",
+        "sky6RASCOMTele.dAlt",
+        "sky6RASCOMTele.GetRaDec()",
+        "sky6RASCOMTele.dRa",
+        "sky6RASCOMTele.dDec",
+    ])
+    return [round(float(mntRa), 6), round(float(mntDec), 6), round(float(mntAz), 6), round(float(mntAlt), 6)]
+
+
+async def setTrackingRate(rate=('0', '0'), switch=True):
+    '''
+    Same arguments as PySkyX_ks.setTrackingRate: rate = (dDec, dRa) in arcseconds/second.
+    '''
+    dDec = rate[0]
+    dRa = rate[1]
+
+    if not switch:  # Turn off tracking
+        await TSXSend("sky6RASCOMTele.SetTracking(1, 1, 0 ,0)")
+        return
+
+    unparked, _, _, _, dDec, dRa = await TSXSendBatch([
+        _TSXUnparkIfParked,
+        "sky6RASCOMTele.SetTracking(1, 1, 0 ,0)",
+        "sky6RASCOMTele.Asynchronous = true",
+        'sky6RASCOMTele.SetTracking(1, 0,' + dRa + ',' + dDec + ')',
+        "sky6RASCOMTele.dDecTrackingRate",
+        "sky6RASCOMTele.dRaTrackingRate",
+    ])
+    if unparked == "true":
+        print("     NOTE: Unparking mount.")
+
+    return round(float(dRa), 4), round(float(dDec), 4)
+
+
+async def isSlewComplete():
+    return await TSXSend("sky6RASCOMTele.IsSlewComplete") != "0"
+
+
+async def slewToCoords(coords, name, poll=0.5, timeout=1200):
+    '''
+    Slew to (RA, Dec) and return the mount [Az, Alt] once the slew is complete.
+    The wait yields to the event loop instead of blocking it.
+    '''
+    ra = coords[0]
+    dec = coords[1]
+
+    unparked, _, _, _ = await TSXSendBatch([
+        _TSXUnparkIfParked,
+        "sky6RASCOMTele.SetTracking(1, 1, 0 ,0)",
+        "sky6RASCOMTele.Asynchronous = true",
+        'sky6RASCOMTele.SlewToRaDec(' + ra + ', ' + dec + ', "' + name + '")',
+    ])
+    if unparked == "true":
+        print("     NOTE: Unparking mount.")
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not await isSlewComplete():
+        if loop.time() > deadline:
+            raise TSXTimeoutError("Mount appears stuck")
+        await asyncio.sleep(poll)
+
+    _, _, mntAz, mntAlt = await TSXSendBatch([
+        "sky6RASCOMTele.Asynchronous = false",
+        "sky6RASCOMTele.GetAzAlt()",
+        "sky6RASCOMTele.dAz",
+        "sky6RASCOMTele.dAlt",
+    ])
+    return [round(float(mntAz), 2), round(float(mntAlt), 2)]
+
+
+#--------------## Camera ##-------------
+async def getCameraStatus():
+    return await TSXSend("ccdsoftCamera.Status")
+
+
+async def getGuiderError():
+    '''
+    Return the (X, Y) guide error in guider pixels.
+    '''
+    errorX, errorY = await TSXSendBatch(["ccdsoftAutoguider.GuideErrorX", "ccdsoftAutoguider.GuideErrorY"])
+    return round(float(errorX), 2), round(float(errorY), 2)
+
+
+async def takeImage(exposure, poll=0.25):
+    '''
+    Expose the imaging camera for exposure seconds without blocking the loop.
+    Return the image path, or None if the camera reported an error.
+    '''
+    camMesg = (await TSXSendBatch([
+        "ccdsoftCamera.Asynchronous = true",
+        "ccdsoftCamera.ExposureTime = " + str(exposure),
+        "ccdsoftCamera.TakeImage()",
+    ]))[-1]
+    if camMesg != "0":
+        timeStamp("Error: " + camMesg)
+        return None
+
+    await asyncio.sleep(float(exposure))
+    while await TSXSend("ccdsoftCamera.IsExposureComplete") not in ("1", "true"):
+        await asyncio.sleep(poll)
+
+    _, _, imagePath = await TSXSendBatch([
+        "ccdsoftCamera.Asynchronous = false",
+        "ccdsoftCameraImage.AttachToActiveImager()",
+        "ccdsoftCameraImage.Path",
+    ])
+    timeStamp("Image completed: " + imagePath.split("/")[-1])
+    return imagePath
+
+
+async def getTelemetry():
+    '''
+    Mount position, camera status and guide error, polled concurrently.
+    '''
+    return await asyncio.gather(getPosition(), getCameraStatus(), getGuiderError())
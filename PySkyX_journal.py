@@ -0,0 +1,312 @@
+'''
+Record the TheSkyX traffic of a session and replay it offline.
+
+Recording wraps the transport used by TSXSend/TSXSendRemote, so nothing else
+changes:
+
+    startJournal("night.tsxj")     # before TelestoClass.start()
+    ...
+    stopJournal()
+
+Replaying puts a transport in its place that answers from the journal, so
+TelestoClass and PySkyX_ks run without the telescope:
+
+    startReplay("night.tsxj", speed=10)    # the recorded timeline 10x faster
+
+With a speed, the replay keeps to the recorded timeline, gaps between exchanges
+included, divided by speed: no reply comes before its recorded time. The
+waits of the client itself (time.sleep, the wait for a pass) still take real
+time, only the time spent on SkyX is shortened.
+
+Journal format (append-only, little endian):
+
+    header   b"TSXJ\\x01" + wall-clock start time (double)
+    b"H"     host definition    : id (uint16), length (uint16), "host:port"
+    b"Q"     request definition : id (uint32), length (uint32), packet bytes
+    b"X"     exchange           : t (double, monotonic seconds since start), duration (float),
+                                  host id (uint16), request id (uint32), length (uint32), reply bytes
+    b"E"     failed exchange    : t, duration, host id, request id, length (uint16), exception name
+
+Hosts and requests are written once and referred to by id afterwards, so the
+hundreds of identical property reads of a pass cost a few bytes each.
+'''
+import builtins
+import collections
+import struct
+import sys
+import threading
+import time
+
+import PySkyX_ks
+from PySkyX_ks import _TSXCommandKey
+
+MAGIC = b"TSXJ\x01"
+
+_HEADER = struct.Struct("<d")
+_HOST = struct.Struct("<HH")
+_REQUEST = struct.Struct("<II")
+_EXCHANGE = struct.Struct("<dfHII")
+_FAILURE = struct.Struct("<dfHIH")
+
+
+class TSXReplayMismatch(LookupError):
+    '''
+    Raised by a strict replay when a request has no recorded counterpart.
+    '''
+
+
+class TSXJournalRecorder:
+    '''
+    Transport wrapper that writes every exchange of the wrapped transport to a journal.
+    '''
+    def __init__(self, transport, path):
+        self.transport = transport
+        self.path = path
+        self._file = open(path, "ab")
+        self._lock = threading.Lock()
+        self._hosts = {}
+        self._requests = {}
+        self._start = time.monotonic()
+        # Every recording starts a new segment, so ids and clock restart when appending
+        self._file.write(MAGIC + _HEADER.pack(time.time()))
+
+    def exchange(self, host, port, fullMessage, timeout=None):
+        start = time.monotonic()
+        try:
+            data = self.transport.exchange(host, port, fullMessage, timeout)
+        except Exception as error:
+            self._write_failure(host, port, fullMessage, start, error)
+            raise
+        self._write_exchange(host, port, fullMessage, start, data)
+        return data
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def _write(self, record):
+        # Called with the lock held. An exchange that ends after stopJournal is not written.
+        if not self._file.closed:
+            self._file.write(record)
+            self._file.flush()
+
+    def _ids(self, host, port, fullMessage):
+        '''
+        Ids of the host and of the request, defining them in the journal the first time.
+        '''
+        hostKey = host + ":" + str(port)
+        hostId = self._hosts.get(hostKey)
+        if hostId is None:
+            hostId = self._hosts[hostKey] = len(self._hosts)
+            encoded = hostKey.encode()
+            self._file.write(b"H" + _HOST.pack(hostId, len(encoded)) + encoded)
+
+        requestId = self._requests.get(fullMessage)
+        if requestId is None:
+            requestId = self._requests[fullMessage] = len(self._requests)
+            self._file.write(b"Q" + _REQUEST.pack(requestId, len(fullMessage)) + fullMessage)
+
+        return hostId, requestId
+
+    def _write_exchange(self, host, port, fullMessage, start, data):
+        duration = time.monotonic() - start
+        with self._lock:
+            if self._file.closed:
+                return
+            hostId, requestId = self._ids(host, port, fullMessage)
+            self._write(b"X" + _EXCHANGE.pack(start - self._start, duration, hostId, requestId, len(data)) + data)
+
+    def _write_failure(self, host, port, fullMessage, start, error):
+        duration = time.monotonic() - start
+        name = type(error).__name__.encode()
+        with self._lock:
+            if self._file.closed:
+                return
+            hostId, requestId = self._ids(host, port, fullMessage)
+            self._write(b"E" + _FAILURE.pack(start - self._start, duration, hostId, requestId, len(name)) + name)
+
+
+def readJournal(path):
+    '''
+    Return the recorded exchanges as a list of
+    (t, duration, "host:port", request bytes, reply bytes or None, exception name or None).
+    '''
+    records = []
+    with open(path, "rb") as journal:
+        content = journal.read()
+
+    position = 0
+    hosts = {}
+    requests = {}
+    offset = 0.0
+    lastTime = 0.0
+    while position < len(content):
+        if content.startswith(MAGIC, position):
+            # New segment: its clock starts after the previous one
+            position += len(MAGIC) + _HEADER.size
+            hosts = {}
+            requests = {}
+            offset = lastTime
+            continue
+
+        kind = content[position:position + 1]
+        position += 1
+        if kind == b"H":
+            hostId, length = _HOST.unpack_from(content, position)
+            position += _HOST.size
+            hosts[hostId] = content[position:position + length].decode()
+            position += length
+        elif kind == b"Q":
+            requestId, length = _REQUEST.unpack_from(content, position)
+            position += _REQUEST.size
+            requests[requestId] = content[position:position + length]
+            position += length
+        elif kind == b"X":
+            t, duration, hostId, requestId, length = _EXCHANGE.unpack_from(content, position)
+            position += _EXCHANGE.size
+            lastTime = offset + t
+            records.append((lastTime, duration, hosts[hostId], requests[requestId],
+                            content[position:position + length], None))
+            position += length
+        elif kind == b"E":
+            t, duration, hostId, requestId, length = _FAILURE.unpack_from(content, position)
+            position += _FAILURE.size
+            lastTime = offset + t
+            records.append((lastTime, duration, hosts[hostId], requests[requestId],
+                            None, content[position:position + length].decode()))
+            position += length
+        else:
+            # Truncated last record of a session that was killed
+            break
+
+    return records
+
+
+def _scriptOf(fullMessage):
+    '''
+    The script inside a packet, used to match requests by command when the exact text differs.
+    '''
+    script = fullMessage.decode("latin-1")
+    return script.split("/* Socket Start Packet */", 1)[-1].split("/* Socket End Packet */", 1)[0].strip()
+
+
+class TSXReplayTransport:
+    '''
+    Transport that answers from a journal instead of talking to SkyX.
+
+    A request gets the reply recorded for the same host and packet, in recording order.
+    Requests whose text changed (for example tracking rates computed from the current time)
+    fall back to the next recorded request with the same object.method. With strict=False
+    an unknown request gets an error reply instead of raising TSXReplayMismatch.
+
+    speed scales the recorded timeline: the reply to an exchange recorded t seconds after
+    the first one served, taking duration seconds, is not given before
+    (t + duration) / speed seconds into the replay. 1 replays in real time, 10 ten times
+    faster, None answers immediately.
+    '''
+    def __init__(self, path, speed=None, strict=True):
+        self.speed = speed
+        self.strict = strict
+        self.records = readJournal(path)
+        self._origin = None  # (monotonic time, recorded time) of the first exchange served
+        self._used = [False] * len(self.records)
+        self._byRequest = collections.defaultdict(collections.deque)
+        self._byCommand = collections.defaultdict(collections.deque)
+        self._lock = threading.Lock()
+        for index, record in enumerate(self.records):
+            host, fullMessage = record[2], record[3]
+            self._byRequest[(host, fullMessage)].append(index)
+            self._byCommand[(host, _TSXCommandKey(_scriptOf(fullMessage)))].append(index)
+
+    def _take(self, queue):
+        while queue:
+            index = queue.popleft()
+            if not self._used[index]:
+                self._used[index] = True
+                return index
+        return None
+
+    def exchange(self, host, port, fullMessage, timeout=None):
+        hostKey = host + ":" + str(port)
+        with self._lock:
+            index = self._take(self._byRequest.get((hostKey, fullMessage), collections.deque()))
+            if index is None:
+                command = _TSXCommandKey(_scriptOf(fullMessage))
+                index = self._take(self._byCommand.get((hostKey, command), collections.deque()))
+            if index is not None and self._origin is None:
+                self._origin = (time.monotonic(), self.records[index][0])
+
+        if index is None:
+            if self.strict:
+                raise TSXReplayMismatch("No recorded reply for " + _scriptOf(fullMessage)[:80])
+            return b"|Error: No recorded reply. Error = 1."
+
+        t, duration, _, _, reply, failure = self.records[index]
+        if self.speed:
+            due = self._origin[0] + (t - self._origin[1] + duration) / self.speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        if failure is not None:
+            raise _exception(failure)
+        return reply
+
+    def remaining(self):
+        '''
+        Number of recorded exchanges not served yet.
+        '''
+        return self._used.count(False)
+
+    def close(self):
+        pass
+
+
+def _exception(name):
+    '''
+    Rebuild a recorded exception, as a builtin or PySkyX_ks exception when the name is known.
+    '''
+    errorType = getattr(PySkyX_ks, name, None) or getattr(builtins, name, None)
+    if isinstance(errorType, type) and issubclass(errorType, BaseException):
+        return errorType("Replayed " + name)
+    return OSError("Replayed " + name)
+
+
+def startJournal(path):
+    '''
+    Start recording all TSXSend/TSXSendRemote traffic to path.
+    '''
+    PySkyX_ks.TSXTransport = TSXJournalRecorder(PySkyX_ks.TSXTransport, path)
+    return PySkyX_ks.TSXTransport
+
+
+def stopJournal():
+    '''
+    Stop recording and put the wrapped transport back.
+    '''
+    recorder = PySkyX_ks.TSXTransport
+    if isinstance(recorder, TSXJournalRecorder):
+        # Under the recorder lock no exchange is half written when the file closes
+        with recorder._lock:
+            PySkyX_ks.TSXTransport = recorder.transport
+            recorder._file.close()
+
+
+def startReplay(path, speed=None, strict=True):
+    '''
+    Serve all TSXSend/TSXSendRemote traffic from a journal. Returns the replay transport.
+    '''
+    PySkyX_ks.TSXTransport = TSXReplayTransport(path, speed, strict)
+    return PySkyX_ks.TSXTransport
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage : python PySkyX_journal.py journal.tsxj")
+        sys.exit(1)
+
+    records = readJournal(sys.argv[1])
+    print(str(len(records)) + " exchanges")
+    counts = collections.Counter((record[2], _TSXCommandKey(_scriptOf(record[3]))) for record in records)
+    for (host, command), count in counts.most_common():
+        print("%-22s %-50s %6d" % (host, command[:50], count))
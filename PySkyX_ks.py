@@ -23,8 +23,48 @@ import os
 import random
 import math
 import pathlib
+import collections
+import json
+import re
+import select
+import threading
+import concurrent.futures
+import itertools
+import queue
 
 ################# Extension ###################
+# Unparks the mount if needed, returns "true" when it had to.
+_TSXUnparkIfParked = "(sky6RASCOMTele.IsParked() ? (sky6RASCOMTele.Unpark(), true) : false)"
+
+
+def _TSXWaitForSlew(host=None, timeout=1200):
+    #
+    # Waits inside SkyX for the slew in progress (see TSXWaitUntil), so that we carry on
+    # as soon as the mount arrives instead of at the next 10 second poll. After timeout
+    # seconds (the old 120 polls) the mount is considered stuck: it is stopped and the
+    # TSXTimeoutError raised to the caller. Remote slews wait as long as it takes, as
+    # they always did.
+    #
+    if host is not None:
+        print("     NOTE: Remote slew in progress.")
+        TSXWaitUntil("sky6RASCOMTele.IsSlewComplete != 0", host=host)
+        return
+
+    print("     NOTE: Slew in progress.")
+    try:
+        TSXWaitUntil("sky6RASCOMTele.IsSlewComplete != 0", timeout)
+    except TSXTimeoutError:
+        print("    ERROR: Mount appears stuck!")
+        timeStamp("Sending abort command.")
+        # sky6RASCOMTele.Abort()
+        if TSXSendCached("SelectedHardware.mountModel") != "Telescope Mount Simulator":
+            time.sleep(5)
+            timeStamp("Trying to stop sidereal motor.")
+            TSXSend("sky6RASCOMTele.SetTracking(0, 1, 0 ,0)")
+        timeStamp("Stopping script.")
+        raise
+
+
 def setTrackingRate(rate=['0','0'], switch=True):
     dDec = rate[0]
     dRa = rate[1]
@@ -34,76 +74,81 @@ def setTrackingRate(rate=['0','0'], switch=True):
         return
 
     print("Setting tracking rate to : (dRa)" + dRa + " arcseconds/second, (dDec)" + dDec+ " arcseconds/second")
-    if TSXSend("sky6RASCOMTele.IsParked()") == "true":
+    unparked, _, _, _, dDec, dRa = TSXSendBatch([
+        _TSXUnparkIfParked,
+        "sky6RASCOMTele.SetTracking(1, 1, 0 ,0)",
+        "sky6RASCOMTele.Asynchronous = true",
+        'sky6RASCOMTele.SetTracking(1, 0,' + dRa +',' + dDec + ')',
+        "sky6RASCOMTele.dDecTrackingRate",
+        "sky6RASCOMTele.dRaTrackingRate",
+    ])
+    if unparked == "true":
         print("     NOTE: Unparking mount.")
-        TSXSend("sky6RASCOMTele.Unpark()")
 
-    if str(TSXSend("SelectedHardware.mountModel") != "Telescope Mount Simulator"):
-        TSXSend("sky6RASCOMTele.SetTracking(1, 1, 0 ,0)")
-
-    TSXSend("sky6RASCOMTele.Asynchronous = true")
-    TSXSend('sky6RASCOMTele.SetTracking(1, 0,' + dRa +',' + dDec + ')')
-    dDec = round(float(TSXSend("sky6RASCOMTele.dDecTrackingRate")), 4)
-    dRa = round(float(TSXSend("sky6RASCOMTele.dRaTrackingRate")), 4)
+    dDec = round(float(dDec), 4)
+    dRa = round(float(dRa), 4)
     print("NOTE: Mount currently tracking at: " + str(dRa) + " arcseconds/second for Ra, " + str(dDec) + " arcseconds/second for Dec.")
     return
 
+def updateTrackingRate(rate=['0','0']):
+    #
+    # Changes the rates of a mount already tracking at custom rates (see setTrackingRate)
+    # with a single SetTracking, without going back through sidereal tracking in between.
+    #
+    dDec = rate[0]
+    dRa = rate[1]
+
+    TSXSend('sky6RASCOMTele.SetTracking(1, 0,' + dRa + ',' + dDec + ')')
+    return
+
 def slewToCoordsAzAlt(coords, name):
-    slew_count = 0
     az = coords[0]
     alt = coords[1]
 
     print("Slewing to " + alt + " " + az)
-    if TSXSend("sky6RASCOMTele.IsParked()") == "true":
+    unparked, _, _, _ = TSXSendBatch([
+        _TSXUnparkIfParked,
+        "sky6RASCOMTele.SetTracking(1, 1, 0 ,0)",
+        "sky6RASCOMTele.Asynchronous = true",
+        'sky6RASCOMTele.SlewToAzAlt(' + az + ', ' + alt + ', "' + name + '")',
+    ])
+    if unparked == "true":
         print("     NOTE: Unparking mount.")
-        TSXSend("sky6RASCOMTele.Unpark()")
-
-    if str(TSXSend("SelectedHardware.mountModel") != "Telescope Mount Simulator"):
-        TSXSend("sky6RASCOMTele.SetTracking(1, 1, 0 ,0)")
-
-    TSXSend("sky6RASCOMTele.Asynchronous = true")
-
-    TSXSend('sky6RASCOMTele.SlewToAzAlt(' + az + ', ' + alt + ', "' + name + '")')
 
     time.sleep(0.5)
 
-    while TSXSend("sky6RASCOMTele.IsSlewComplete") == "0":
-        if slew_count > 119:
-            print("    ERROR: Mount appears stuck!")
-            timeStamp("Sending abort command.")
-            # sky6RASCOMTele.Abort()
-            if TSXSend("SelectedHardware.mountModel") != "Telescope Mount Simulator":
-                time.sleep(5)
-                timeStamp("Trying to stop sidereal motor.")
-                TSXSend("sky6RASCOMTele.SetTracking(0, 1, 0 ,0)")
-            timeStamp("Stopping script.")
-            sys.exit()
-        else:
-            print("     NOTE: Slew in progress.")
-            slew_count = slew_count + 1
-            time.sleep(10)
+    _TSXWaitForSlew()
 
-    if "Process aborted." in TSXSend("sky6RASCOMTele.IsSlewComplete"):
+    slewComplete, _, _, mntAz, mntAlt = TSXSendBatch([
+        "sky6RASCOMTele.IsSlewComplete",
+        "sky6RASCOMTele.Asynchronous = false",
+        "sky6RASCOMTele.GetAzAlt()",
+        "sky6RASCOMTele.dAz",
+        "sky6RASCOMTele.dAlt",
+    ])
+    if "Process aborted." in slewComplete:
         timeStamp("Script Aborted.")
-        sys.exit()
-    TSXSend("sky6RASCOMTele.Asynchronous = false")
+        raise TSXAbortedError("Script aborted in SkyX.")
     print("Completed slew")
 
-    TSXSend("sky6RASCOMTele.GetAzAlt()")
-    mntAz = round(float(TSXSend("sky6RASCOMTele.dAz")), 2)
-    mntAlt = round(float(TSXSend("sky6RASCOMTele.dAlt")), 2)
+    mntAz = round(float(mntAz), 2)
+    mntAlt = round(float(mntAlt), 2)
     print("NOTE: Mount currently at: " + str(mntAz) + " az., " + str(mntAlt) + " alt.")
 
 def getPosition():
-    # Get Alt,Az
-    TSXSend("sky6RASCOMTele.GetAzAlt()")
-    mntAz = round(float(TSXSend("sky6RASCOMTele.dAz")), 6)
-    mntAlt = round(float(TSXSend("sky6RASCOMTele.dAlt")), 6)
-
-    #Get RA,Dec
-    TSXSend("sky6RASCOMTele.GetRaDec()")
-    mntRa = round(float(TSXSend("sky6RASCOMTele.dRa")), 6)
-    mntDec = round(float(TSXSend("sky6RASCOMTele.dDec")), 6)
+    # Get Alt,Az and RA,Dec in a single round trip
+    _, mntAz, mntAlt, _, mntRa, mntDec = TSXSendBatch([
+        "sky6RASCOMTele.GetAzAlt()",
+        "sky6RASCOMTele.dAz",
+        "sky6RASCOMTele.dAlt",
+        "sky6RASCOMTele.GetRaDec()",
+        "sky6RASCOMTele.dRa",
+        "sky6RASCOMTele.dDec",
+    ])
+    mntAz = round(float(mntAz), 6)
+    mntAlt = round(float(mntAlt), 6)
+    mntRa = round(float(mntRa), 6)
+    mntDec = round(float(mntDec), 6)
     return [mntRa, mntDec, mntAz, mntAlt]
 
 
@@ -112,49 +157,37 @@ def getPosition():
 
 
 def slewToCoords(coords, name):
-    slew_count = 0
     ra = coords[0]
     dec = coords[1]
 
     print("Slewing to " + ra + " " + dec)
-    if TSXSend("sky6RASCOMTele.IsParked()") == "true":
+    unparked, _, _, _ = TSXSendBatch([
+        _TSXUnparkIfParked,
+        "sky6RASCOMTele.SetTracking(1, 1, 0 ,0)",
+        "sky6RASCOMTele.Asynchronous = true",
+        'sky6RASCOMTele.SlewToRaDec(' + ra + ', ' + dec + ', "' + name + '")',
+    ])
+    if unparked == "true":
         print("     NOTE: Unparking mount.")
-        TSXSend("sky6RASCOMTele.Unpark()")
-
-    if str(TSXSend("SelectedHardware.mountModel") != "Telescope Mount Simulator"):
-        TSXSend("sky6RASCOMTele.SetTracking(1, 1, 0 ,0)")
-
-    TSXSend("sky6RASCOMTele.Asynchronous = true")
-
-    TSXSend('sky6RASCOMTele.SlewToRaDec(' + ra + ', ' + dec + ', "' + name + '")')
 
     time.sleep(0.5)
 
-    while TSXSend("sky6RASCOMTele.IsSlewComplete") == "0":
-        if slew_count > 119:
-            print("    ERROR: Mount appears stuck!")
-            timeStamp("Sending abort command.")
-            # sky6RASCOMTele.Abort()
-            if TSXSend("SelectedHardware.mountModel") != "Telescope Mount Simulator":
-                time.sleep(5)
-                timeStamp("Trying to stop sidereal motor.")
-                TSXSend("sky6RASCOMTele.SetTracking(0, 1, 0 ,0)")
-            timeStamp("Stopping script.")
-            sys.exit()
-        else:
-            print("     NOTE: Slew in progress.")
-            slew_count = slew_count + 1
-            time.sleep(10)
+    _TSXWaitForSlew()
 
-    if "Process aborted." in TSXSend("sky6RASCOMTele.IsSlewComplete"):
+    slewComplete, _, _, mntAz, mntAlt = TSXSendBatch([
+        "sky6RASCOMTele.IsSlewComplete",
+        "sky6RASCOMTele.Asynchronous = false",
+        "sky6RASCOMTele.GetAzAlt()",
+        "sky6RASCOMTele.dAz",
+        "sky6RASCOMTele.dAlt",
+    ])
+    if "Process aborted." in slewComplete:
         timeStamp("Script Aborted.")
-        sys.exit()
-    TSXSend("sky6RASCOMTele.Asynchronous = false")
+        raise TSXAbortedError("Script aborted in SkyX.")
     print("Completed slew")
 
-    TSXSend("sky6RASCOMTele.GetAzAlt()")
-    mntAz = round(float(TSXSend("sky6RASCOMTele.dAz")), 2)
-    mntAlt = round(float(TSXSend("sky6RASCOMTele.dAlt")), 2)
+    mntAz = round(float(mntAz), 2)
+    mntAlt = round(float(mntAlt), 2)
     print("NOTE: Mount currently at: " + str(mntAz) + " az., " + str(mntAlt) + " alt.")
 
 
@@ -346,7 +379,7 @@ def atFocus2(target, filterNum):
     #
     if targHA(target) < 0.75 and targHA(target) > -0.75:
         print("     NOTE: Target is near the meridian.")
-        if TSXSend("SelectedHardware.mountModel") != "Telescope Mount Simulator":
+        if TSXSendCached("SelectedHardware.mountModel") != "Telescope Mount Simulator":
             TSXSend('sky6RASCOMTele.DoCommand(11, "")')
             if TSXSend("sky6RASCOMTele.DoCommandOutput") == "1":
                 TSXSend('sky6RASCOMTele.Jog(420, "E")')
@@ -357,11 +390,11 @@ def atFocus2(target, filterNum):
                 print("     NOTE: OTA is east of the meridian, pointing west.")
                 print("     NOTE: Slewing towards the west, away from meridian.")
 
-    if TSXSend("SelectedHardware.filterWheelModel") != "<No Filter Wheel Selected>":
+    if TSXSendCached("SelectedHardware.filterWheelModel") != "<No Filter Wheel Selected>":
         TSXSend("ccdsoftCamera.filterWheelConnect()")
         TSXSend("ccdsoftCamera.FilterIndexZeroBased = " + filterNum)
 
-    if TSXSend("ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1":
+    if TSXSendCached("ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1":
         timeStamp("@Focus2 success (simulated). Position = " + TSXSend("ccdsoftCamera.focPosition"))
         print("     NOTE: Returning to target.")
         if CLSlew(target, filterNum) == "Fail":
@@ -373,7 +406,7 @@ def atFocus2(target, filterNum):
 
         if "Process aborted." in result:
             timeStamp("Script Aborted.")
-            sys.exit()
+            raise TSXAbortedError("Script aborted in SkyX.")
 
         if "Error" in result:
             timeStamp("@Focus2 failed: " + result)
@@ -406,10 +439,14 @@ def atFocus2Both(host, target, filterNum):
     # the remote @Focus2 to use ther same magnitude stars as the main
     # camera uses.
     #
+    # host can also be a list of hosts: their cameras focus, then slew, in parallel.
+    #
+
+    hosts = _TSXHostList(host)
 
     if targHA(target) < 0.75 and targHA(target) > -0.75:
         print("     NOTE: Target is near the meridian.")
-        if TSXSend("SelectedHardware.mountModel") != "Telescope Mount Simulator":
+        if TSXSendCached("SelectedHardware.mountModel") != "Telescope Mount Simulator":
             TSXSend('sky6RASCOMTele.DoCommand(11, "")')
             if TSXSend("sky6RASCOMTele.DoCommandOutput") == "1":
                 TSXSend('sky6RASCOMTele.Jog(420, "E")')
@@ -420,15 +457,15 @@ def atFocus2Both(host, target, filterNum):
                 print("     NOTE: OTA is east of the meridian, pointing west.")
                 print("     NOTE: Slewing towards the west, away from meridian.")
 
-    if TSXSend("SelectedHardware.filterWheelModel") != "<No Filter Wheel Selected>":
+    if TSXSendCached("SelectedHardware.filterWheelModel") != "<No Filter Wheel Selected>":
         TSXSend("ccdsoftCamera.filterWheelConnect()")
         TSXSend("ccdsoftCamera.FilterIndexZeroBased = " + filterNum)
 
-    if TSXSend("ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1":
+    if TSXSendCached("ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1":
         timeStamp("@Focus2 success (simulated). Position = " + TSXSend("ccdsoftCamera.focPosition"))
 
-        atFocusRemote(host, "Imager", "Two", filterNum)
-        slewRemote(host, target)
+        TSXMap(hosts, atFocusRemote, "Imager", "Two", filterNum)
+        TSXMap(hosts, slewRemote, target)
 
         if CLSlew(target, filterNum) == "Fail":
             hardPark()
@@ -439,7 +476,7 @@ def atFocus2Both(host, target, filterNum):
 
         if "Process aborted." in result:
             timeStamp("Script Aborted.")
-            sys.exit()
+            raise TSXAbortedError("Script aborted in SkyX.")
 
         if "Error" in result:
             timeStamp("@Focus2 failed: " + result)
@@ -451,8 +488,8 @@ def atFocus2Both(host, target, filterNum):
         else:
             timeStamp("@Focus2 success.  Position = " + TSXSend("ccdsoftCamera.focPosition"))
 
-            atFocusRemote(host, "Imager", "Two", filterNum)
-            slewRemote(host, target)
+            TSXMap(hosts, atFocusRemote, "Imager", "Two", filterNum)
+            TSXMap(hosts, slewRemote, target)
 
             if CLSlew(target, filterNum) == "Fail":
                 hardPark()
@@ -482,11 +519,11 @@ def atFocus3(target, filterNum):
     #
     timeStamp("Focusing with @Focus3.")
 
-    if TSXSend("SelectedHardware.filterWheelModel") != "<No Filter Wheel Selected>":
+    if TSXSendCached("SelectedHardware.filterWheelModel") != "<No Filter Wheel Selected>":
         TSXSend("ccdsoftCamera.filterWheelConnect()")
         TSXSend("ccdsoftCamera.FilterIndexZeroBased = " + filterNum)
 
-    if TSXSend("ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1":
+    if TSXSendCached("ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1":
         timeStamp("@Focus3 success (simulated). Position = " + TSXSend("ccdsoftCamera.focPosition"))
         if target != "NoRTZ":
             if random.choice('12') == "2":
@@ -503,7 +540,7 @@ def atFocus3(target, filterNum):
 
         if "Process aborted." in result:
             timeStamp("Script Aborted.")
-            sys.exit()
+            raise TSXAbortedError("Script aborted in SkyX.")
 
         if "Error" in result:
             timeStamp("@Focus3 failed: " + result)
@@ -542,12 +579,12 @@ def atFocusRemote(host, whichCam, method, filterNum):
         print("   ERROR: Please specify remote camera as either: Imager or Guider.")
 
     if whichCam == "Imager":
-        if TSXSendRemote(host, "SelectedHardware.filterWheelModel") != "<No Filter Wheel Selected>":
+        if TSXSendRemoteCached(host, "SelectedHardware.filterWheelModel") != "<No Filter Wheel Selected>":
             TSXSendRemote(host, "ccdsoftCamera.filterWheelConnect()")
             TSXSendRemote(host, "ccdsoftCamera.FilterIndexZeroBased = " + filterNum)
 
     if whichCam == "Guider":
-        if TSXSendRemote(host, "SelectedHardware.autoguiderFilterWheelModel") != "<No Filter Wheel Selected>":
+        if TSXSendRemoteCached(host, "SelectedHardware.autoguiderFilterWheelModel") != "<No Filter Wheel Selected>":
             TSXSendRemote(host, "ccdsoftAutoguider.filterWheelConnect()")
             TSXSendRemote(host, "ccdsoftAutoguider.FilterIndexZeroBased = " + filterNum)
 
@@ -555,9 +592,9 @@ def atFocusRemote(host, whichCam, method, filterNum):
         if method == "Three":
             timeStamp("Focusing remote imaging camera with @Focus3.")
 
-            if (TSXSendRemote(host, "ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1") or \
-                    (TSXSendRemote(host, "SelectedHardware.focuserModel") == "<No Focuser Selected>"):
-                if TSXSendRemote(host, "ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1":
+            if (TSXSendRemoteCached(host, "ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1") or \
+                    (TSXSendRemoteCached(host, "SelectedHardware.focuserModel") == "<No Focuser Selected>"):
+                if TSXSendRemoteCached(host, "ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1":
                     timeStamp(
                         "@Focus3 success (simulated). Position = " + TSXSendRemote(host, "ccdsoftCamera.focPosition"))
                     return "Success"
@@ -570,7 +607,7 @@ def atFocusRemote(host, whichCam, method, filterNum):
 
                 if "Process aborted." in result:
                     timeStamp("Script Aborted.")
-                    sys.exit()
+                    raise TSXAbortedError("Script aborted in SkyX.")
 
                 if "Error" in result:
                     timeStamp("Remote @Focus3 failed: " + result)
@@ -584,9 +621,9 @@ def atFocusRemote(host, whichCam, method, filterNum):
         if method == "Two":
             timeStamp("Focusing remote imaging camera with @Focus2.")
 
-            if (TSXSendRemote(host, "ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1") or \
-                    (TSXSendRemote(host, "SelectedHardware.focuserModel") == "<No Focuser Selected>"):
-                if TSXSendRemote(host, "ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1":
+            if (TSXSendRemoteCached(host, "ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1") or \
+                    (TSXSendRemoteCached(host, "SelectedHardware.focuserModel") == "<No Focuser Selected>"):
+                if TSXSendRemoteCached(host, "ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1":
                     timeStamp(
                         "@Focus2 success (simulated). Position = " + TSXSendRemote(host, "ccdsoftCamera.focPosition"))
                     return "Success"
@@ -600,7 +637,7 @@ def atFocusRemote(host, whichCam, method, filterNum):
 
                 if "Process aborted." in result:
                     timeStamp("Script Aborted.")
-                    sys.exit()
+                    raise TSXAbortedError("Script aborted in SkyX.")
 
                 if "Error" in result:
                     timeStamp("Remote @Focus2 failed: " + result)
@@ -615,9 +652,9 @@ def atFocusRemote(host, whichCam, method, filterNum):
         if method == "Three":
             timeStamp("Focusing remote guiding camera with @Focus3.")
 
-            if (TSXSendRemote(host, "ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1") or \
-                    (TSXSendRemote(host, "SelectedHardware.focuserModel") == "<No Focuser Selected>"):
-                if TSXSendRemote(host, "ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1":
+            if (TSXSendRemoteCached(host, "ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1") or \
+                    (TSXSendRemoteCached(host, "SelectedHardware.focuserModel") == "<No Focuser Selected>"):
+                if TSXSendRemoteCached(host, "ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1":
                     timeStamp(
                         "@Focus3 success (simulated). Position = " + TSXSendRemote(host, "ccdsoftCamera.focPosition"))
                     return "Success"
@@ -630,7 +667,7 @@ def atFocusRemote(host, whichCam, method, filterNum):
 
                 if "Process aborted." in result:
                     timeStamp("Script Aborted.")
-                    sys.exit()
+                    raise TSXAbortedError("Script aborted in SkyX.")
 
                 if "Error" in result:
                     timeStamp("Remote @Focus3 failed: " + result)
@@ -643,9 +680,9 @@ def atFocusRemote(host, whichCam, method, filterNum):
         if method == "Two":
             timeStamp("Focusing remote guiding camera with @Focus2.")
 
-            if (TSXSendRemote(host, "ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1") or \
-                    (TSXSendRemote(host, "SelectedHardware.focuserModel") == "<No Focuser Selected>"):
-                if TSXSendRemote(host, "ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1":
+            if (TSXSendRemoteCached(host, "ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1") or \
+                    (TSXSendRemoteCached(host, "SelectedHardware.focuserModel") == "<No Focuser Selected>"):
+                if TSXSendRemoteCached(host, "ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1":
                     timeStamp(
                         "@Focus2 success (simulated). Position = " + TSXSendRemote(host, "ccdsoftCamera.focPosition"))
                     return "Success"
@@ -658,7 +695,7 @@ def atFocusRemote(host, whichCam, method, filterNum):
 
                 if "Process aborted." in result:
                     timeStamp("Script Aborted.")
-                    sys.exit()
+                    raise TSXAbortedError("Script aborted in SkyX.")
 
                 if "Error" in result:
                     timeStamp("Remote @Focus2 failed: " + result)
@@ -701,7 +738,7 @@ def calcImageScale(whichCam):
 
             TSXSend(camImage + "." + camAttachment)
 
-        if TSXSend(camDevice + ".ImageUseDigitizedSkySurvey") == "1":
+        if TSXSendCached(camDevice + ".ImageUseDigitizedSkySurvey") == "1":
             FITSProblem = "Yes"
 
         else:
@@ -761,7 +798,7 @@ def calcSettleLimit():
     # This was done because my Takahashi mounts track like drunk sailors.
     #
     if TSXSend('ccdsoftCamera.PropStr("m_csObserver")') == "Ken Sturrock":
-        if "Temma" in TSXSend("SelectedHardware.mountModel"):
+        if "Temma" in TSXSendCached("SelectedHardware.mountModel"):
             settleThreshold = 3
             print("     NOTE: Settle range enlarged for Ken's Temmas")
 
@@ -878,7 +915,7 @@ def cloudWait():
     counter = 1
 
     timeStamp("Waiting five minutes. (1 of 5)")
-    if TSXSend("SelectedHardware.mountModel") != "Telescope Mount Simulator":
+    if TSXSendCached("SelectedHardware.mountModel") != "Telescope Mount Simulator":
         TSXSend("sky6RASCOMTele.SetTracking(0, 1, 0 ,0)")
 
     camDisconnect("Guider")
@@ -890,7 +927,7 @@ def cloudWait():
 
     while shouldWait == "Yes" and counter <= 5:
 
-        if str(TSXSend("SelectedHardware.mountModel") != "Telescope Mount Simulator"):
+        if str(TSXSendCached("SelectedHardware.mountModel") != "Telescope Mount Simulator"):
             TSXSend("sky6RASCOMTele.SetTracking(1, 1, 0 ,0)")
             time.sleep(10)
 
@@ -906,7 +943,7 @@ def cloudWait():
             timeStamp("Sky still appears cloudy.")
 
             camDisconnect("Guider")
-            if TSXSend("SelectedHardware.mountModel") != "Telescope Mount Simulator":
+            if TSXSendCached("SelectedHardware.mountModel") != "Telescope Mount Simulator":
                 TSXSend("sky6RASCOMTele.SetTracking(0, 1, 0 ,0)")
 
             print("     NOTE: Waiting five minutes. (" + str(counter) + " of 5)")
@@ -919,7 +956,7 @@ def cloudWait():
     camConnect("Guider")
     camConnect("Imager")
 
-    if str(TSXSend("SelectedHardware.mountModel") != "Telescope Mount Simulator"):
+    if str(TSXSendCached("SelectedHardware.mountModel") != "Telescope Mount Simulator"):
         TSXSend("sky6RASCOMTele.SetTracking(1, 1, 0 ,0)")
 
     time.sleep(10)
@@ -943,11 +980,11 @@ def CLSlew(target, filterNum):
 
     timeStamp("Attempting precise positioning with CLS.")
 
-    if TSXSend("SelectedHardware.filterWheelModel") != "<No Filter Wheel Selected>":
+    if TSXSendCached("SelectedHardware.filterWheelModel") != "<No Filter Wheel Selected>":
         TSXSend("ccdsoftCamera.filterWheelConnect()")
         TSXSend("ccdsoftCamera.FilterIndexZeroBased = " + filterNum)
 
-    if TSXSend("ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1":
+    if TSXSendCached("ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1":
         timeStamp("CLS to " + target + " success (simulated).")
 
         return "Success"
@@ -978,7 +1015,7 @@ def CLSlew(target, filterNum):
 
             TSXSend("ccdsoftCamera.Delay = " + camDelay)
 
-            if "Temma" in TSXSend("SelectedHardware.mountModel"):
+            if "Temma" in TSXSendCached("SelectedHardware.mountModel"):
                 reSynch()
 
             return "Success"
@@ -1039,7 +1076,7 @@ def dither():
         time.sleep(5)
 
         if TSXSend('ccdsoftCamera.PropStr("m_csObserver")') == "Ken Sturrock":
-            if "Temma" in TSXSend("SelectedHardware.mountModel"):
+            if "Temma" in TSXSendCached("SelectedHardware.mountModel"):
                 print("     NOTE: Pausing 30 seconds to take-up backlash for Ken's Temmas.")
                 time.sleep(30)
 
@@ -1151,31 +1188,38 @@ def getStats():
     # Uses Image Link, so it's kind of slow - especially on a RPi.
     #
 
-    if TSXSend("ccdsoftCamera.ImageUseDigitizedSkySurvey") != "1":
+    if TSXSendCached("ccdsoftCamera.ImageUseDigitizedSkySurvey") != "1":
 
         print("    STATS:")
 
-        TSXSend("ccdsoftCameraImage.AttachToActiveImager()")
-
-        TSXSend("ImageLink.pathToFITS = ccdsoftCameraImage.Path")
-        if "TypeError: " not in TSXSend("ImageLink.execute()"):
-
-            imageScale = TSXSend("ImageLinkResults.imageScale")
-            avgPixelValue = TSXSend("ccdsoftCameraImage.averagePixelValue()")
-            imageCenterRA = TSXSend("ImageLinkResults.imageCenterRAJ2000")
-            imageCenterDec = TSXSend("ImageLinkResults.imageCenterDecJ2000")
-            positionAngle = TSXSend("ImageLinkResults.imagePositionAngle")
-            ilFWHM = TSXSend("ImageLinkResults.imageFWHMInArcSeconds")
+        #
+        # Image Link runs on its own so that its error report comes back exactly as before.
+        #
+        if "TypeError: " not in TSXSend("ccdsoftCameraImage.AttachToActiveImager(); "
+                                        "ImageLink.pathToFITS = ccdsoftCameraImage.Path; "
+                                        "ImageLink.execute()"):
+
+            imageScale, avgPixelValue, positionAngle, ilFWHM, centerHMS2k, centerHMSNow, imagePath, \
+                filterKeyword, focPosition, focTemperature, altKeyword, azKeyword = TSXSendBatch([
+                    "ImageLinkResults.imageScale",
+                    "ccdsoftCameraImage.averagePixelValue()",
+                    "ImageLinkResults.imagePositionAngle",
+                    "ImageLinkResults.imageFWHMInArcSeconds",
+                    "(sky6Utils.ConvertEquatorialToString(ImageLinkResults.imageCenterRAJ2000, "
+                    "ImageLinkResults.imageCenterDecJ2000, 5), sky6Utils.strOut)",
+                    "(sky6Utils.Precess2000ToNow(ImageLinkResults.imageCenterRAJ2000, "
+                    "ImageLinkResults.imageCenterDecJ2000), "
+                    "sky6Utils.ConvertEquatorialToString(sky6Utils.dOut0, sky6Utils.dOut1, 5), sky6Utils.strOut)",
+                    "ccdsoftCameraImage.Path",
+                    'ccdsoftCameraImage.FITSKeyword("FILTER")',
+                    "ccdsoftCamera.focPosition",
+                    "ccdsoftCamera.focTemperature.toFixed(1)",
+                    'ccdsoftCameraImage.FITSKeyword("CENTALT")',
+                    'ccdsoftCameraImage.FITSKeyword("CENTAZ")',
+                ])
             ASIlFWHM = float(ilFWHM) * float(imageScale)
-            TSXSend("sky6Utils.ConvertEquatorialToString(" + imageCenterRA + ", " + imageCenterDec + ", 5)")
-            centerHMS2k = TSXSend("sky6Utils.strOut")
-            TSXSend("sky6Utils.Precess2000ToNow(" + imageCenterRA + ", " + imageCenterDec + ")")
-            centerLSRANow = TSXSend("sky6Utils.dOut0")
-            centerLSDecNow = TSXSend("sky6Utils.dOut1")
-            TSXSend("sky6Utils.ConvertEquatorialToString(" + centerLSRANow + ", " + centerLSDecNow + ", 5)")
-            centerHMSNow = TSXSend("sky6Utils.strOut")
 
-            dirName, fileName = os.path.split(TSXSend("ccdsoftCameraImage.Path"))
+            dirName, fileName = os.path.split(imagePath)
 
             orgImgName = fileName.split(".")[0]
 
@@ -1188,7 +1232,6 @@ def getStats():
             if os.path.exists(dirName + "/Cropped " + orgImgName + ".SRC"):
                 os.remove(dirName + "/Cropped " + orgImgName + ".SRC")
 
-            filterKeyword = TSXSend('ccdsoftCameraImage.FITSKeyword("FILTER")')
             if not "Error = 250" or "Undefined" in filterKeyword:
                 print("           Filter:               " + filterKeyword)
 
@@ -1196,15 +1239,13 @@ def getStats():
             print("           Image FWHM:           " + str(round(ASIlFWHM, 2)) + " AS")
             print("           Average Pixel Value:  " + avgPixelValue.split(".")[0] + " ADU")
             print("           Position Angle:       " + positionAngle.split(".")[0] + " degrees")
-            print("           Focuser Position:     " + TSXSend("ccdsoftCamera.focPosition"))
-            print("           Temperature:          " + TSXSend("ccdsoftCamera.focTemperature.toFixed(1)"))
+            print("           Focuser Position:     " + focPosition)
+            print("           Temperature:          " + focTemperature)
 
-            altKeyword = TSXSend('ccdsoftCameraImage.FITSKeyword("CENTALT")')
             if not "Error = 250" or "Undefined" in altKeyword:
                 altKeyword = round(float(altKeyword), 2)
                 print("           Image Altitude:       " + str(altKeyword))
 
-            azKeyword = TSXSend('ccdsoftCameraImage.FITSKeyword("CENTAZ")')
             if not "Error = 250" or "Undefined" in azKeyword:
                 azKeyword = round(float(azKeyword), 2)
                 print("           Image Aziumth:        " + str(azKeyword))
@@ -1306,38 +1347,44 @@ def getStatsRemote(host, whichCam):
     # Because we are only controlling the remote machine via SkyX,
     # we can't clean up the SRC scratch files.
     #
+    # With a list of hosts, Image Link runs on all of them at the same time and
+    # the results come back as a list.
+    #
+    if not isinstance(host, str):
+        return TSXMap(host, getStatsRemote, whichCam)
+
     if whichCam not in ("Imager", "Guider"):
         print("   ERROR: Please specify remote camera as either: Imager or Guider.")
 
     if whichCam == "Imager":
 
-        if TSXSendRemote(host, "ccdsoftCamera.ImageUseDigitizedSkySurvey") != "1":
+        if TSXSendRemoteCached(host, "ccdsoftCamera.ImageUseDigitizedSkySurvey") != "1":
 
             print("    STATS:")
 
-            TSXSendRemote(host, "ccdsoftCameraImage.AttachToActiveImager()")
-
-            TSXSendRemote(host, "ImageLink.pathToFITS = ccdsoftCameraImage.Path")
-            if "TypeError: " not in TSXSendRemote(host, "ImageLink.execute()"):
-
-                imageScale = TSXSendRemote(host, "ImageLinkResults.imageScale")
-                avgPixelValue = TSXSendRemote(host, "ccdsoftCameraImage.averagePixelValue()")
-                imageCenterRA = TSXSendRemote(host, "ImageLinkResults.imageCenterRAJ2000")
-                imageCenterDec = TSXSendRemote(host, "ImageLinkResults.imageCenterDecJ2000")
-                positionAngle = TSXSendRemote(host, "ImageLinkResults.imagePositionAngle")
-                ilFWHM = TSXSendRemote(host, "ImageLinkResults.imageFWHMInArcSeconds")
+            if "TypeError: " not in TSXSendRemote(host, "ccdsoftCameraImage.AttachToActiveImager(); "
+                                                        "ImageLink.pathToFITS = ccdsoftCameraImage.Path; "
+                                                        "ImageLink.execute()"):
+
+                imageScale, avgPixelValue, positionAngle, ilFWHM, centerHMS2k, centerHMSNow, \
+                    filterKeyword, focPosition, focTemperature, altKeyword, azKeyword = TSXSendBatchRemote(host, [
+                        "ImageLinkResults.imageScale",
+                        "ccdsoftCameraImage.averagePixelValue()",
+                        "ImageLinkResults.imagePositionAngle",
+                        "ImageLinkResults.imageFWHMInArcSeconds",
+                        "(sky6Utils.ConvertEquatorialToString(ImageLinkResults.imageCenterRAJ2000, "
+                        "ImageLinkResults.imageCenterDecJ2000, 5), sky6Utils.strOut)",
+                        "(sky6Utils.Precess2000ToNow(ImageLinkResults.imageCenterRAJ2000, "
+                        "ImageLinkResults.imageCenterDecJ2000), "
+                        "sky6Utils.ConvertEquatorialToString(sky6Utils.dOut0, sky6Utils.dOut1, 5), sky6Utils.strOut)",
+                        'ccdsoftCameraImage.FITSKeyword("FILTER")',
+                        "ccdsoftCamera.focPosition",
+                        "ccdsoftCamera.focTemperature.toFixed(1)",
+                        'ccdsoftCameraImage.FITSKeyword("CENTALT")',
+                        'ccdsoftCameraImage.FITSKeyword("CENTAZ")',
+                    ])
                 ASIlFWHM = float(ilFWHM) * float(imageScale)
-                TSXSendRemote(host,
-                              "sky6Utils.ConvertEquatorialToString(" + imageCenterRA + ", " + imageCenterDec + ", 5)")
-                centerHMS2k = TSXSendRemote(host, "sky6Utils.strOut")
-                TSXSendRemote(host, "sky6Utils.Precess2000ToNow(" + imageCenterRA + ", " + imageCenterDec + ")")
-                centerLSRANow = TSXSendRemote(host, "sky6Utils.dOut0")
-                centerLSDecNow = TSXSendRemote(host, "sky6Utils.dOut1")
-                TSXSendRemote(host,
-                              "sky6Utils.ConvertEquatorialToString(" + centerLSRANow + ", " + centerLSDecNow + ", 5)")
-                centerHMSNow = TSXSendRemote(host, "sky6Utils.strOut")
-
-                filterKeyword = TSXSendRemote(host, 'ccdsoftCameraImage.FITSKeyword("FILTER")')
+
                 if not "Error = 250" or "Undefined" in filterKeyword:
                     print("           Filter:               " + filterKeyword)
 
@@ -1345,16 +1392,13 @@ def getStatsRemote(host, whichCam):
                 print("           Image FWHM:           " + str(round(ASIlFWHM, 2)) + " AS")
                 print("           Average Pixel Value:  " + avgPixelValue.split(".")[0] + " ADU")
                 print("           Position Angle:       " + positionAngle.split(".")[0] + " degrees")
-                print("           Focuser Position:     " + TSXSendRemote(host, "ccdsoftCamera.focPosition"))
-                print("           Temperature:          " + TSXSendRemote(host,
-                                                                          "ccdsoftCamera.focTemperature.toFixed(1)"))
+                print("           Focuser Position:     " + focPosition)
+                print("           Temperature:          " + focTemperature)
 
-                altKeyword = TSXSendRemote(host, 'ccdsoftCameraImage.FITSKeyword("CENTALT")')
                 if not "TypeError" or "Undefined" in altKeyword:
                     altKeyword = round(float(altKeyword), 2)
                     print("           Image Altitude:       " + str(altKeyword))
 
-                azKeyword = TSXSendRemote(host, 'ccdsoftCameraImage.FITSKeyword("CENTAZ")')
                 if not "TypeError" or "Undefined" in azKeyword:
                     azKeyword = round(float(azKeyword), 2)
                     print("           Image Aziumth:        " + str(azKeyword))
@@ -1408,14 +1452,14 @@ def hardPark():
         print("     NOTE: Pointing mount to the north.")
         slew("kochab")
 
-    if "Paramount" in TSXSend("SelectedHardware.mountModel"):
+    if "Paramount" in TSXSendCached("SelectedHardware.mountModel"):
         if not "Error" in TSXSend("sky6RASCOMTele.ParkAndDoNotDisconnect()"):
             timeStamp("Paramount moved to park position.")
         else:
             timeStamp("No park position set. Stopping sidereal motor.")
             TSXSend("sky6RASCOMTele.SetTracking(0, 1, 0 ,0)")
     else:
-        if TSXSend("SelectedHardware.mountModel") != "Telescope Mount Simulator":
+        if TSXSendCached("SelectedHardware.mountModel") != "Telescope Mount Simulator":
             print("     NOTE: Turning off sidereal drive.")
             TSXSend("sky6RASCOMTele.SetTracking(0, 1, 0 ,0)")
 
@@ -1435,18 +1479,18 @@ def hardPark():
     TSXSend("ccdsoftAutoguider.Subframe = false")
 
     if str(TSXSend('ccdsoftCamera.PropStr("m_csObserver")')) == "Ken Sturrock":
-        if str(TSXSend("SelectedHardware.cameraModel")) == "ASICamera":
+        if str(TSXSendCached("SelectedHardware.cameraModel")) == "ASICamera":
             TSXSend("ccdsoftCamera.ImageReduction = 0")
             TSXSend("ccdsoftCamera.TemperatureSetPoint = 1")
             TSXSend("ccdsoftCamera.FilterIndexZeroBased = 0")
             TSXSend("ccdsoftCamera.ExposureTime = 5")
 
-        if str(TSXSend("SelectedHardware.cameraModel")) == "QSI Camera  ":
+        if str(TSXSendCached("SelectedHardware.cameraModel")) == "QSI Camera  ":
             TSXSend("ccdsoftCamera.ImageReduction = 1")
             TSXSend("ccdsoftCamera.TemperatureSetPoint = 1")
             TSXSend("ccdsoftCamera.FilterIndexZeroBased = 0")
 
-        if str(TSXSend("SelectedHardware.cameraModel")) == "Camera Simulator":
+        if str(TSXSendCached("SelectedHardware.cameraModel")) == "Camera Simulator":
             TSXSend("ccdsoftCamera.FilterIndexZeroBased = 0")
 
     camDisconnect("Imager")
@@ -1462,7 +1506,7 @@ def isDayLight():
     # Is the sun above 15 degrees? If so, it's light outside.
     #
 
-    if TSXSend("ccdsoftCamera.ImageUseDigitizedSkySurvey") != "1":
+    if TSXSendCached("ccdsoftCamera.ImageUseDigitizedSkySurvey") != "1":
         TSXSend("sky6ObjectInformation.Property(0)")
         target = TSXSend("sky6ObjectInformation.ObjInfoPropOut")
 
@@ -1482,7 +1526,7 @@ def isGuiderLost(limit):
     #
     # Report back if the guider is lost
     #
-    if TSXSend("ccdsoftCamera.ImageUseDigitizedSkySurvey") != "1":
+    if TSXSendCached("ccdsoftCamera.ImageUseDigitizedSkySurvey") != "1":
         errorX = TSXSend('ccdsoftAutoguider.GuideErrorX')
         errorY = TSXSend('ccdsoftAutoguider.GuideErrorY')
 
@@ -1507,48 +1551,74 @@ def preRun():
 
     result = "Success"
 
-    if TSXSend('ccdsoftCamera.PropStr("m_csObserver")') == "":
+    #
+    # Read everything and apply the white space settings in one round trip.
+    #
+    observer, camFocalLength, guiderFocalLength, camSavePath, guiderSavePath, camDateFormat, \
+        guiderDateFormat, cameraModel, camDSS, guiderModel, guiderDSS, _, _, _ = TSXSendBatch([
+            'ccdsoftCamera.PropStr("m_csObserver")',
+            'ccdsoftCamera.PropDbl("m_dTeleFocalLength")',
+            'ccdsoftAutoguider.PropDbl("m_dTeleFocalLength")',
+            'ccdsoftCamera.PropStr("m_csAutoSavePath")',
+            'ccdsoftAutoguider.PropStr("m_csAutoSavePath")',
+            'ccdsoftCamera.PropStr("m_csAutoSaveColonaDateFormat")',
+            'ccdsoftAutoguider.PropStr("m_csAutoSaveColonaDateFormat")',
+            "SelectedHardware.cameraModel",
+            "ccdsoftCamera.ImageUseDigitizedSkySurvey",
+            "SelectedHardware.autoguiderCameraModel",
+            "ccdsoftAutoguider.ImageUseDigitizedSkySurvey",
+            'ccdsoftCamera.setPropLng("m_bAutoSaveNoWhiteSpace", 1)',
+            'ccdsoftAutoguider.setPropLng("m_bAutoSaveNoWhiteSpace", 1)',
+            'ccdsoftAutoguider.setPropLng("m_bShowAutoguider", 1)',
+        ])
+
+    #
+    # These do not change during a session, keep them for the other helpers.
+    #
+    localHost = TSXHost + ":" + str(TSXPort)
+    TSXCache.put(localHost, "SelectedHardware.cameraModel", cameraModel)
+    TSXCache.put(localHost, "ccdsoftCamera.ImageUseDigitizedSkySurvey", camDSS)
+    TSXCache.put(localHost, "SelectedHardware.autoguiderCameraModel", guiderModel)
+    TSXCache.put(localHost, "ccdsoftAutoguider.ImageUseDigitizedSkySurvey", guiderDSS)
+
+    if observer == "":
         print("    ERROR: Please fill in observer name in camera settings")
         result = "Fail"
 
-    if TSXSend('ccdsoftCamera.PropDbl("m_dTeleFocalLength")') == "0":
+    if camFocalLength == "0":
         print("    ERROR: Please fill in telescope focal length in camera settings")
         result = "Fail"
 
-    if TSXSend('ccdsoftAutoguider.PropDbl("m_dTeleFocalLength")') == "0":
+    if guiderFocalLength == "0":
         print("    ERROR: Please fill in telescope focal length in guider settings")
         result = "Fail"
 
-    if " " in TSXSend('ccdsoftCamera.PropStr("m_csAutoSavePath")'):
+    if " " in camSavePath:
         print("    ERROR: Please remove any spaces in the autosave path under the camera settings")
         result = "Fail"
 
-    if " " in TSXSend('ccdsoftAutoguider.PropStr("m_csAutoSavePath")'):
+    if " " in guiderSavePath:
         print("    ERROR: Please remove any spaces in the autosave path under the guider settings")
         result = "Fail"
 
-    if " " in TSXSend('ccdsoftCamera.PropStr("m_csAutoSaveColonaDateFormat")'):
+    if " " in camDateFormat:
         print("    ERROR: Please remove any spaces in the date format under the camera settings")
         result = "Fail"
 
-    if " " in TSXSend('ccdsoftAutoguider.PropStr("m_csAutoSaveColonaDateFormat")'):
+    if " " in guiderDateFormat:
         print("    ERROR: Please remove any spaces in the date format under the guider settings")
         result = "Fail"
 
-    if TSXSend("SelectedHardware.cameraModel") != "Camera Simulator":
-        if TSXSend("ccdsoftCamera.ImageUseDigitizedSkySurvey") == "1":
+    if cameraModel != "Camera Simulator":
+        if camDSS == "1":
             print("    ERROR: Non-simulated camera set to use DSS images.")
             result = "Fail"
 
-    if TSXSend("SelectedHardware.autoguiderCameraModel") != "Camera Simulator":
-        if TSXSend("ccdsoftAutoguider.ImageUseDigitizedSkySurvey") == "1":
+    if guiderModel != "Camera Simulator":
+        if guiderDSS == "1":
             print("    ERROR: Non-simulated guider set to use DSS images.")
             result = "Fail"
 
-    TSXSend('ccdsoftCamera.setPropLng("m_bAutoSaveNoWhiteSpace", 1)')
-    TSXSend('ccdsoftAutoguider.setPropLng("m_bAutoSaveNoWhiteSpace", 1)')
-    TSXSend('ccdsoftAutoguider.setPropLng("m_bShowAutoguider", 1)')
-
     return result
 
 
@@ -1556,31 +1626,42 @@ def remoteImageDone(host, whichCam):
     #
     # This checks to see if the remote image is complete.
     #
+    # host can also be a list of hosts: all of them are polled in parallel and the
+    # function returns once every camera is ready.
+    #
 
     if whichCam not in ("Imager", "Guider"):
         print("   ERROR: Please specify camera as either: Imager or Guider.")
         print("          ASSuming imaging camera.")
         whichCam = "Imager"
 
+    hosts = _TSXHostList(host)
+    shown = {}
+
+    def showStatus(statusHost, camStatus):
+        #
+        # The status counts down during an exposure, only report when it changes kind.
+        #
+        kind = camStatus.split(" ")[0]
+        if camStatus != "Ready" and shown.get(statusHost) != kind:
+            shown[statusHost] = kind
+            if len(hosts) > 1:
+                print("     NOTE: Status (" + statusHost + "): " + camStatus)
+            else:
+                print("     NOTE: Status: " + camStatus)
+            print("     NOTE: Waiting.")
+
     if whichCam == "Imager":
         timeStamp("Checking remote imaging camera status.")
 
-        camStatus = TSXSendRemote(host, "ccdsoftCamera.Status")
-        while camStatus != "Ready":
-            print("     NOTE: Status: " + camStatus)
-            print("     NOTE: Waiting.")
-            time.sleep(10)
-            camStatus = TSXSendRemote(host, "ccdsoftCamera.Status")
+        TSXWaitMulti(hosts, "ccdsoftCamera.Status", lambda camStatus: camStatus == "Ready",
+                     maxPoll=2.0, onChange=showStatus)
 
     if whichCam == "Guider":
         timeStamp("Checking remote guiding camera status.")
 
-        camStatus = TSXSendRemote(host, "ccdsoftAutoguider.Status")
-        while camStatus != "Ready":
-            print("     NOTE: Status: " + camStatus)
-            print("     NOTE: Waiting.")
-            time.sleep(10)
-            camStatus = TSXSendRemote(host, "ccdsoftAutoguider.Status")
+        TSXWaitMulti(hosts, "ccdsoftAutoguider.Status", lambda camStatus: camStatus == "Ready",
+                     maxPoll=2.0, onChange=showStatus)
 
     timeStamp("Remote " + whichCam + " is finished.")
 
@@ -1612,26 +1693,31 @@ def settleGuider(limit):
     # Now, we're going to actually wait for the guider to settle
     #
 
-    if TSXSend("ccdsoftCamera.ImageUseDigitizedSkySurvey") == "0":
+    if TSXSendCached("ccdsoftCamera.ImageUseDigitizedSkySurvey") == "0":
         goodCount = 0
         totalCount = 0
         settled = "No"
 
-        pausePeriod = float(TSXSend("ccdsoftAutoguider.AutoguiderExposureTime")) + float(
-            TSXSend("ccdsoftAutoguider.Delay")) + 1.0
+        exposureTime, delay = TSXSendBatch(["ccdsoftAutoguider.AutoguiderExposureTime", "ccdsoftAutoguider.Delay"])
+        pausePeriod = float(exposureTime) + float(delay) + 1.0
 
         timeStamp("Guider settle limit set to " + str(limit) + " guider pixels.")
 
+        #
+        # One sample per guider cycle. The cycles are counted from a fixed start so that
+        # the time spent talking to SkyX does not add up from one sample to the next.
+        #
+        nextSample = time.monotonic()
         while settled == "No":
+            nextSample = nextSample + pausePeriod
+            time.sleep(max(0.0, nextSample - time.monotonic()))
 
-            if TSXSend("ccdsoftAutoguider.State") != "5":
+            guiderState, errorX, errorY = TSXSendBatch(["ccdsoftAutoguider.State",
+                                                        "ccdsoftAutoguider.GuideErrorX",
+                                                        "ccdsoftAutoguider.GuideErrorY"])
+            if guiderState != "5":
                 print("     NOTE: Guider has stopped guiding.")
 
-            time.sleep(pausePeriod)
-
-            errorX = TSXSend('ccdsoftAutoguider.GuideErrorX')
-            errorY = TSXSend('ccdsoftAutoguider.GuideErrorY')
-
             errorX = round(float(errorX), 2)
             errorY = round(float(errorY), 2)
 
@@ -1679,8 +1765,6 @@ def slew(target):
     # Performs a normal slew to the specificed target.
     #
 
-    slewCount = 0
-
     if "ReferenceError" in str(TSXSend('sky6StarChart.Find("' + target + '")')):
         timeStamp("Target not found.")
         return "Error"
@@ -1691,7 +1775,7 @@ def slew(target):
         print("     NOTE: Unparking mount.")
         TSXSend("sky6RASCOMTele.Unpark()")
 
-    if str(TSXSend("SelectedHardware.mountModel") != "Telescope Mount Simulator"):
+    if str(TSXSendCached("SelectedHardware.mountModel") != "Telescope Mount Simulator"):
         TSXSend("sky6RASCOMTele.SetTracking(1, 1, 0 ,0)")
 
     TSXSend("sky6ObjectInformation.Property(54)")
@@ -1705,25 +1789,11 @@ def slew(target):
     TSXSend('sky6RASCOMTele.SlewToRaDec(' + targetRA + ', ' + targetDEC + ', "' + target + '")')
     time.sleep(0.5)
 
-    while TSXSend("sky6RASCOMTele.IsSlewComplete") == "0":
-        if slewCount > 119:
-            print("    ERROR: Mount appears stuck!")
-            timeStamp("Sending abort command.")
-            # sky6RASCOMTele.Abort()
-            if TSXSend("SelectedHardware.mountModel") != "Telescope Mount Simulator":
-                time.sleep(5)
-                timeStamp("Trying to stop sidereal motor.")
-                TSXSend("sky6RASCOMTele.SetTracking(0, 1, 0 ,0)")
-            timeStamp("Stopping script.")
-            sys.exit()
-        else:
-            print("     NOTE: Slew in progress.")
-            slewCount = slewCount + 1
-            time.sleep(10)
+    _TSXWaitForSlew()
 
     if "Process aborted." in TSXSend("sky6RASCOMTele.IsSlewComplete"):
         timeStamp("Script Aborted.")
-        sys.exit()
+        raise TSXAbortedError("Script aborted in SkyX.")
 
     TSXSend("sky6RASCOMTele.Asynchronous = false")
     timeStamp("Arrived at " + target)
@@ -1754,7 +1824,7 @@ def slewRemote(host, target):
         print("     NOTE: Unparking remote mount.")
         TSXSendRemote(host, "sky6RASCOMTele.Unpark()")
 
-    if str(TSXSendRemote(host, "SelectedHardware.mountModel") != "Telescope Mount Simulator"):
+    if str(TSXSendRemoteCached(host, "SelectedHardware.mountModel") != "Telescope Mount Simulator"):
         TSXSendRemote(host, "sky6RASCOMTele.SetTracking(1, 1, 0 ,0)")
 
     TSXSendRemote(host, "sky6ObjectInformation.Property(54)")
@@ -1768,13 +1838,11 @@ def slewRemote(host, target):
     TSXSendRemote(host, 'sky6RASCOMTele.SlewToRaDec(' + targetRA + ', ' + targetDEC + ', "' + target + '")')
     time.sleep(0.5)
 
-    while TSXSendRemote(host, "sky6RASCOMTele.IsSlewComplete") == "0":
-        print("     NOTE: Remote slew in progress.")
-        time.sleep(10)
+    _TSXWaitForSlew(host)
 
     if "Process aborted." in TSXSendRemote(host, "sky6RASCOMTele.IsSlewComplete"):
         timeStamp("Script Aborted.")
-        sys.exit()
+        raise TSXAbortedError("Script aborted in SkyX.")
 
     TSXSendRemote(host, "sky6RASCOMTele.Asynchronous = false")
     timeStamp("Remote mount arrived at " + target)
@@ -1797,7 +1865,7 @@ def softPark():
     # uncovered until morning.
     #
 
-    if TSXSend("SelectedHardware.mountModel") != "Telescope Mount Simulator":
+    if TSXSendCached("SelectedHardware.mountModel") != "Telescope Mount Simulator":
         timeStamp("Pausing sidereal motor.")
         TSXSend("sky6RASCOMTele.SetTracking(0, 1, 0 ,0)")
 
@@ -1809,7 +1877,7 @@ def softPark():
 
     time.sleep(30)
 
-    if TSXSend("SelectedHardware.mountModel") != "Telescope Mount Simulator":
+    if TSXSendCached("SelectedHardware.mountModel") != "Telescope Mount Simulator":
         TSXSend("sky6RASCOMTele.SetTracking(1, 1, 0 ,0)")
 
     hardPark()
@@ -1873,12 +1941,12 @@ def takeImage(whichCam, exposure, delay, filterNum):
         print("   ERROR: Please specify camera as either: Imager or Guider.")
 
     if whichCam == "Imager":
-        if TSXSend("SelectedHardware.filterWheelModel") != "<No Filter Wheel Selected>":
+        if TSXSendCached("SelectedHardware.filterWheelModel") != "<No Filter Wheel Selected>":
             TSXSend("ccdsoftCamera.filterWheelConnect()")
             if filterNum != "NA":
                 TSXSend("ccdsoftCamera.FilterIndexZeroBased = " + filterNum)
             timeStamp("Imager: " + str(exposure) + "s exposure through " \
-                      + TSXSend("ccdsoftCamera.szFilterName(" + filterNum + ")") + " filter.")
+                      + TSXSendCached("ccdsoftCamera.szFilterName(" + filterNum + ")") + " filter.")
         else:
             timeStamp("Imager: " + str(exposure) + "s exposure")
     else:
@@ -1911,7 +1979,7 @@ def takeImage(whichCam, exposure, delay, filterNum):
             if "Process aborted." in camMesg:
                 timeStamp("Script Aborted.")
                 stopGuiding()
-                sys.exit()
+                raise TSXAbortedError("Script aborted in SkyX.")
 
             timeStamp("Error: " + camMesg)
             return "Fail"
@@ -1942,7 +2010,7 @@ def takeImage(whichCam, exposure, delay, filterNum):
             if "Process aborted." in camMesg:
                 timeStamp("Script Aborted.")
                 stopGuiding()
-                sys.exit()
+                raise TSXAbortedError("Script aborted in SkyX.")
 
             timeStamp("Error: " + camMesg)
             return "Fail"
@@ -1954,44 +2022,50 @@ def takeImageRemote(host, whichCam, exposure, delay, filterNum):
     #
     # Parameters: Host, Guider or Imager, exposure in seconds, delay in seconds (or NA = leave it alone), which filter number.
     #
+    # With a list of hosts, the exposures start on all of them at the same time.
+    #
+
+    if not isinstance(host, str):
+        TSXMap(host, takeImageRemote, whichCam, exposure, delay, filterNum)
+        return
 
     if whichCam not in ("Imager", "Guider"):
         print("   ERROR: Please specify remote camera as either: Imager or Guider.")
 
     if whichCam == "Imager":
-        if TSXSendRemote(host, "SelectedHardware.filterWheelModel") != "<No Filter Wheel Selected>":
+        if TSXSendRemoteCached(host, "SelectedHardware.filterWheelModel") != "<No Filter Wheel Selected>":
             TSXSendRemote(host, "ccdsoftCamera.filterWheelConnect()")
             if filterNum != "NA":
                 TSXSendRemote(host, "ccdsoftCamera.FilterIndexZeroBased = " + filterNum)
             timeStamp("Remote Imager: " + str(exposure) + "s exposure through " \
-                      + TSXSendRemote(host, "ccdsoftCamera.szFilterName(" + filterNum + ")") + " filter.")
+                      + TSXSendRemoteCached(host, "ccdsoftCamera.szFilterName(" + filterNum + ")") + " filter.")
         else:
             timeStamp("Remote Imager: " + str(exposure) + "s exposure")
     else:
         timeStamp("Remote Guider: " + str(exposure) + "s exposure")
 
     if whichCam == "Imager":
-        TSXSendRemote(host, "ccdsoftCamera.Asynchronous = true")
-        TSXSendRemote(host, "ccdsoftCamera.AutoSaveOn = true")
-        TSXSendRemote(host, "ccdsoftCamera.ImageReduction = 0")
-        TSXSendRemote(host, "ccdsoftCamera.Frame = 1")
-        TSXSendRemote(host, "ccdsoftCamera.Subframe = false")
-        TSXSendRemote(host, "ccdsoftCamera.ExposureTime = " + exposure)
+        commands = ["ccdsoftCamera.Asynchronous = true",
+                    "ccdsoftCamera.AutoSaveOn = true",
+                    "ccdsoftCamera.ImageReduction = 0",
+                    "ccdsoftCamera.Frame = 1",
+                    "ccdsoftCamera.Subframe = false",
+                    "ccdsoftCamera.ExposureTime = " + exposure]
         if delay != "NA":
-            TSXSendRemote(host, "ccdsoftCamera.Delay = " + delay)
+            commands.append("ccdsoftCamera.Delay = " + delay)
 
-        TSXSendRemote(host, "ccdsoftCamera.TakeImage()")
+        TSXSendBatchRemote(host, commands + ["ccdsoftCamera.TakeImage()"])
 
     if whichCam == "Guider":
-        TSXSendRemote(host, "ccdsoftAutoguider.Asynchronous = true")
-        TSXSendRemote(host, "ccdsoftAutoguider.AutoSaveOn = true")
-        TSXSendRemote(host, "ccdsoftAutoguider.Frame = 1")
-        TSXSendRemote(host, "ccdsoftAutoguider.Subframe = false")
-        TSXSendRemote(host, "ccdsoftAutoguider.ExposureTime = " + exposure)
+        commands = ["ccdsoftAutoguider.Asynchronous = true",
+                    "ccdsoftAutoguider.AutoSaveOn = true",
+                    "ccdsoftAutoguider.Frame = 1",
+                    "ccdsoftAutoguider.Subframe = false",
+                    "ccdsoftAutoguider.ExposureTime = " + exposure]
         if delay != "NA":
-            TSXSendRemote(host, "ccdsoftCamera.Delay = " + delay)
+            commands.append("ccdsoftCamera.Delay = " + delay)
 
-        TSXSendRemote(host, "ccdsoftAutoguider.TakeImage()")
+        TSXSendBatchRemote(host, commands + ["ccdsoftAutoguider.TakeImage()"])
 
     timeStamp("Remote command issued asynchronously.")
 
@@ -2051,69 +2125,385 @@ def timeStamp(message):
     print(timeStamp, message)
 
 
-def TSXSend(message):
+class TSXError(Exception):
     #
-    # This function routes generic commands to TSX Pro through a TCP/IP port
+    # Base class of the transport errors. The transport raises these instead of
+    # exiting, so that a caller can decide whether the session survives.
     #
-    # The code was originally written by Anat Ruangrassamee but was modified for Python 3
-    # and further cruded up by Ken Sturrock to make it more vebose and slower.
+    pass
+
+
+class TSXConnectionError(TSXError, ConnectionError):
     #
-    # Set the verbose flag up top to see the messages back & forth to SkyX for debugging
-    # purposes.
+    # SkyX could not be reached, or dropped the connection before replying. sent is
+    # True when the command may have reached SkyX, only unsent commands are retried.
     #
+    def __init__(self, message, sent=False):
+        super().__init__(message)
+        self.sent = sent
+
 
-    BUFFER_SIZE = 4096
+class TSXCircuitOpenError(TSXConnectionError):
+    #
+    # The host failed several times in a row; commands fail at once until the next probe.
+    #
+    pass
 
-    TSXSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 
+class TSXTimeoutError(TSXError, TimeoutError):
+    #
+    # No complete reply within the deadline. The connection is dropped, since a late
+    # reply would otherwise be read as the answer to the next command.
+    #
+    pass
+
+
+class TSXAbortedError(TSXError):
+    #
+    # SkyX answered "Process aborted.": the operator stopped the command in SkyX.
+    #
+    pass
+
+
+class TSXProtocolError(TSXError):
+    #
+    # The reply does not end with SkyX's error report. Looks like SkyX crashed.
+    #
+    pass
+
+
+TSXTimeout = 600.0  # Default deadline of one command, [s]. Synchronous @Focus runs take minutes.
+TSXConnectTimeout = 2.0  # Deadline of opening a connection, [s]
+TSXRetries = 4  # Attempts after the first when SkyX cannot be reached
+TSXRetryBase = 0.05  # First retry delay, doubled at each retry up to TSXRetryCap, [s]
+TSXRetryCap = 0.5  # [s]
+
+_TSXTimeouts = threading.local()
+
+
+class TSXTimeoutScope:
+    #
+    # Sets the deadline of every command sent by the current thread inside a with block,
+    # including those sent by the helpers above. For example:
+    #
+    #   with TSXTimeoutScope(5):
+    #       getPosition()
+    #
+    def __init__(self, timeout):
+        self.timeout = timeout
+
+    def __enter__(self):
+        self._previous = getattr(_TSXTimeouts, "timeout", None)
+        _TSXTimeouts.timeout = self.timeout
+        return self
+
+    def __exit__(self, *exc_info):
+        _TSXTimeouts.timeout = self._previous
+
+
+def _TSXTimeoutFor(timeout):
+    #
+    # The deadline of a command: explicit argument, else the thread's scope, else TSXTimeout.
+    #
+    if timeout is None:
+        timeout = getattr(_TSXTimeouts, "timeout", None)
+    if timeout is None:
+        timeout = TSXTimeout
+    return timeout
+
+
+class TSXCircuitBreaker:
+    #
+    # After threshold failures in a row, a host is considered down: commands fail at
+    # once with TSXCircuitOpenError instead of each waiting on a dead connection. Every
+    # resetTimeout seconds one command is let through as a probe; its success closes
+    # the circuit again, so a restarted SkyX is picked up within resetTimeout.
+    #
+
+    def __init__(self, threshold=3, resetTimeout=0.25):
+        self.threshold = threshold
+        self.resetTimeout = resetTimeout  # [s]
+        self._failures = 0
+        self._openUntil = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self, name):
+        #
+        # Returns True when the command is let through as the probe.
+        #
+        with self._lock:
+            if self._failures < self.threshold:
+                return False
+            if self._probing or time.monotonic() < self._openUntil:
+                raise TSXCircuitOpenError(name + " is not answering, not sending.")
+            self._probing = True
+            return True
+
+    def success(self):
+        #
+        # Returns True if the host was down until now.
+        #
+        with self._lock:
+            recovered = self._failures >= self.threshold
+            self._failures = 0
+            self._probing = False
+        return recovered
+
+    def release(self):
+        #
+        # The probe ended without telling whether the host answers (see allow).
+        #
+        with self._lock:
+            self._probing = False
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._failures >= self.threshold:
+                self._openUntil = time.monotonic() + self.resetTimeout
+
+    @property
+    def isOpen(self):
+        return self._failures >= self.threshold
+
+
+_TSXBreakers = {}
+_TSXBreakersLock = threading.Lock()
+
+
+def TSXBreaker(host, port):
+    #
+    # The circuit breaker of one SkyX host, created on first use.
+    #
+    with _TSXBreakersLock:
+        breaker = _TSXBreakers.get((host, port))
+        if breaker is None:
+            breaker = _TSXBreakers[(host, port)] = TSXCircuitBreaker()
+        return breaker
+
+
+def _TSXRetryDelay(attempt):
+    return min(TSXRetryCap, TSXRetryBase * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+class TSXConnectionPool:
+    #
+    # Keeps the TCP connections to SkyX open between commands instead of paying a
+    # full handshake for every single property read or write.
+    #
+    # Connections are kept per (host, port) and a connection is only ever checked out
+    # by one caller at a time, so a single pool can be shared by all threads. Idle
+    # connections that the server closed in the meantime are dropped at checkout, and
+    # a command that cannot be sent over a dead keep-alive connection is sent again
+    # over a new one. Once sent, SkyX may have run it: it is never sent again.
+    #
+    # Failures are raised as TSXConnectionError or TSXTimeoutError.
+    #
+
+    def __init__(self, maxIdle=4):
+        self.maxIdle = maxIdle  # idle connections kept per host
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def checkout(self, host, port, timeout=None):
+        #
+        # Returns (socket, reused). A new connection is opened if no idle one is left.
+        #
+        with self._lock:
+            idle = self._idle.get((host, port))
+            while idle:
+                TSXSocket = idle.pop()
+                if _TSXSocketAlive(TSXSocket):
+                    return TSXSocket, True
+                TSXSocket.close()
+
+        if timeout is None:
+            timeout = TSXConnectTimeout
+        TSXSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        TSXSocket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        TSXSocket.settimeout(min(timeout, TSXConnectTimeout))
+        try:
+            TSXSocket.connect((host, port))
+        except OSError as error:
+            TSXSocket.close()
+            raise TSXConnectionError("Unable to establish a connection to " + host + ":" + str(port)
+                                     + ". Is SkyX running? Is the TCP Server Listening? (" + str(error) + ")") \
+                from error
+        return TSXSocket, False
+
+    def checkin(self, host, port, TSXSocket):
+        with self._lock:
+            idle = self._idle.setdefault((host, port), [])
+            if len(idle) < self.maxIdle:
+                idle.append(TSXSocket)
+                return
+        TSXSocket.close()
+
+    def close(self):
+        #
+        # Closes every idle connection, for example at the end of a session.
+        #
+        with self._lock:
+            for idle in self._idle.values():
+                for TSXSocket in idle:
+                    TSXSocket.close()
+            self._idle = {}
+
+    def exchange(self, host, port, fullMessage, timeout=None):
+        #
+        # Sends one packet and returns the raw reply bytes, within timeout seconds
+        # (TSXTimeout by default).
+        #
+        if timeout is None:
+            timeout = TSXTimeout
+        deadline = time.monotonic() + timeout
+        while True:
+            TSXSocket, reused = self.checkout(host, port, max(deadline - time.monotonic(), 0.001))
+            try:
+                TSXSocket.settimeout(max(deadline - time.monotonic(), 0.001))
+                TSXSocket.sendall(fullMessage)
+            except socket.timeout as error:
+                TSXSocket.close()
+                raise TSXTimeoutError("Unable to send to " + host + ":" + str(port) + " within "
+                                      + str(timeout) + " s.") from error
+            except OSError as error:
+                #
+                # SkyX only runs a whole packet: nothing ran, the command can be sent again.
+                #
+                TSXSocket.close()
+                if reused:
+                    continue
+                raise TSXConnectionError("Connection to " + host + ":" + str(port) + " lost: " + str(error)) \
+                    from error
+
+            try:
+                data = _TSXReceive(TSXSocket, deadline)
+            except socket.timeout as error:
+                TSXSocket.close()
+                raise TSXTimeoutError("No reply from " + host + ":" + str(port) + " within "
+                                      + str(timeout) + " s.") from error
+            except OSError as error:
+                TSXSocket.close()
+                raise TSXConnectionError("Connection to " + host + ":" + str(port) + " lost: " + str(error),
+                                         sent=True) from error
+
+            if not data:
+                TSXSocket.close()
+                raise TSXConnectionError("SkyX closed the connection without replying.", sent=True)
+
+            self.checkin(host, port, TSXSocket)
+            return data
+
+
+TSXTransport = TSXConnectionPool()  # Shared by TSXSend and TSXSendRemote
+
+
+def _TSXSocketAlive(TSXSocket):
+    #
+    # An idle connection must not have anything to read. If it does, the server either
+    # closed it (empty read) or left a stray reply behind; both make it unusable.
+    #
     try:
-        TSXSocket.connect((TSXHost, TSXPort))
-    except ConnectionRefusedError:
-        print("   ERROR: Unable to establish a connection.")
-        print("       Is SkyX running? Is the TCP Server Listening?")
-        sys.exit()
+        readable, _, _ = select.select([TSXSocket], [], [], 0)
+    except (OSError, ValueError):
+        return False
+    return not readable
+
+
+_TSXReplyEnd = re.compile(rb"\|[^|]*Error = -?\d+\.\s*$")
 
-    fullMessage = "/* Java Script */" + CR + "/* Socket Start Packet */" + CR + CR \
-                  + message + ";" \
-                  + CR + CR + "/* Socket End Packet */"
+TSXBufferSize = 16384  # Starting size of the per-thread reply buffer, it grows as needed
 
-    TSXSocket.send(fullMessage.encode())
-    data = TSXSocket.recv(BUFFER_SIZE)
+_TSXBuffers = threading.local()
 
+
+def _TSXReplyComplete(buffer, size):
     #
-    # This insanity is only needed because SkyX for Windows encodes non-standard ASCII characters
-    # in a different manner than the UNIX platforms which will detonate Python when it tries to handle
-    # the little circle used to indicate degrees in the getStats() function above.
+    # SkyX ends every reply with its error report ("|No error. Error = 0."). Only the
+    # tail of what has been received so far needs to be looked at.
     #
-    if sys.platform == "win32":
-        newData = data.decode("latin-1")
-    else:
-        newData = data.decode("latin-1")
-    # newData = data.decode("UTF-8")
+    return _TSXReplyEnd.search(buffer, max(0, size - 512), size) is not None
 
-    TSXSocket.close()
-    if verbose:
-        print()
-        print("---------------------------")
-        print("Content of TSX Java Script:")
-        print("---------------------------")
-        print()
-        print(fullMessage)
-        print()
-        print("--------------------------")
-        print("Content of Return Message:")
-        print("--------------------------")
-        print()
-        print(newData)
-        print()
-        print("--------------------------")
-        print()
 
+def _TSXReceive(TSXSocket, deadline=None):
+    #
+    # Reads a whole reply, however many TCP segments it arrives in, straight into a
+    # preallocated buffer (one per thread, reused from call to call). The buffer doubles
+    # when a reply does not fit. Reading stops at the end-of-reply marker or when the
+    # server closes the connection; socket.timeout is raised once deadline (a
+    # time.monotonic() value) has passed.
+    #
+    buffer = getattr(_TSXBuffers, "buffer", None)
+    if buffer is None:
+        buffer = _TSXBuffers.buffer = bytearray(TSXBufferSize)
+
+    view = memoryview(buffer)
+    size = 0
     try:
-        retOutput, retError = newData.split("|")
-    except ValueError:
-        print("    ERROR: No response. Looks like SkyX crashed.")
-        sys.exit()
+        while True:
+            if size == len(buffer):
+                view.release()
+                buffer.extend(bytes(len(buffer)))
+                view = memoryview(buffer)
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise socket.timeout("timed out")
+                TSXSocket.settimeout(remaining)
+            received = TSXSocket.recv_into(view[size:])
+            if not received:
+                break
+            size += received
+
+            if _TSXReplyComplete(buffer, size):
+                break
+
+        return bytes(view[:size])
+    finally:
+        view.release()
+
+
+def _TSXPacket(message):
+    #
+    # Wraps a script the way the SkyX TCP server expects it.
+    #
+    return "/* Java Script */" + CR + "/* Socket Start Packet */" + CR + CR \
+           + message + ";" \
+           + CR + CR + "/* Socket End Packet */"
+
+
+def _TSXVerbose(fullMessage, newData):
+    print()
+    print("---------------------------")
+    print("Content of TSX Java Script:")
+    print("---------------------------")
+    print()
+    print(fullMessage)
+    print()
+    print("--------------------------")
+    print("Content of Return Message:")
+    print("--------------------------")
+    print()
+    print(newData)
+    print()
+    print("--------------------------")
+    print()
+
+
+def _TSXParseReply(newData):
+    #
+    # Splits "output|error report" and returns the output, or the error report if
+    # SkyX reported one.
+    #
+    #
+    # Split on the last "|" only, the output itself may contain one.
+    #
+    retOutput, separator, retError = newData.rpartition("|")
+    if not separator:
+        raise TSXProtocolError("No response. Looks like SkyX crashed.")
 
     if "No error." not in retError:
         return retError
@@ -2121,62 +2511,757 @@ def TSXSend(message):
     return retOutput
 
 
-def TSXSendRemote(host, message):
+_TSXErrorReply = re.compile(r"^\w*Error: |Error = -?\d+\.\s*$")
+
+
+def _TSXIsError(reply):
     #
-    # This version sends the message to a remote host & port
+    # True for the error report _TSXParseReply hands back ("...Error = 21.") and for the
+    # text of an exception a batch slot caught ("TypeError: ..."), false for a value.
+    #
+    return _TSXErrorReply.search(reply) is not None
+
+
+def _TSXRoundTrip(host, port, message, encoding, timeout=None):
+    #
+    # Common body of TSXSend and TSXSendRemote.
+    #
+    # A command that could not be delivered (SkyX down or restarting) is retried up to
+    # TSXRetries times with a growing delay. A command that reached SkyX is never sent
+    # twice: a lost connection or a timeout after sending is raised to the caller.
+    #
+    fullMessage = _TSXPacket(message).encode()
+    timeout = _TSXTimeoutFor(timeout)
+    breaker = TSXBreaker(host, port)
+
+    start = time.perf_counter()
+    attempt = 0
+    while True:
+        probe = False
+        try:
+            probe = breaker.allow(host + ":" + str(port))
+            data = TSXTransport.exchange(host, port, fullMessage, timeout)
+            break
+        except TSXConnectionError as error:
+            if not isinstance(error, TSXCircuitOpenError):
+                breaker.failure()
+            if error.sent or attempt >= TSXRetries:
+                TSXStats.record(message, host, time.perf_counter() - start, len(fullMessage), 0, True)
+                raise
+        except TSXTimeoutError:
+            breaker.failure()
+            TSXStats.record(message, host, time.perf_counter() - start, len(fullMessage), 0, True)
+            raise
+        except BaseException:
+            # Not the host's fault (interrupted, replay mismatch...): another probe may go
+            if probe:
+                breaker.release()
+            TSXStats.record(message, host, time.perf_counter() - start, len(fullMessage), 0, True)
+            raise
+
+        time.sleep(_TSXRetryDelay(attempt))
+        attempt += 1
+
+    if breaker.success():
+        #
+        # SkyX is back, most likely restarted: what was cached about it may be stale.
+        #
+        TSXCache.invalidate(host + ":" + str(port))
+
+    newData = data.decode(encoding)
+
+    TSXStats.record(message, host, time.perf_counter() - start, len(fullMessage), len(data),
+                    "No error." not in newData.rpartition("|")[2])
+
+    if verbose:
+        _TSXVerbose(fullMessage.decode(), newData)
+
+    return _TSXParseReply(newData)
+
+
+def TSXSend(message, timeout=None):
+    #
+    # This function routes generic commands to TSX Pro through a TCP/IP port
+    #
+    # Raises a TSXError if SkyX cannot be reached or does not reply within timeout
+    # seconds (see TSXTimeout and TSXTimeoutScope).
+    #
+    # The code was originally written by Anat Ruangrassamee but was modified for Python 3
+    # and further cruded up by Ken Sturrock to make it more vebose and slower.
+    #
+    # Set the verbose flag up top to see the messages back & forth to SkyX for debugging
+    # purposes.
+    #
+    # The connection itself comes from TSXTransport and stays open for the next command.
+    #
+
+    #
+    # This insanity is only needed because SkyX for Windows encodes non-standard ASCII characters
+    # in a different manner than the UNIX platforms which will detonate Python when it tries to handle
+    # the little circle used to indicate degrees in the getStats() function above.
     #
+    return _TSXRoundTrip(TSXHost, TSXPort, message, "latin-1", timeout)
 
+
+def _TSXSplitHost(host):
+    #
+    # "XXX.XXX.XXX.XXX:YYYY" -> (address, port)
+    #
     if not ":" in host:
-        print("    ERROR: Remote port not set.")
-        print("           Please use XXX.XXX.XXX.XXX:YYYY format for IP address and port.")
-        sys.exit()
+        raise ValueError("Remote port not set. Please use XXX.XXX.XXX.XXX:YYYY format for IP address and port.")
+
+    remoteHost, remotePort = host.split(":")
 
-    TSXHost, TSXPort = host.split(":")
-    TSXPort = int(TSXPort)
+    return remoteHost, int(remotePort)
 
-    BUFFER_SIZE = 4096
 
-    TSXSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+if sys.platform == "win32":
+    _TSXRemoteEncoding = "latin-1"
+else:
+    _TSXRemoteEncoding = "UTF-8"
 
+
+def TSXSendRemote(host, message, timeout=None):
+    #
+    # This version sends the message to a remote host & port
+    #
+    remoteHost, remotePort = _TSXSplitHost(host)
+
+    return _TSXRoundTrip(remoteHost, remotePort, message, _TSXRemoteEncoding, timeout)
+
+
+def _TSXBatchScript(expressions):
+    #
+    # Builds one script that evaluates every expression in turn and returns all of the
+    # results as a JSON array of strings. An expression that throws does not stop the
+    # others; its slot holds the error text instead, as TSXSend would have returned it.
+    #
+    lines = ["var TSXBatchOut = [];"]
+    for expression in expressions:
+        expression = " ".join(expression.splitlines())
+        lines.append("try { TSXBatchOut.push(String(" + expression + ")); } "
+                     "catch (TSXBatchErr) { TSXBatchOut.push(String(TSXBatchErr)); }")
+    lines.append("JSON.stringify(TSXBatchOut)")
+    return CR.join(lines)
+
+
+def _TSXBatchResults(expressions, reply):
     try:
-        TSXSocket.connect((TSXHost, TSXPort))
-    except ConnectionRefusedError:
-        print("   ERROR: Unable to establish a connection.")
-        print("       Is SkyX running? Is the TCP Server Listening?")
-        sys.exit()
-
-    fullMessage = "/* Java Script */" + CR + "/* Socket Start Packet */" + CR + CR \
-                  + message + ";" \
-                  + CR + CR + "/* Socket End Packet */"
-
-    TSXSocket.send(fullMessage.encode())
-    data = TSXSocket.recv(BUFFER_SIZE)
-    if sys.platform == "win32":
-        newData = data.decode("latin-1")
-    else:
-        newData = data.decode("UTF-8")
+        results = json.loads(reply)
+    except ValueError:
+        results = None
 
-    TSXSocket.close()
-    if verbose:
-        print()
-        print("---------------------------")
-        print("Content of TSX Java Script:")
-        print("---------------------------")
-        print()
-        print(fullMessage)
-        print()
-        print("--------------------------")
-        print("Content of Return Message:")
-        print("--------------------------")
-        print()
-        print(newData)
-        print()
-        print("--------------------------")
-        print()
-
-    retOutput, retError = newData.split("|")
+    if not isinstance(results, list) or len(results) != len(expressions):
+        #
+        # The whole script failed, so every expression gets SkyX's error message.
+        #
+        return [reply] * len(expressions)
 
-    if "No error." not in retError:
-        return retError
+    return results
 
-    return retOutput
+
+def TSXSendBatch(expressions, timeout=None):
+    #
+    # Evaluates a list of expressions in a single round trip and returns their results
+    # as a list of strings, in order. Use it wherever a helper would otherwise call
+    # TSXSend several times in a row without looking at the answers in between.
+    #
+    # For example:
+    #
+    #   az, alt = TSXSendBatch(["sky6RASCOMTele.dAz", "sky6RASCOMTele.dAlt"])
+    #
+    return _TSXBatchResults(expressions, TSXSend(_TSXBatchScript(expressions), timeout))
+
+
+def TSXSendBatchRemote(host, expressions, timeout=None):
+    #
+    # This version sends the batch to a remote host & port
+    #
+    return _TSXBatchResults(expressions, TSXSendRemote(host, _TSXBatchScript(expressions), timeout))
+
+
+TSXWaitChunk = 2.0  # Longest a server-side wait keeps SkyX busy before handing back, [s]
+TSXWaitInterval = 0.1  # How often SkyX tests the condition of a server-side wait, [s]
+
+
+def _TSXWaitScript(condition, chunk, interval):
+    #
+    # Loops inside SkyX until condition is true or chunk seconds have passed, and
+    # answers "true" or "false". sky6Web.Sleep lets SkyX get on with the slew meanwhile.
+    #
+    condition = " ".join(condition.splitlines())
+    return CR.join([
+        "var TSXWaitEnd = new Date().getTime() + " + str(int(chunk * 1000)) + ";",
+        "while (!(" + condition + ") && new Date().getTime() < TSXWaitEnd) { sky6Web.Sleep("
+        + str(int(interval * 1000)) + "); }",
+        "(" + condition + ") ? \"true\" : \"false\"",
+    ])
+
+
+def TSXWaitUntil(condition, timeout=None, host=None, interval=None):
+    #
+    # Waits until the JavaScript expression condition is true in SkyX, on the local
+    # SkyX or on host ("XXX.XXX.XXX.XXX:YYYY"). Returns "true", or SkyX's error report
+    # if evaluating the condition failed (for example "Process aborted.").
+    #
+    # The polling loop runs inside SkyX, so the wait ends within interval seconds of
+    # the condition becoming true, for one round trip every TSXWaitChunk seconds.
+    # SkyX runs one script at a time, so the chunks are kept short: commands from
+    # other threads get through in between.
+    #
+    # Raises TSXTimeoutError after timeout seconds, waits for ever by default.
+    #
+    #   TSXWaitUntil("sky6RASCOMTele.IsSlewComplete != 0", 1200)
+    #
+    if interval is None:
+        interval = TSXWaitInterval
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    while True:
+        chunk = TSXWaitChunk
+        if deadline is not None:
+            chunk = max(0.0, min(chunk, deadline - time.monotonic()))
+        script = _TSXWaitScript(condition, chunk, interval)
+
+        if host is None:
+            reply = TSXSend(script, chunk + 10.0)
+        else:
+            reply = TSXSendRemote(host, script, chunk + 10.0)
+
+        if reply != "false":
+            return reply
+        if deadline is not None and time.monotonic() >= deadline:
+            raise TSXTimeoutError("Still waiting after " + str(timeout) + " s for " + condition)
+
+
+class TSXPropertyCache:
+    #
+    # Read-through cache for properties that do not change during a session, such as
+    # SelectedHardware.* or the filter names. Entries are kept per host and expire after
+    # their TTL; TSXInvalidateCache() drops them explicitly (new session, hardware
+    # change in SkyX, SkyX restart).
+    #
+    # Error replies are never cached.
+    #
+
+    def __init__(self, defaultTTL=3600.0):
+        self.defaultTTL = defaultTTL  # [s]
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, host, expression, fetch, ttl=None):
+        key = (host, expression)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[1] > now:
+            return entry[0]
+
+        value = fetch(expression)
+        self.put(host, expression, value, ttl)
+        return value
+
+    def put(self, host, expression, value, ttl=None):
+        if _TSXIsError(value):
+            return
+        if ttl is None:
+            ttl = self.defaultTTL
+        with self._lock:
+            self._entries[(host, expression)] = (value, time.monotonic() + ttl)
+
+    def invalidate(self, host=None, prefix=None):
+        #
+        # Drop every entry, or only those of one host and/or whose expression starts with prefix.
+        #
+        with self._lock:
+            if host is None and prefix is None:
+                self._entries = {}
+                return
+            for key in list(self._entries):
+                if (host is None or key[0] == host) and (prefix is None or key[1].startswith(prefix)):
+                    del self._entries[key]
+
+
+TSXCache = TSXPropertyCache()
+
+
+def TSXSendCached(message, ttl=None):
+    #
+    # TSXSend for a static property: only the first call in ttl seconds reaches SkyX.
+    #
+    return TSXCache.get(TSXHost + ":" + str(TSXPort), message, TSXSend, ttl)
+
+
+def TSXSendRemoteCached(host, message, ttl=None):
+    #
+    # This version reads the static property from a remote host & port
+    #
+    return TSXCache.get(host, message, lambda expression: TSXSendRemote(host, expression), ttl)
+
+
+def TSXInvalidateCache(prefix=None, host=None):
+    #
+    # Forget cached properties, all of them by default. host is "XXX.XXX.XXX.XXX:YYYY",
+    # use TSXHost + ":" + str(TSXPort) for the local SkyX.
+    #
+    TSXCache.invalidate(host, prefix)
+
+
+
+################# Fan-out ###################
+
+TSXFanOutWorkers = 8  # Threads used to talk to several hosts at once
+
+_TSXFanOutPool = None
+_TSXFanOutLock = threading.Lock()
+
+# TSXDispatcher whose job runs on this thread, passed on to the fan-out threads of that job
+_TSXDispatcherJob = threading.local()
+
+
+def _TSXFanOutExecutor():
+    global _TSXFanOutPool
+    with _TSXFanOutLock:
+        if _TSXFanOutPool is None:
+            _TSXFanOutPool = concurrent.futures.ThreadPoolExecutor(TSXFanOutWorkers, "TSXFanOut")
+        return _TSXFanOutPool
+
+
+def _TSXHostList(host):
+    #
+    # The *Remote helpers accept one "XXX.XXX.XXX.XXX:YYYY" host or a list of them.
+    #
+    if isinstance(host, str):
+        return [host]
+    return list(host)
+
+
+def TSXMap(hosts, function, *args):
+    #
+    # Calls function(host, *args) for every host at the same time and returns the
+    # results in the order of hosts. If one of the calls raises, the exception is
+    # re-raised once all of them have finished, so no rig is left half-commanded.
+    #
+    # For example, start an exposure on two rigs in lockstep:
+    #
+    #   TSXMap(["10.0.0.2:3040", "10.0.0.3:3040"], takeImageRemote, "Imager", "60", "NA", "0")
+    #
+    hosts = _TSXHostList(hosts)
+    if len(hosts) < 2 or threading.current_thread().name.startswith("TSXFanOut"):
+        #
+        # Nothing to overlap, or already inside a fan-out: waiting on the pool from
+        # one of its own threads could deadlock, so run in turn.
+        #
+        return [function(host, *args) for host in hosts]
+
+    #
+    # A dispatcher job waits here for the fan-out threads: the dispatcher calls they make
+    # run right away, like the ones of the job itself (see TSXDispatcher.submit).
+    #
+    dispatcher = getattr(_TSXDispatcherJob, "dispatcher", None)
+    if dispatcher is not None:
+        function = _TSXInDispatcherJob(dispatcher, function)
+
+    futures = [_TSXFanOutExecutor().submit(function, host, *args) for host in hosts]
+    concurrent.futures.wait(futures)
+    return [future.result() for future in futures]
+
+
+def _TSXInDispatcherJob(dispatcher, function):
+    def inJob(*args):
+        previous = getattr(_TSXDispatcherJob, "dispatcher", None)
+        _TSXDispatcherJob.dispatcher = dispatcher
+        try:
+            return function(*args)
+        finally:
+            _TSXDispatcherJob.dispatcher = previous
+    return inJob
+
+
+def TSXSendMulti(hosts, message):
+    #
+    # Sends the same message to every host in parallel, returns the replies in order.
+    #
+    return TSXMap(hosts, TSXSendRemote, message)
+
+
+def TSXSendBatchMulti(hosts, expressions):
+    #
+    # TSXSendBatchRemote on every host in parallel, returns one result list per host.
+    #
+    return TSXMap(hosts, TSXSendBatchRemote, expressions)
+
+
+def TSXWaitMulti(hosts, message, condition, minPoll=0.5, maxPoll=10.0, timeout=None, onChange=None):
+    #
+    # Polls message on every host until condition(reply) is true for all of them and
+    # returns {host: last reply}. Hosts that are done are no longer polled.
+    #
+    # The poll interval starts at minPoll and doubles up to maxPoll while no reply
+    # changes; any change brings it back to minPoll, since that is when a camera or a
+    # mount is most likely to finish. onChange(host, reply) is called for every new
+    # reply. Raises TSXTimeoutError if timeout seconds go by first.
+    #
+    # For example:
+    #
+    #   TSXWaitMulti(hosts, "ccdsoftCamera.Status", lambda status: status == "Ready")
+    #
+    pending = _TSXHostList(hosts)
+    replies = {}
+    poll = minPoll
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    while True:
+        changed = False
+        for host, reply in zip(pending, TSXSendMulti(pending, message)):
+            if replies.get(host) != reply:
+                changed = True
+                if onChange is not None:
+                    onChange(host, reply)
+            replies[host] = reply
+
+        pending = [host for host in pending if not condition(replies[host])]
+        if not pending:
+            return replies
+
+        poll = minPoll if changed else min(poll * 2, maxPoll)
+        if deadline is not None and time.monotonic() + poll > deadline:
+            raise TSXTimeoutError("Still waiting on " + ", ".join(pending) + " for " + message)
+        time.sleep(poll)
+
+################# Instrumentation ###################
+_TSXCommandName = re.compile(r"([A-Za-z_]\w*)\s*(?:\.|::)\s*([A-Za-z_]\w*)")
+
+
+def _TSXCommandKey(message):
+    #
+    # "sky6RASCOMTele.SetTracking(1, 0, 12, 3)" -> "sky6RASCOMTele.SetTracking". A batch
+    # is labelled with the commands it contains.
+    #
+    if message.startswith("var TSXBatchOut"):
+        names = []
+        for line in message.splitlines()[1:-1]:
+            match = _TSXCommandName.search(line, len("try { TSXBatchOut.push(String("))
+            if match and match.group(1) + "." + match.group(2) not in names:
+                names.append(match.group(1) + "." + match.group(2))
+        return "batch[" + ", ".join(names) + "]"
+
+    match = _TSXCommandName.search(message)
+    if match is None:
+        return message.strip()[:40]
+    return match.group(1) + "." + match.group(2)
+
+
+class _TSXCommandStats:
+    __slots__ = ("count", "errors", "total", "minimum", "maximum", "bytesOut", "bytesIn", "histogram")
+
+    def __init__(self, buckets):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.minimum = float("inf")
+        self.maximum = 0.0
+        self.bytesOut = 0
+        self.bytesIn = 0
+        self.histogram = [0] * buckets
+
+    def percentile(self, fraction):
+        #
+        # Upper bound of the histogram bucket holding the given fraction of the calls, [s]
+        #
+        threshold = fraction * self.count
+        seen = 0
+        for bucket, calls in enumerate(self.histogram):
+            seen += calls
+            if calls and seen >= threshold:
+                return min((1 << bucket) * 1e-6, self.maximum)
+        return self.maximum
+
+
+class TSXTrafficStats:
+    #
+    # Latency histograms, byte counts and error counts per SkyX command, plus a sample
+    # of the slowest calls. TSXSend, TSXSendRemote and the asyncio client feed it.
+    #
+    # Histogram buckets are powers of two in microseconds (bucket i holds calls up to
+    # 2^i us), so recording a call costs a dictionary lookup and a few additions.
+    #
+    BUCKETS = 26  # the last bucket holds everything above 2^24 us (~17 s)
+
+    def __init__(self, slowCall=0.5, slowSamples=200):
+        self.enabled = True
+        self.slowCall = slowCall  # calls slower than this are sampled, [s]
+        self.slowCalls = collections.deque(maxlen=slowSamples)
+        self._commands = {}
+        self._keys = {}
+        self._lock = threading.Lock()
+        self._started = time.time()
+
+    def record(self, message, host, latency, bytesOut, bytesIn, error):
+        if not self.enabled:
+            return
+
+        key = self._keys.get(message)
+        if key is None:
+            key = _TSXCommandKey(message)
+            if len(self._keys) < 4096:
+                self._keys[message] = key
+
+        bucket = min(int(latency * 1e6).bit_length(), self.BUCKETS - 1)
+        with self._lock:
+            entry = self._commands.get(key)
+            if entry is None:
+                entry = self._commands[key] = _TSXCommandStats(self.BUCKETS)
+            entry.count += 1
+            entry.errors += bool(error)
+            entry.total += latency
+            entry.minimum = min(entry.minimum, latency)
+            entry.maximum = max(entry.maximum, latency)
+            entry.bytesOut += bytesOut
+            entry.bytesIn += bytesIn
+            entry.histogram[bucket] += 1
+
+        if latency >= self.slowCall:
+            self.slowCalls.append({"time": time.strftime("%H:%M:%S"), "host": host, "command": key,
+                                   "latency_ms": round(latency * 1e3, 3), "script": message[:300]})
+
+    def reset(self):
+        with self._lock:
+            self._commands = {}
+            self.slowCalls.clear()
+            self._started = time.time()
+
+    def summary(self):
+        #
+        # One dictionary per command, slowest total time first.
+        #
+        with self._lock:
+            items = [(key, entry) for key, entry in self._commands.items()]
+
+        rows = []
+        for key, entry in sorted(items, key=lambda item: -item[1].total):
+            rows.append({
+                "command": key,
+                "count": entry.count,
+                "errors": entry.errors,
+                "total_s": round(entry.total, 6),
+                "mean_ms": round(entry.total / entry.count * 1e3, 3),
+                "min_ms": round(entry.minimum * 1e3, 3),
+                "p50_ms": round(entry.percentile(0.5) * 1e3, 3),
+                "p90_ms": round(entry.percentile(0.9) * 1e3, 3),
+                "p99_ms": round(entry.percentile(0.99) * 1e3, 3),
+                "max_ms": round(entry.maximum * 1e3, 3),
+                "bytes_out": entry.bytesOut,
+                "bytes_in": entry.bytesIn,
+                "histogram_us": {str(1 << bucket): calls for bucket, calls in enumerate(entry.histogram) if calls},
+            })
+        return rows
+
+    def report(self):
+        #
+        # Print the summary as a table.
+        #
+        print("%-48s %7s %6s %10s %9s %9s %9s" % ("Command", "Calls", "Errors", "Total (s)", "Mean (ms)",
+                                                 "p90 (ms)", "Max (ms)"))
+        for row in self.summary():
+            print("%-48s %7d %6d %10.3f %9.2f %9.2f %9.2f" % (row["command"][:48], row["count"], row["errors"],
+                                                             row["total_s"], row["mean_ms"], row["p90_ms"],
+                                                             row["max_ms"]))
+        if self.slowCalls:
+            print(str(len(self.slowCalls)) + " calls slower than " + str(self.slowCall) + " s sampled.")
+
+    def export(self, path, extra=None):
+        #
+        # Write everything to a JSON file, for example at the end of a session. extra is
+        # a dictionary of other sections to save alongside (e.g. dispatcher metrics).
+        #
+        content = {"started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self._started)),
+                   "duration_s": round(time.time() - self._started, 3),
+                   "commands": self.summary(),
+                   "slow_calls": list(self.slowCalls)}
+        content.update(extra or {})
+        with open(path, "w") as statsFile:
+            json.dump(content, statsFile, indent=1)
+
+
+TSXStats = TSXTrafficStats()
+
+
+################# Dispatcher ###################
+
+TSXPriorityAbort = 0  # Stopping the mount, aborts
+TSXPriorityMount = 10  # Slews, tracking rates, position reads
+TSXPriorityCamera = 20  # Exposures and camera settings
+TSXPriorityFocus = 30  # Focuser moves
+TSXPriorityHousekeeping = 40  # Connections, settings, everything else
+
+_TSXPriorityNames = {TSXPriorityAbort: "abort", TSXPriorityMount: "mount", TSXPriorityCamera: "camera",
+                     TSXPriorityFocus: "focus", TSXPriorityHousekeeping: "housekeeping"}
+
+
+class TSXDispatcher:
+    #
+    # Runs the SkyX jobs of all the threads of a program on a single thread, most urgent
+    # first, so that command sequences sent by different threads never interleave
+    # inside SkyX. A job is any callable, usually one of the helpers above, and a whole
+    # sequence (a slew, setting up the camera) should be submitted as one job. Jobs of
+    # the same priority run in the order they were submitted.
+    #
+    # A running job is never interrupted: an abort waits for the job in progress, then
+    # goes ahead of everything still queued. Long waits are best split in short jobs
+    # (see TSXWaitChunk) so that urgent work gets in between.
+    #
+    # A job runs with the TSXTimeoutScope of the thread that submitted it.
+    #
+    # A job may call the dispatcher, from its own thread or from the TSXMap threads it
+    # fans out to (TSXSendMulti, TSXWaitMulti...): these calls run right away instead of
+    # being queued behind the job, which waits for them. Any other thread a job starts
+    # must not call the dispatcher while the job waits for it, that would deadlock.
+    #
+    #   dispatcher = TSXDispatcher()
+    #   position = dispatcher.submit(TSXPriorityMount, getPosition)   # a Future
+    #   ra, dec, az, alt = position.result()
+    #
+
+    def __init__(self, name="TSXDispatcher"):
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._waits = {}
+        self._runs = {}
+        self._closed = False
+        self.maxDepth = 0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, priority, function, *args, **kwargs):
+        #
+        # Queue function(*args, **kwargs) and return a concurrent.futures.Future of its result.
+        #
+        future = concurrent.futures.Future()
+        timeout = getattr(_TSXTimeouts, "timeout", None)
+
+        if threading.current_thread() is self._thread or getattr(_TSXDispatcherJob, "dispatcher", None) is self:
+            #
+            # A job submitting a job, or one of its fan-out threads: waiting for it would
+            # deadlock, it runs right away.
+            #
+            self._execute(priority, time.perf_counter(), timeout, future, function, args, kwargs)
+            return future
+
+        with self._lock:
+            # Under the lock, so that nothing is queued behind the end marker of close()
+            if self._closed:
+                raise RuntimeError("The dispatcher is closed.")
+            self._queue.put((priority, next(self._sequence), time.perf_counter(), timeout, future, function, args,
+                             kwargs))
+            self.maxDepth = max(self.maxDepth, self._queue.qsize())
+        return future
+
+    def call(self, priority, function, *args, **kwargs):
+        #
+        # submit() and wait for the result. Exceptions of the job are raised here.
+        #
+        return self.submit(priority, function, *args, **kwargs).result()
+
+    def send(self, message, priority=TSXPriorityHousekeeping):
+        #
+        # TSXSend as a job, returns a Future of the reply.
+        #
+        return self.submit(priority, TSXSend, message)
+
+    @property
+    def depth(self):
+        #
+        # Number of jobs waiting.
+        #
+        return self._queue.qsize()
+
+    def close(self, wait=True):
+        #
+        # Run what is already queued, then stop the dispatcher thread.
+        #
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put((float("inf"), next(self._sequence), 0.0, None, None, None, None, None))
+        if wait and threading.current_thread() is not self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            priority, _, queued, timeout, future, function, args, kwargs = self._queue.get()
+            if function is None:
+                return
+            self._execute(priority, queued, timeout, future, function, args, kwargs)
+
+    def _execute(self, priority, queued, timeout, future, function, args, kwargs):
+        if not future.set_running_or_notify_cancel():
+            return
+
+        started = time.perf_counter()
+        previous = getattr(_TSXDispatcherJob, "dispatcher", None)
+        _TSXDispatcherJob.dispatcher = self
+        try:
+            with TSXTimeoutScope(timeout):
+                result = function(*args, **kwargs)
+        except BaseException as error:
+            #
+            # SystemExit included: whatever a job raises is for the submitting thread
+            # to act on, not the dispatcher.
+            #
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+        finally:
+            _TSXDispatcherJob.dispatcher = previous
+        finished = time.perf_counter()
+
+        self._record(self._waits, priority, started - queued)
+        self._record(self._runs, priority, finished - started)
+
+    def _record(self, table, priority, duration):
+        bucket = min(int(duration * 1e6).bit_length(), TSXTrafficStats.BUCKETS - 1)
+        with self._lock:
+            entry = table.get(priority)
+            if entry is None:
+                entry = table[priority] = _TSXCommandStats(TSXTrafficStats.BUCKETS)
+            entry.count += 1
+            entry.total += duration
+            entry.minimum = min(entry.minimum, duration)
+            entry.maximum = max(entry.maximum, duration)
+            entry.histogram[bucket] += 1
+
+    def summary(self):
+        #
+        # Queue depth, and time spent waiting in the queue and running, per priority.
+        #
+        with self._lock:
+            priorities = sorted(self._waits)
+            rows = []
+            for priority in priorities:
+                wait = self._waits[priority]
+                run = self._runs[priority]
+                rows.append({
+                    "priority": _TSXPriorityNames.get(priority, str(priority)),
+                    "jobs": wait.count,
+                    "wait_mean_ms": round(wait.total / wait.count * 1e3, 3),
+                    "wait_p90_ms": round(wait.percentile(0.9) * 1e3, 3),
+                    "wait_max_ms": round(wait.maximum * 1e3, 3),
+                    "run_mean_ms": round(run.total / run.count * 1e3, 3),
+                    "run_max_ms": round(run.maximum * 1e3, 3),
+                })
+        return {"depth": self.depth, "max_depth": self.maxDepth, "priorities": rows}
+
+    def report(self):
+        #
+        # Print the summary as a table.
+        #
+        summary = self.summary()
+        print("Queue depth: " + str(summary["depth"]) + " (max " + str(summary["max_depth"]) + ")")
+        print("%-14s %7s %10s %10s %10s %10s" % ("Priority", "Jobs", "Wait (ms)", "p90 (ms)", "Max (ms)",
+                                                 "Run (ms)"))
+        for row in summary["priorities"]:
+            print("%-14s %7d %10.2f %10.2f %10.2f %10.2f" % (row["priority"], row["jobs"], row["wait_mean_ms"],
+                                                             row["wait_p90_ms"], row["wait_max_ms"],
+                                                             row["run_mean_ms"]))
@@ -0,0 +1,1073 @@
+'''
+Local stand-in for the TheSkyX TCP server, for offline development and benchmarks.
+
+It listens like TheSkyX (port 3040 by default), accepts the same
+"/* Java Script */ ... /* Socket End Packet */" packets and answers with
+"output|No error. Error = 0.". Behind it sits a stateful model of:
+
+    - sky6RASCOMTele : slews take time, tracking rates move RA/Dec, Az/Alt follow the sky
+    - ccdsoftCamera  : exposures take (simulated) time and write small FITS files
+    - the filter wheel and the focuser of ccdsoftCamera
+    - ccdsoftAutoguider, SelectedHardware and a few other objects used by PySkyX_ks
+
+Scripts are evaluated by a small interpreter for the subset of JavaScript that
+PySkyX_ks sends: property reads and writes, method calls, literals, the usual
+operators, "var" declarations, "while" loops, new Date() and the TSXSendBatch
+and TSXWaitUntil packets. Anything else is
+answered with an error, like TheSkyX would for a broken script.
+
+Run it with:  python PySkyX_sim.py [--port 3040] [--speed 1]
+then point PySkyX_ks.TSXHost / TSXPort at it.
+'''
+import argparse
+import json
+import math
+import os
+import random
+import re
+import socket
+import socketserver
+import struct
+import tempfile
+import threading
+import time
+
+from PySkyX_ks import _TSXBatchScript
+
+END_PACKET = b"/* Socket End Packet */"
+START_PACKET = "/* Socket Start Packet */"
+
+SIDEREAL_RATE = 1.00273790935  # sidereal seconds per solar second
+
+
+class SimError(Exception):
+    '''
+    Error raised by a script, reported the way TheSkyX reports its own errors.
+    '''
+    def __init__(self, message, code=1, kind="Error"):
+        super().__init__(message)
+        self.code = code
+        self.kind = kind
+
+    def __str__(self):
+        return self.kind + ": " + self.args[0] + " Error = " + str(self.code) + "."
+
+
+#--------------## JavaScript subset ##-------------
+def js_string(value):
+    '''
+    String(value) as JavaScript would print it.
+    '''
+    if value is None:
+        return "undefined"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, float):
+        if value != value:
+            return "NaN"
+        if value.is_integer() and abs(value) < 1e21:
+            return str(int(value))
+        return repr(value)
+    return str(value)
+
+
+def js_number(value):
+    if isinstance(value, bool):
+        return 1 if value else 0
+    if isinstance(value, (int, float)):
+        return value
+    if value is None:
+        return float("nan")
+    try:
+        return float(value) if str(value).strip() else 0
+    except ValueError:
+        return float("nan")
+
+
+def js_truthy(value):
+    if isinstance(value, str):
+        return value != ""
+    if isinstance(value, float) and value != value:
+        return False
+    return bool(value)
+
+
+def js_equal(a, b):
+    if isinstance(a, (int, float, bool)) and isinstance(b, (str, int, float, bool)) \
+            or isinstance(b, (int, float, bool)) and isinstance(a, str):
+        return js_number(a) == js_number(b)
+    return a == b
+
+
+_TOKEN = re.compile(r'''
+    \s*(?:
+        (?P<number>\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)
+      | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+      | (?P<name>[A-Za-z_$][\w$]*)
+      | (?P<op>===|!==|==|!=|<=|>=|&&|\|\||::|[-+*/%<>!?:.,()=\[\]])
+    )''', re.VERBOSE)
+
+
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "0": "\0"}
+
+
+def _tokenize(source):
+    tokens = []
+    position = 0
+    source = source.rstrip()
+    while position < len(source):
+        match = _TOKEN.match(source, position)
+        if not match or match.end() == position:
+            raise SimError("Parse error near '" + source[position:position + 20] + "'", 1, "SyntaxError")
+        position = match.end()
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == "string":
+            text = re.sub(r"\\(.)", lambda escape: _ESCAPES.get(escape.group(1), escape.group(1)), text[1:-1])
+        elif kind == "number":
+            text = float(text) if re.search(r"[.eE]", text) else int(text)
+        tokens.append((kind, text))
+    return tokens
+
+
+class _Parser:
+    '''
+    Recursive descent parser producing a small tuple-based syntax tree.
+    '''
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.index = 0
+
+    def peek(self, text=None):
+        if self.index >= len(self.tokens):
+            return None
+        token = self.tokens[self.index]
+        if text is not None:
+            return token if token[0] in ("op", "name") and token[1] == text else None
+        return token
+
+    def take(self, text=None):
+        token = self.peek(text)
+        if token is None:
+            expected = text if text is not None else "an expression"
+            raise SimError("Expected " + expected, 1, "SyntaxError")
+        self.index += 1
+        return token
+
+    def done(self):
+        return self.index >= len(self.tokens)
+
+    def expression(self):
+        node = self.assignment()
+        while self.peek(","):
+            self.take(",")
+            node = ("comma", node, self.assignment())
+        return node
+
+    def assignment(self):
+        node = self.ternary()
+        if self.peek("="):
+            self.take("=")
+            if node[0] not in ("member", "name"):
+                raise SimError("Invalid assignment", 1, "SyntaxError")
+            node = ("assign", node, self.assignment())
+        return node
+
+    def ternary(self):
+        node = self.binary(0)
+        if self.peek("?"):
+            self.take("?")
+            then = self.assignment()
+            self.take(":")
+            node = ("ternary", node, then, self.assignment())
+        return node
+
+    _LEVELS = (("||",), ("&&",), ("==", "!=", "===", "!=="), ("<", ">", "<=", ">="), ("+", "-"), ("*", "/", "%"))
+
+    def binary(self, level):
+        if level == len(self._LEVELS):
+            return self.unary()
+        node = self.binary(level + 1)
+        while True:
+            token = self.peek()
+            if token is None or token[0] != "op" or token[1] not in self._LEVELS[level]:
+                return node
+            self.take()
+            node = ("binary", token[1], node, self.binary(level + 1))
+
+    def unary(self):
+        token = self.peek()
+        if token is not None and token[0] == "op" and token[1] in ("!", "-", "+"):
+            self.take()
+            return ("unary", token[1], self.unary())
+        return self.postfix()
+
+    def postfix(self):
+        node = self.primary()
+        while True:
+            if self.peek(".") or self.peek("::"):
+                self.take()
+                kind, name = self.take()
+                if kind != "name":
+                    raise SimError("Expected a property name", 1, "SyntaxError")
+                node = ("member", node, name)
+            elif self.peek("("):
+                self.take("(")
+                args = []
+                while not self.peek(")"):
+                    args.append(self.assignment())
+                    if not self.peek(")"):
+                        self.take(",")
+                self.take(")")
+                node = ("call", node, args)
+            elif self.peek("["):
+                self.take("[")
+                index = self.expression()
+                self.take("]")
+                node = ("index", node, index)
+            else:
+                return node
+
+    def primary(self):
+        kind, value = self.take()
+        if kind in ("number", "string"):
+            return ("literal", value)
+        if kind == "name":
+            if value == "new":
+                # new Date() builds the same object as calling Date()
+                return self.postfix()
+            if value in ("true", "false"):
+                return ("literal", value == "true")
+            if value in ("undefined", "null"):
+                return ("literal", None)
+            return ("name", value)
+        if value == "(":
+            node = self.expression()
+            self.take(")")
+            return node
+        if value == "[":
+            items = []
+            while not self.peek("]"):
+                items.append(self.assignment())
+                if not self.peek("]"):
+                    self.take(",")
+            self.take("]")
+            return ("array", items)
+        raise SimError("Unexpected '" + str(value) + "'", 1, "SyntaxError")
+
+
+class _Method:
+    '''
+    A method looked up on an object, waiting to be called.
+    '''
+    def __init__(self, function):
+        self.function = function
+
+    def __call__(self, *args):
+        return self.function(*args)
+
+
+_WHILE = re.compile(r"^while\s*\((.*)\)\s*\{(.*)\}$", re.S)
+
+
+class _Interpreter:
+    def __init__(self, scope):
+        self.scope = scope
+        self.variables = {}
+
+    def run(self, script):
+        '''
+        Evaluate every statement of the script and return the value of the last one.
+        '''
+        result = None
+        for statement in _split_statements(script):
+            loop = _WHILE.match(statement)
+            if loop:
+                condition = _Parser(_tokenize(loop.group(1))).expression()
+                while js_truthy(self.evaluate(condition)):
+                    self.run(loop.group(2))
+                result = None
+                continue
+            if statement.startswith("var "):
+                tokens = _tokenize(statement[4:])
+                parser = _Parser(tokens)
+                name = parser.take()[1]
+                value = None
+                if parser.peek("="):
+                    parser.take("=")
+                    value = self.evaluate(parser.expression())
+                self.variables[name] = value
+                result = None
+                continue
+            parser = _Parser(_tokenize(statement))
+            node = parser.expression()
+            if not parser.done():
+                raise SimError("Unexpected '" + str(parser.peek()[1]) + "'", 1, "SyntaxError")
+            result = self.evaluate(node)
+        return result
+
+    def evaluate(self, node):
+        kind = node[0]
+        if kind == "literal":
+            return node[1]
+        if kind == "name":
+            if node[1] in self.variables:
+                return self.variables[node[1]]
+            if node[1] in self.scope:
+                return self.scope[node[1]]
+            raise SimError("Can't find variable: " + node[1], 21, "ReferenceError")
+        if kind == "member":
+            return _get_member(self.evaluate(node[1]), node[2])
+        if kind == "index":
+            return self.evaluate(node[1])[int(js_number(self.evaluate(node[2])))]
+        if kind == "array":
+            return [self.evaluate(item) for item in node[1]]
+        if kind == "call":
+            function = self.evaluate(node[1])
+            if not callable(function):
+                raise SimError("Result of expression is not a function", 21, "TypeError")
+            return function(*[self.evaluate(arg) for arg in node[2]])
+        if kind == "assign":
+            value = self.evaluate(node[2])
+            target = node[1]
+            if target[0] == "name":
+                self.variables[target[1]] = value
+            else:
+                owner = self.evaluate(target[1])
+                if not isinstance(owner, SimObject):
+                    raise SimError("Cannot assign to a property of a value", 21, "TypeError")
+                owner.set(target[2], value)
+            return value
+        if kind == "comma":
+            self.evaluate(node[1])
+            return self.evaluate(node[2])
+        if kind == "ternary":
+            return self.evaluate(node[2] if js_truthy(self.evaluate(node[1])) else node[3])
+        if kind == "unary":
+            value = self.evaluate(node[2])
+            if node[1] == "!":
+                return not js_truthy(value)
+            return -js_number(value) if node[1] == "-" else js_number(value)
+        if kind == "binary":
+            return self.binary(node[1], node[2], node[3])
+        raise SimError("Unsupported expression", 1, "SyntaxError")
+
+    def binary(self, op, left_node, right_node):
+        left = self.evaluate(left_node)
+        if op == "&&":
+            return self.evaluate(right_node) if js_truthy(left) else left
+        if op == "||":
+            return left if js_truthy(left) else self.evaluate(right_node)
+        right = self.evaluate(right_node)
+        if op == "+":
+            if isinstance(left, str) or isinstance(right, str):
+                return js_string(left) + js_string(right)
+            return js_number(left) + js_number(right)
+        if op in ("==", "==="):
+            return js_equal(left, right) if op == "==" else left == right and type(left) == type(right)
+        if op in ("!=", "!=="):
+            return not js_equal(left, right) if op == "!=" else not (left == right and type(left) == type(right))
+        left, right = js_number(left), js_number(right)
+        if op == "-":
+            return left - right
+        if op == "*":
+            return left * right
+        if op == "/":
+            return left / right if right else (float("nan") if not left else math.copysign(float("inf"), left))
+        if op == "%":
+            return math.fmod(left, right) if right else float("nan")
+        return {"<": left < right, ">": left > right, "<=": left <= right, ">=": left >= right}[op]
+
+
+def _get_member(owner, name):
+    if isinstance(owner, SimObject):
+        return owner.get(name)
+    if isinstance(owner, (int, float)) and not isinstance(owner, bool):
+        if name == "toFixed":
+            return _Method(lambda digits=0: "%.*f" % (int(js_number(digits)), owner))
+        if name == "toString":
+            return _Method(lambda: js_string(owner))
+    if isinstance(owner, str):
+        if name == "length":
+            return len(owner)
+        if name == "toString":
+            return _Method(lambda: owner)
+    if isinstance(owner, list) and name == "length":
+        return len(owner)
+    if owner is None:
+        raise SimError("Result of expression is undefined", 21, "TypeError")
+    return None
+
+
+def _split_statements(script):
+    '''
+    Split a script on top-level ";" and line breaks, outside strings and brackets.
+    '''
+    script = re.sub(r"/\*.*?\*/", "", script, flags=re.S)
+    statements = []
+    current = []
+    depth = 0
+    quote = None
+    escaped = False
+    for char in script:
+        if quote:
+            current.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote = None
+            continue
+        if char in "\"'":
+            quote = char
+        elif char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+        elif char in ";\n" and depth <= 0:
+            statement = "".join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+            continue
+        current.append(char)
+    statement = "".join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+
+_BATCH_HEADER = _TSXBatchScript([]).splitlines()[0]
+_BATCH_ITEM = re.compile(r"^try \{ TSXBatchOut\.push\(String\((.*)\)\); \} catch")
+
+
+#--------------## Objects ##-------------
+class SimObject:
+    '''
+    Base of the scriptable objects. Properties are plain values in self.props, or
+    get_<name>/set_<name> methods when reading or writing them has side effects.
+    Methods callable from scripts are named js_<name>.
+    '''
+    def __init__(self, sim, props=None):
+        self.sim = sim
+        self.props = dict(props or {})
+
+    def get(self, name):
+        getter = getattr(self, "get_" + name, None)
+        if getter is not None:
+            return getter()
+        method = getattr(self, "js_" + name, None)
+        if method is not None:
+            return _Method(method)
+        return self.props.get(name)
+
+    def set(self, name, value):
+        setter = getattr(self, "set_" + name, None)
+        if setter is not None:
+            setter(value)
+        else:
+            self.props[name] = value
+
+
+class SimMount(SimObject):
+    '''
+    sky6RASCOMTele. The position is stored as (ra, dec) at a reference time and moved
+    forward on demand: slews run at slewSpeed, tracking applies the custom rates, and
+    with tracking off the mount stays fixed in hour angle.
+    '''
+    def __init__(self, sim, slewSpeed=4.0):
+        super().__init__(sim, {"Asynchronous": 0, "dAz": 0, "dAlt": 0, "dRa": 0, "dDec": 0,
+                               "DoCommandOutput": "0"})
+        self.slewSpeed = slewSpeed  # [deg/s]
+        self.connected = 1
+        self.parked = False
+        self.tracking = 1
+        self.raRate = 0.0  # [arcsec/s]
+        self.decRate = 0.0  # [arcsec/s]
+        self.slew = None  # (start time, end time, from (ra, dec), to (ra, dec))
+        now = sim.now()
+        lst = sim.lst_hours(now)
+        self.reference = (now, lst, sim.latitude - 10.0)  # start pointing 10 deg south of the zenith
+
+    # Position model
+    def position(self, t=None):
+        t = self.sim.now() if t is None else t
+        if self.slew is not None:
+            start, end, origin, target = self.slew
+            if t < end:
+                fraction = (t - start) / (end - start)
+                dra = ((target[0] - origin[0] + 12) % 24) - 12
+                return (origin[0] + dra * fraction) % 24, origin[1] + (target[1] - origin[1]) * fraction
+            self.reference = (end, target[0], target[1])
+            self.slew = None
+        t0, ra, dec = self.reference
+        dt = t - t0
+        if self.parked:
+            return ra, dec
+        if not self.tracking:
+            ra += dt * SIDEREAL_RATE / 3600.0
+        else:
+            ra += self.raRate * dt / 3600.0 / 15.0
+            dec += self.decRate * dt / 3600.0
+        dec = max(-90.0, min(90.0, dec))
+        return ra % 24, dec
+
+    def freeze(self):
+        '''
+        Restart the position model from the current position, before any change of mode.
+        '''
+        now = self.sim.now()
+        ra, dec = self.position(now)
+        if self.slew is None:
+            self.reference = (now, ra, dec)
+
+    def start_slew(self, ra, dec):
+        self.freeze()
+        now = self.sim.now()
+        origin = self.position(now)
+        distance = max(abs(((ra - origin[0] + 12) % 24) - 12) * 15.0, abs(dec - origin[1]))
+        self.slew = (now, now + max(distance / self.slewSpeed, 0.5), origin, (ra % 24, dec))
+        self.tracking = 1
+        self.raRate = self.decRate = 0.0
+        if not js_truthy(self.props["Asynchronous"]):
+            self.sim.sleep(self.slew[1] - now)
+        return 0
+
+    # Scriptable interface
+    def js_Connect(self):
+        self.connected = 1
+        return 0
+
+    def js_Disconnect(self):
+        self.connected = 0
+        return 0
+
+    def get_IsConnected(self):
+        return self.connected
+
+    def js_IsParked(self):
+        return self.parked
+
+    def js_Park(self):
+        self.freeze()
+        self.parked = True
+        self.connected = 0
+        return 0
+
+    def js_ParkAndDoNotDisconnect(self):
+        self.freeze()
+        self.parked = True
+        return 0
+
+    def js_Unpark(self):
+        self.freeze()
+        self.parked = False
+        return 0
+
+    def js_FindHome(self):
+        return 0
+
+    def get_IsTracking(self):
+        return self.tracking
+
+    def js_SetTracking(self, on, ignoreRates, raRate=0, decRate=0):
+        self.freeze()
+        self.tracking = 1 if js_truthy(on) else 0
+        if js_truthy(ignoreRates):
+            self.raRate = self.decRate = 0.0
+        else:
+            self.raRate = float(js_number(raRate))
+            self.decRate = float(js_number(decRate))
+        return 0
+
+    def get_dRaTrackingRate(self):
+        return self.raRate
+
+    def get_dDecTrackingRate(self):
+        return self.decRate
+
+    def js_SlewToRaDec(self, ra, dec, name=""):
+        if self.parked:
+            raise SimError("Mount is parked.", 216)
+        return self.start_slew(float(js_number(ra)), float(js_number(dec)))
+
+    def js_SlewToAzAlt(self, az, alt, name=""):
+        if self.parked:
+            raise SimError("Mount is parked.", 216)
+        ra, dec = self.sim.radec_from_azalt(float(js_number(az)), float(js_number(alt)), self.sim.now())
+        return self.start_slew(ra, dec)
+
+    def get_IsSlewComplete(self):
+        self.position()
+        return 0 if self.slew is not None else 1
+
+    def js_Abort(self):
+        if self.slew is not None:
+            now = self.sim.now()
+            ra, dec = self.position(now)
+            self.slew = None
+            self.reference = (now, ra, dec)
+        return 0
+
+    def js_Sync(self, ra, dec, name=""):
+        self.reference = (self.sim.now(), float(js_number(ra)), float(js_number(dec)))
+        self.slew = None
+        return 0
+
+    def js_GetRaDec(self):
+        self.props["dRa"], self.props["dDec"] = self.position()
+        return 0
+
+    def js_GetAzAlt(self):
+        now = self.sim.now()
+        ra, dec = self.position(now)
+        self.props["dAz"], self.props["dAlt"] = self.sim.azalt_from_radec(ra, dec, now)
+        return 0
+
+    def js_Jog(self, arcminutes, direction):
+        self.freeze()
+        t0, ra, dec = self.reference
+        step = float(js_number(arcminutes)) / 60.0
+        if direction in ("N", "S"):
+            dec += step if direction == "N" else -step
+        else:
+            ra += (step if direction == "E" else -step) / 15.0
+        self.reference = (t0, ra % 24, dec)
+        return 0
+
+    def js_DoCommand(self, command, argument=""):
+        self.props["DoCommandOutput"] = "0"
+        return 0
+
+
+class SimCamera(SimObject):
+    '''
+    ccdsoftCamera (or ccdsoftAutoguider with guider=True), with its filter wheel and focuser.
+    '''
+    def __init__(self, sim, guider=False):
+        super().__init__(sim, {"ExposureTime": 1, "BinX": 1, "BinY": 1, "Asynchronous": 0,
+                               "AutoSaveOn": 1, "ImageReduction": 0, "Frame": 1, "Subframe": 0,
+                               "Delay": 0, "ImageUseDigitizedSkySurvey": 0, "TemperatureSetPoint": 0,
+                               "AutoguiderExposureTime": 1, "TrackBoxX": 32, "TrackBoxY": 32})
+        self.guider = guider
+        self.connected = 0
+        self.exposure = None  # (end time, exposure length)
+        self.lastImage = ""
+        self.filterConnected = 0
+        self.filterIndex = 0
+        self.filterNames = ["Clear", "Red", "Green", "Blue", "Ha", "OIII", "SII", "Lum"]
+        self.focuserConnected = 0
+        self.focuserPosition = 5000
+        self.guiding = False
+        self.settings = {"m_csObserver": "chazelas", "m_dTeleFocalLength": 2200,
+                         "m_csAutoSavePath": sim.imageDir, "m_csAutoSaveColonaDateFormat": "yyyy-mm-dd"}
+
+    def finish_exposure(self):
+        '''
+        Write the image of an exposure that has run its course.
+        '''
+        if self.exposure is not None and self.sim.now() >= self.exposure[0]:
+            _, length = self.exposure
+            self.exposure = None
+            self.lastImage = self.sim.write_image(self, length)
+
+    def js_Connect(self):
+        self.connected = 1
+        return 0
+
+    def js_Disconnect(self):
+        self.connected = 0
+        return 0
+
+    def js_TakeImage(self):
+        self.finish_exposure()
+        length = float(js_number(self.props["ExposureTime"]))
+        delay = float(js_number(self.props["Delay"]))
+        self.exposure = (self.sim.now() + delay + length, length)
+        if not js_truthy(self.props["Asynchronous"]):
+            self.sim.sleep(delay + length)
+            self.finish_exposure()
+        return 0
+
+    def js_Abort(self):
+        self.exposure = None
+        self.guiding = False
+        return 0
+
+    def get_IsExposureComplete(self):
+        self.finish_exposure()
+        return 0 if self.exposure is not None else 1
+
+    def get_Status(self):
+        self.finish_exposure()
+        if self.exposure is not None:
+            return "Exposure " + js_string(round(self.exposure[0] - self.sim.now(), 1)) + " secs"
+        return "Ready"
+
+    def get_ExposureStatus(self):
+        return self.get_Status()
+
+    def get_State(self):
+        return 5 if self.guiding else 0
+
+    def js_Autoguide(self):
+        self.guiding = True
+        return 0
+
+    def get_GuideErrorX(self):
+        return round(self.sim.random.gauss(0.0, 0.3), 3) if self.guiding else 0
+
+    def get_GuideErrorY(self):
+        return round(self.sim.random.gauss(0.0, 0.3), 3) if self.guiding else 0
+
+    def get_MaximumPixel(self):
+        return 30000
+
+    def js_PropStr(self, name):
+        return str(self.settings.get(name, ""))
+
+    def js_PropDbl(self, name):
+        return float(self.settings.get(name, 0))
+
+    def js_PropLng(self, name):
+        return int(self.settings.get(name, 0))
+
+    def js_setPropLng(self, name, value):
+        self.settings[name] = int(js_number(value))
+        return 0
+
+    def js_setPropStr(self, name, value):
+        self.settings[name] = js_string(value)
+        return 0
+
+    # Filter wheel
+    def js_filterWheelConnect(self):
+        self.filterConnected = 1
+        return 0
+
+    def js_filterWheelDisconnect(self):
+        self.filterConnected = 0
+        return 0
+
+    def js_filterWheelIsConnected(self):
+        return self.filterConnected
+
+    def get_FilterIndexZeroBased(self):
+        return self.filterIndex
+
+    def set_FilterIndexZeroBased(self, value):
+        index = int(js_number(value))
+        if not 0 <= index < len(self.filterNames):
+            raise SimError("Invalid filter index.", 200)
+        self.filterIndex = index
+
+    def js_szFilterName(self, index):
+        return self.filterNames[int(js_number(index))]
+
+    def js_lNumberFilters(self):
+        return len(self.filterNames)
+
+    # Focuser
+    def js_focConnect(self):
+        self.focuserConnected = 1
+        return 0
+
+    def js_focDisconnect(self):
+        self.focuserConnected = 0
+        return 0
+
+    def js_focIsConnected(self):
+        return self.focuserConnected
+
+    def js_focMoveIn(self, steps):
+        if not self.focuserConnected:
+            raise SimError("Focuser not connected.", 200)
+        self.focuserPosition -= int(js_number(steps))
+        return 0
+
+    def js_focMoveOut(self, steps):
+        if not self.focuserConnected:
+            raise SimError("Focuser not connected.", 200)
+        self.focuserPosition += int(js_number(steps))
+        return 0
+
+    def get_focPosition(self):
+        return self.focuserPosition
+
+    def get_focTemperature(self):
+        return 12.0 - (self.sim.now() - self.sim.start) / 3600.0
+
+    def js_AtFocus2(self):
+        return 0
+
+    def js_AtFocus3(self, averages=3, full=1):
+        return 0
+
+
+class SimImage(SimObject):
+    '''
+    ccdsoftCameraImage / ccdsoftAutoguiderImage.
+    '''
+    def __init__(self, sim):
+        super().__init__(sim)
+        self.camera = None
+
+    def js_AttachToActiveImager(self):
+        self.camera = self.sim.camera
+        return 0
+
+    def js_AttachToActiveAutoguider(self):
+        self.camera = self.sim.autoguider
+        return 0
+
+    def get_Path(self):
+        if self.camera is None:
+            raise SimError("No image attached.", 250)
+        self.camera.finish_exposure()
+        return self.camera.lastImage
+
+    def js_FITSKeyword(self, name):
+        keywords = self.sim.images.get(self.get_Path(), {})
+        if name not in keywords:
+            raise SimError("FITS keyword not found.", 250)
+        return keywords[name]
+
+    def js_averagePixelValue(self):
+        return 1000.0
+
+
+class SimHardware(SimObject):
+    def __init__(self, sim):
+        super().__init__(sim, {"mountModel": "Telescope Mount Simulator",
+                               "cameraModel": "Camera Simulator",
+                               "autoguiderCameraModel": "Camera Simulator",
+                               "filterWheelModel": "Filter Wheel Simulator",
+                               "focuserModel": "Focuser Simulator"})
+
+
+class SimImageLink(SimObject):
+    '''
+    ImageLink. Plate solving is not simulated, so it always fails the way a failed solve does.
+    '''
+    def js_execute(self):
+        raise SimError("Image Link failed.", 651, "TypeError")
+
+
+class SimDate(SimObject):
+    '''
+    new Date(), at the simulated time.
+    '''
+    def __init__(self, sim):
+        super().__init__(sim)
+        self.time = sim.now()
+
+    def js_getTime(self):
+        return int(self.time * 1000)
+
+
+class SimWeb(SimObject):
+    def js_Sleep(self, milliseconds):
+        self.sim.sleep(float(js_number(milliseconds)) / 1000.0)
+        return 0
+
+
+#--------------## Simulator ##-------------
+class TSXSimulator:
+    '''
+    The whole simulated observatory. `speed` makes simulated time run faster than
+    real time (exposures, slews, tracking). `seed` makes guide errors reproducible.
+    '''
+    def __init__(self, latitude=46.30916667, longitude=6.13472222, speed=1.0, seed=0, imageDir=None):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.speed = speed
+        self.random = random.Random(seed)
+        self.imageDir = imageDir or os.path.join(tempfile.gettempdir(), "TSXSimulator")
+        os.makedirs(self.imageDir, exist_ok=True)
+        self.images = {}
+        self.imageCount = 0
+
+        self._realStart = time.monotonic()
+        self.start = time.time()
+        self.lock = threading.Condition(threading.RLock())
+
+        self.mount = SimMount(self)
+        self.camera = SimCamera(self)
+        self.autoguider = SimCamera(self, guider=True)
+        self.scope = {
+            "sky6RASCOMTele": self.mount,
+            "ccdsoftCamera": self.camera,
+            "ccdsoftAutoguider": self.autoguider,
+            "ccdsoftCameraImage": SimImage(self),
+            "ccdsoftAutoguiderImage": SimImage(self),
+            "SelectedHardware": SimHardware(self),
+            "sky6Web": SimWeb(self),
+            "ImageLink": SimImageLink(self),
+            "Date": lambda *args: SimDate(self),
+            "String": js_string,
+            "Number": js_number,
+        }
+
+    # Time
+    def now(self):
+        '''
+        Simulated UNIX time.
+        '''
+        return self.start + (time.monotonic() - self._realStart) * self.speed
+
+    def sleep(self, seconds):
+        '''
+        Wait for `seconds` of simulated time without holding the simulator lock.
+        '''
+        deadline = self.now() + seconds
+        while True:
+            remaining = deadline - self.now()
+            if remaining <= 0:
+                return
+            self.lock.wait(remaining / self.speed)
+
+    # Sky
+    def lst_hours(self, t):
+        jd = t / 86400.0 + 2440587.5
+        gmst = 280.46061837 + 360.98564736629 * (jd - 2451545.0)
+        return ((gmst + self.longitude) % 360.0) / 15.0
+
+    def azalt_from_radec(self, ra, dec, t):
+        lat = math.radians(self.latitude)
+        ha = math.radians((self.lst_hours(t) - ra) * 15.0)
+        dec = math.radians(dec)
+        alt = math.asin(math.sin(dec) * math.sin(lat) + math.cos(dec) * math.cos(lat) * math.cos(ha))
+        az = math.atan2(-math.sin(ha) * math.cos(dec),
+                        math.cos(lat) * math.sin(dec) - math.sin(lat) * math.cos(dec) * math.cos(ha))
+        return math.degrees(az) % 360.0, math.degrees(alt)
+
+    def radec_from_azalt(self, az, alt, t):
+        lat = math.radians(self.latitude)
+        az = math.radians(az)
+        alt = math.radians(alt)
+        dec = math.asin(math.sin(alt) * math.sin(lat) + math.cos(alt) * math.cos(lat) * math.cos(az))
+        ha = math.atan2(-math.sin(az) * math.cos(alt),
+                        math.cos(lat) * math.sin(alt) - math.sin(lat) * math.cos(alt) * math.cos(az))
+        return (self.lst_hours(t) - math.degrees(ha) / 15.0) % 24, math.degrees(dec)
+
+    # Images
+    def write_image(self, camera, length):
+        '''
+        Write a small FITS file for a finished exposure and return its path.
+        '''
+        self.imageCount += 1
+        kind = "Guider" if camera.guider else "Image"
+        path = os.path.join(self.imageDir, kind + "_%05d.fit" % self.imageCount)
+        ra, dec = self.mount.position()
+        az, alt = self.azalt_from_radec(ra, dec, self.now())
+        binning = max(int(js_number(camera.props["BinX"])), 1)
+        width = height = 64 // binning
+        keywords = {"EXPTIME": length, "FILTER": camera.filterNames[camera.filterIndex],
+                    "CENTALT": round(alt, 4), "CENTAZ": round(az, 4), "BITPIX": 16,
+                    "XBINNING": binning, "DATE-OBS": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(self.now()))}
+
+        cards = ["SIMPLE  = T", "BITPIX  = 16", "NAXIS   = 2",
+                 "NAXIS1  = %d" % width, "NAXIS2  = %d" % height]
+        for name, value in keywords.items():
+            if name == "BITPIX":
+                continue
+            value = "'" + value + "'" if isinstance(value, str) else js_string(value)
+            cards.append("%-8s= %s" % (name, value))
+        cards.append("END")
+        header = "".join(card.ljust(80) for card in cards)
+        header = header.ljust(-(-len(header) // 2880) * 2880)
+        pixels = struct.pack(">%dh" % (width * height), *([1000] * (width * height)))
+        pixels = pixels.ljust(-(-len(pixels) // 2880) * 2880, b"\0")
+        with open(path, "wb") as image:
+            image.write(header.encode("ascii") + pixels)
+
+        self.images[path] = keywords
+        return path
+
+    # Protocol
+    def execute(self, script):
+        '''
+        Run one script and return the full reply text.
+        '''
+        with self.lock:
+            try:
+                lines = script.strip().splitlines()
+                if lines and lines[0].strip() == _BATCH_HEADER:
+                    results = []
+                    for line in lines[1:]:
+                        match = _BATCH_ITEM.match(line)
+                        if not match:
+                            continue
+                        try:
+                            results.append(js_string(_Interpreter(self.scope).run(match.group(1))))
+                        except SimError as error:
+                            results.append(str(error))
+                    output = json.dumps(results)
+                else:
+                    output = js_string(_Interpreter(self.scope).run(script))
+            except SimError as error:
+                return "|" + str(error)
+            except Exception as error:
+                return "|TypeError: " + str(error) + " Error = 1."
+        return output + "|No error. Error = 0."
+
+
+class _SimHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        pending = b""
+        while True:
+            try:
+                chunk = self.request.recv(65536)
+            except OSError:
+                return
+            if not chunk:
+                return
+            pending += chunk
+            while END_PACKET in pending:
+                packet, pending = pending.split(END_PACKET, 1)
+                script = packet.decode("latin-1")
+                if START_PACKET in script:
+                    script = script.split(START_PACKET, 1)[1]
+                reply = self.server.simulator.execute(script)
+                self.request.sendall(reply.encode("latin-1", "replace"))
+
+
+class TSXSimulatorServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, simulator):
+        self.simulator = simulator
+        super().__init__(address, _SimHandler)
+
+
+def startSimulator(host="127.0.0.1", port=0, **kwargs):
+    '''
+    Start a simulator in a background thread and return the server.
+    port=0 picks a free port, see server.server_address. Stop it with server.shutdown().
+    '''
+    server = TSXSimulatorServer((host, port), TSXSimulator(**kwargs))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local TheSkyX TCP server simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3040)
+    parser.add_argument("--speed", type=float, default=1.0, help="simulated seconds per real second")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--images", default=None, help="directory for the simulated images")
+    args = parser.parse_args()
+
+    server = TSXSimulatorServer((args.host, args.port),
+                                TSXSimulator(speed=args.speed, seed=args.seed, imageDir=args.images))
+    print("TheSkyX simulator listening on " + args.host + ":" + str(args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
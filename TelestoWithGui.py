@@ -57,9 +57,9 @@ class MainWindow(tk.Frame):
         self.close_button = ttk.Button(self.master, text="    Close", command=self.close, width=10, state="disabled")
         self.close_button.grid(row=nbr_line-1, column=3, columnspan=3)
 
-        self.Norad_label = ttk.Label(self.master, text="NORAD ID :")
+        self.Norad_label = ttk.Label(self.master, text="NORAD ID or name :")
         self.Norad_label.grid(row=5, column=2, padx=5, pady=5)
-        self.Norad = ttk.Entry(self.master, width=10)
+        self.Norad = ttk.Entry(self.master, width=16)
         self.Norad.grid(row=5, column=3, padx=5, pady=5)
         self.follow_button = ttk.Button(self.master, text="Follow satellite", command=self.follow, state="disabled")
         self.follow_button.grid(row=5, column=4)
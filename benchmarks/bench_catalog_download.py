@@ -0,0 +1,108 @@
+'''
+Catalog loading time against a local HTTP stand-in for CelesTrak.
+
+The server serves gp.php split into groups, with a delay before the first byte
+and a bandwidth limit per connection, like a remote server would. Compares the
+original loop (skyfield's load.tle_file for one URL after another) with
+catalog.load_catalog (parallel downloads, streamed parsing and merging).
+
+Usage : python benchmarks/bench_catalog_download.py [latency s] [kB/s per connection]
+'''
+import http.server
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from skyfield.api import Loader, load
+
+from catalog import load_catalog
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GROUPS = ["iridium-33-debris", "cosmos-2251-debris", "1982-092", "starlink", "iridium", "active"]
+
+
+def make_groups():
+    '''
+    Split the gp.php snapshot in groups of various sizes, "active" being the largest.
+    '''
+    with open(os.path.join(ROOT, "gp.php"), "rb") as snapshot:
+        lines = snapshot.read().splitlines(keepends=True)
+    records = [b"".join(lines[i:i + 3]) for i in range(0, len(lines) - 2, 3)]
+    shares = [0.03, 0.05, 0.02, 0.25, 0.02]
+    groups = {}
+    position = 0
+    for name, share in zip(GROUPS, shares):
+        size = int(len(records) * share)
+        groups[name] = b"".join(records[position:position + size])
+        position += size
+    groups["active"] = b"".join(records)
+    return groups
+
+
+def start_server(groups, latency, bandwidth):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            name = self.path.split("GROUP=")[-1].split("&")[0]
+            content = groups.get(name)
+            if content is None:
+                self.send_error(404)
+                return
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            step = max(int(bandwidth / 20), 1)
+            for position in range(0, len(content), step):
+                self.wfile.write(content[position:position + step])
+                time.sleep(step / bandwidth)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def sequential(sources, directory):
+    '''
+    The original __init_file: one load.tle_file(url, reload=True) after another.
+    '''
+    loader = Loader(directory, verbose=False)
+    satellites = {}
+    for _, url in sources:
+        satellites.update({sat.model.satnum: sat for sat in loader.tle_file(url, reload=True)})
+    return satellites
+
+
+if __name__ == "__main__":
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.5
+    bandwidth = float(sys.argv[2]) * 1024 if len(sys.argv) > 2 else 1024 * 1024
+
+    server = start_server(make_groups(), latency, bandwidth)
+    base = "http://127.0.0.1:%d/NORAD/elements/gp.php?GROUP=" % server.server_address[1]
+    sources = [("deb", base + name + "&FORMAT=tle") for name in GROUPS[:3]] + \
+              [("sat", base + name + "&FORMAT=tle") for name in GROUPS[3:]]
+    ts = load.timescale()
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        before = sequential(sources, directory)
+        sequential_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    after = load_catalog(sources, ts)
+    parallel_time = time.perf_counter() - start
+
+    assert set(before) == set(after)
+    assert all(before[satnum].model.jdsatepoch == after[satnum].model.jdsatepoch for satnum in before)
+    print()
+    print(f"{'one source after another':<28}{sequential_time:>8.2f} s  ({len(before)} objects)")
+    print(f"{'parallel, streamed':<28}{parallel_time:>8.2f} s  ({len(after)} objects)")
+    print(f"speed-up: x{sequential_time / parallel_time:.1f}")
+
+    server.shutdown()
@@ -0,0 +1,86 @@
+'''
+Start time of the catalog: original __init_file against the compiled catalog.
+
+Uses the same local stand-in for CelesTrak as bench_catalog_download.py. Measures
+  - the original __init_file: load.tle_file(url, reload=True) one source after
+    another, then personal_tle.txt, every satellite built,
+  - the same with every source already on disk (parsing only),
+  - a cold start: empty TLE cache, no catalog.npy, compiled then mapped,
+  - a warm start: catalog.npy up to date, only mapped.
+Each start ends by looking up and building the followed satellite.
+
+Usage : python benchmarks/bench_catalog_start.py [latency s] [kB/s per connection]
+'''
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from skyfield.api import load
+from skyfield.iokit import parse_tle_file
+
+from bench_catalog_download import GROUPS, ROOT, make_groups, sequential, start_server
+from catalog import TLECache, CompiledCatalog, build_catalog, compiled_is_fresh
+
+PERSONAL = os.path.join(ROOT, "personal_tle.txt")
+TARGET = 900  # CALSPHERE 1, from personal_tle.txt
+
+
+def original(sources, directory, ts):
+    satellites = sequential(sources, directory)
+    satellites.update({sat.model.satnum: sat for sat in load.tle_file(PERSONAL, reload=True)})
+    return satellites[TARGET]
+
+
+def original_from_disk(contents, ts):
+    satellites = {}
+    for content in contents + [open(PERSONAL, "rb").read()]:
+        satellites.update({sat.model.satnum: sat for sat in parse_tle_file(content.splitlines(), ts)})
+    return satellites[TARGET]
+
+
+def compiled_start(sources, path, cache, ts):
+    if not compiled_is_fresh(path, cache.max_age, [PERSONAL]):
+        build_catalog(sources, [PERSONAL], path, fetch=cache.fetch)
+    satellites = CompiledCatalog(path, ts)
+    assert TARGET in satellites
+    return satellites[TARGET]
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.5
+    bandwidth = float(sys.argv[2]) * 1024 if len(sys.argv) > 2 else 1024 * 1024
+
+    groups = make_groups()
+    server = start_server(groups, latency, bandwidth)
+    base = "http://127.0.0.1:%d/NORAD/elements/gp.php?GROUP=" % server.server_address[1]
+    sources = [("deb", base + name + "&FORMAT=tle") for name in GROUPS[:3]] + \
+              [("sat", base + name + "&FORMAT=tle") for name in GROUPS[3:]]
+    ts = load.timescale()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = [
+            ("original __init_file", timed(original, sources, directory, ts)),
+            ("original, already on disk", timed(original_from_disk, [groups[name] for name in GROUPS], ts)),
+        ]
+        path = os.path.join(directory, "catalog.npy")
+        cache = TLECache(os.path.join(directory, "tle_cache"))
+        results.append(("cold start (compile)", timed(compiled_start, sources, path, cache, ts)))
+        results.append(("warm start (mmap)", timed(compiled_start, sources, path, cache, ts)))
+
+        print()
+        for label, seconds in results:
+            print(f"{label:<28}{seconds * 1000:>10.1f} ms")
+        print(f"warm start speed-up: x{results[0][1] / results[-1][1]:.0f} "
+              f"(x{results[1][1] / results[-1][1]:.0f} against parsing from disk)")
+        print(f"catalog.npy: {os.path.getsize(path) / 1024:.0f} kB")
+
+    server.shutdown()
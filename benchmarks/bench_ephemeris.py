@@ -0,0 +1,80 @@
+'''
+Position and rates of the followed target: skyfield at every call against the
+interpolated ephemeris table (ephemeris.py).
+
+The per-call path is the one __compute_alt_az and __compute_celestial_parameters
+used: the difference vector, then altaz('standard') and the rates in the true
+equator and equinox of date. Both are timed on the same queries along a pass,
+and the table is checked against skyfield on them.
+
+Usage : python benchmarks/bench_ephemeris.py [queries]
+'''
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from skyfield.api import load, wgs84, N, E
+from skyfield.framelib import true_equator_and_equinox_of_date
+
+from catalog import COMPILED_CATALOG, SNAPSHOT, CompiledCatalog, LazySatellites, parse_records
+from ephemeris import TargetEphemeris
+
+# (Norad ID, start of the pass): a 45 deg ISS pass, and a OneWeb pass through the
+# zenith and within a degree of the celestial pole
+PASSES = [(25544, (2023, 5, 26, 21, 49, 0)), (49108, (2023, 5, 26, 22, 31, 30))]
+DURATION = 900  # [s]
+
+
+def per_call(target, observatory, t):
+    difference = target - observatory
+    alt, az, _ = difference.at(t).altaz('standard')
+    dec, ra, _, dec_rate, ra_rate, _ = difference.at(t).frame_latlon_and_rates(true_equator_and_equinox_of_date)
+    return (alt.degrees, az.degrees, ra.degrees, dec.degrees,
+            ra_rate.arcseconds.per_second, dec_rate.arcseconds.per_second)
+
+
+if __name__ == "__main__":
+    queries = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    ts = load.timescale()
+    if os.path.exists(COMPILED_CATALOG):
+        satellites = CompiledCatalog(COMPILED_CATALOG, ts)
+    else:
+        with open(SNAPSHOT, "rb") as snapshot:
+            satellites = LazySatellites(parse_records(snapshot.read()), ts)
+    observatory = wgs84.latlon(46.30916667 * N, 6.13472222 * E, elevation_m=443)
+
+    for satnum, start in PASSES:
+        target = satellites[satnum]
+        t0 = ts.utc(*start)
+        seconds = np.random.default_rng(0).uniform(0, DURATION, queries)
+        times = [t0 + s / 86400 for s in seconds]
+
+        begin = time.perf_counter()
+        reference = np.array([per_call(target, observatory, t) for t in times])
+        skyfield_time = (time.perf_counter() - begin) / queries
+
+        begin = time.perf_counter()
+        table = TargetEphemeris(target, observatory, t0, DURATION)
+        build_time = time.perf_counter() - begin
+        begin = time.perf_counter()
+        interpolated = np.array([table(s) for s in seconds])
+        table_time = (time.perf_counter() - begin) / queries
+
+        alt, az, ra, dec, ra_rate, dec_rate = reference.T
+        wrap = lambda angle: (angle + 180.0) % 360.0 - 180.0
+        horizontal = np.hypot(interpolated[:, 0] - alt, wrap(interpolated[:, 1] - az) * np.cos(np.radians(alt)))
+        equatorial = np.hypot(interpolated[:, 3] - dec, wrap(interpolated[:, 2] - ra) * np.cos(np.radians(dec)))
+        rates = np.hypot((interpolated[:, 6] - ra_rate) * np.cos(np.radians(dec)), interpolated[:, 7] - dec_rate)
+
+        print(f"{target.name} ({satnum}), {DURATION} s pass, {queries} queries")
+        print(f"{'skyfield per call':<28}{skyfield_time * 1e6:>10.1f} us")
+        print(f"{'table build':<28}{build_time * 1e3:>10.1f} ms  (step {table.step:g} s, "
+              f"checked {table.max_error:.1e} arcsec, {table.max_rate_error:.1e} arcsec/s)")
+        print(f"{'table per call':<28}{table_time * 1e6:>10.1f} us  (x{skyfield_time / table_time:.0f})")
+        print(f"largest error: alt/az {horizontal.max() * 3600:.3f} arcsec, ra/dec {equatorial.max() * 3600:.4f} arcsec, "
+              f"rates {rates.max():.4f} arcsec/s\n")
@@ -0,0 +1,83 @@
+'''
+Lead time and send instants from measured latencies.
+
+First the wake up precision of the wait before following starts: the original
+loop (10 ms sleeps until the deadline) against sleep_until, over waits of
+random lengths.
+
+Then, against the local SkyX simulator (PySkyX_sim), calibrate() measures the
+slews and the rates commands; the lead time it gives for a few slew lengths is
+compared with the fixed 30 s, and its slew prediction with slews in random
+directions.
+
+Usage : python benchmarks/bench_latency.py [number of waits]
+'''
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import PySkyX_ks
+from PySkyX_ks import TSXDispatcher, TSXPriorityMount, getPosition, slewToCoords
+from PySkyX_sim import startSimulator
+from latency import DEFAULT_LEAD, MountLatency, calibrate, slew_distance, sleep_until
+
+DISTANCES = [2.0, 10.0, 45.0, 120.0]  # [deg]
+
+
+def busy_wait(deadline):
+    # The wait of the original __follow_sat_using_rate
+    while time.perf_counter() < deadline:
+        time.sleep(0.01)
+
+
+def wake_up(label, wait, count):
+    late = []
+    for _ in range(count):
+        deadline = time.perf_counter() + random.uniform(0.05, 0.3)
+        wait(deadline)
+        late.append(time.perf_counter() - deadline)
+    late.sort()
+    print(f"{label:<16}late by {sum(late) / count * 1e3:>6.2f} ms on average, "
+          f"{late[count // 2] * 1e3:>6.2f} ms median, {late[-1] * 1e3:>6.2f} ms at most")
+
+
+def live():
+    server = startSimulator()
+    PySkyX_ks.TSXHost, PySkyX_ks.TSXPort = server.server_address
+    dispatcher = TSXDispatcher()
+
+    latency = MountLatency()
+    start = time.perf_counter()
+    calibrate(dispatcher, latency)
+    print(f"calibration in {time.perf_counter() - start:.1f} s")
+    print(latency.report())
+    for distance in DISTANCES:
+        print(f"slew of {distance:>5.0f} deg: lead time {latency.lead_time(distance):>5.1f} s (was {DEFAULT_LEAD:g} s)")
+
+    # Slews in random directions, as when following targets one after the other
+    worst = 0.0
+    for _ in range(5):
+        ra, dec, _, _ = dispatcher.call(TSXPriorityMount, getPosition)
+        target = (random.uniform(0, 24), random.uniform(-10, 60))
+        distance = slew_distance(ra * 15, dec, target[0] * 15, target[1])
+        predicted = latency.slew.upper(distance)
+        start = time.perf_counter()
+        dispatcher.call(TSXPriorityMount, slewToCoords, (str(target[0]), str(target[1])), "Benchmark")
+        measured = time.perf_counter() - start
+        worst = max(worst, measured - predicted)
+        print(f"slew of {distance:>5.1f} deg: {measured:>5.2f} s, predicted at most {predicted:>5.2f} s")
+    print(f"largest overrun of the prediction {worst:.2f} s")
+
+    PySkyX_ks.TSXTransport.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    wake_up("10 ms loop", busy_wait, count)
+    wake_up("sleep_until", sleep_until, count)
+    live()
@@ -0,0 +1,75 @@
+'''
+Pass prediction for the whole catalog over a night.
+
+Compares passes.predict_passes in this process and in a process pool with
+skyfield's find_events, one object at a time, on a sample of objects (scaled
+to the catalog size), and checks the rise, culmination and set times.
+
+Usage : python benchmarks/bench_passes.py [hours] [workers]
+'''
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from skyfield.api import load, wgs84, N, E
+
+from catalog import COMPILED_CATALOG, SNAPSHOT, CompiledCatalog, LazySatellites, parse_records
+from passes import MIN_ALTITUDE, predict_passes
+
+SAMPLE = 100  # Objects predicted with skyfield
+
+
+if __name__ == "__main__":
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 12
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+
+    ts = load.timescale()
+    if os.path.exists(COMPILED_CATALOG):
+        satellites = CompiledCatalog(COMPILED_CATALOG, ts)
+    else:
+        with open(SNAPSHOT, "rb") as snapshot:
+            satellites = LazySatellites(parse_records(snapshot.read()), ts)
+    observatory = wgs84.latlon(46.30916667 * N, 6.13472222 * E, elevation_m=443)
+    t0 = ts.utc(2023, 5, 26, 18)
+
+    start = time.perf_counter()
+    serial = predict_passes(satellites, observatory, t0, hours, workers=1)
+    serial_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parallel = predict_passes(satellites, observatory, t0, hours, workers=workers)
+    parallel_time = time.perf_counter() - start
+    serial_rows = serial.sort("start").sort("satnum").rows
+    parallel_rows = parallel.sort("start").sort("satnum").rows
+    assert all(np.array_equal(serial_rows[name], parallel_rows[name], equal_nan=name != "satnum")
+               for name in serial_rows.dtype.names)
+
+    satnums = sorted(satellites)
+    sample = satnums[::max(1, len(satnums) // SAMPLE)]
+    errors = []
+    missed = 0
+    start = time.perf_counter()
+    for satnum in sample:
+        times, events = satellites[satnum].find_events(observatory, t0, t0 + hours / 24, altitude_degrees=MIN_ALTITUDE)
+        mine = parallel.for_satellite(satnum).rows
+        # skyfield gives no culmination for a pass cut by the window, compare rise and set
+        reference = (times[events != 1] - t0) * 86400.0
+        predicted = np.sort(np.concatenate([mine["rise"], mine["set"]]))
+        predicted = predicted[~np.isnan(predicted)]
+        if len(reference) != len(predicted):
+            missed += 1
+            continue
+        errors.extend(np.abs(np.sort(reference) - predicted))
+    skyfield_time = (time.perf_counter() - start) * len(satnums) / len(sample)
+
+    print(f"{len(satnums)} objects, {hours:g} h, {len(parallel)} passes above {MIN_ALTITUDE:g} deg, "
+          f"{len(parallel.visible())} with a visible part")
+    print(f"{'skyfield find_events (scaled)':<32}{skyfield_time:>8.2f} s")
+    print(f"{'predict_passes, 1 process':<32}{serial_time:>8.2f} s")
+    print(f"{'predict_passes, %d processes' % workers:<32}{parallel_time:>8.2f} s")
+    print(f"rise and set against skyfield: largest difference {max(errors, default=0):.2f} s, "
+          f"{missed} of {len(sample)} objects with a different number of events")
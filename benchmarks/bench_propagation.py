@@ -0,0 +1,60 @@
+'''
+Whole catalog propagation: skyfield one object at a time against CatalogPropagator.
+
+Alt/az/range of every object of the compiled catalog (or of gp.php if catalog.npy
+does not exist) over one hour, one epoch per minute, seen from the observatory.
+skyfield is timed on a sample of the objects and scaled, the results are compared.
+
+Usage : python benchmarks/bench_propagation.py [epochs] [chunk samples]
+'''
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from skyfield.api import load, wgs84, N, E
+
+from catalog import COMPILED_CATALOG, SNAPSHOT, CompiledCatalog, LazySatellites, parse_records
+from propagation import CHUNK_SAMPLES, CatalogPropagator
+
+SAMPLE = 200  # Objects propagated with skyfield
+
+
+if __name__ == "__main__":
+    epochs = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    chunk_samples = int(sys.argv[2]) if len(sys.argv) > 2 else CHUNK_SAMPLES
+
+    ts = load.timescale()
+    if os.path.exists(COMPILED_CATALOG):
+        satellites = CompiledCatalog(COMPILED_CATALOG, ts)
+    else:
+        with open(SNAPSHOT, "rb") as snapshot:
+            satellites = LazySatellites(parse_records(snapshot.read()), ts)
+    observatory = wgs84.latlon(46.30916667 * N, 6.13472222 * E, elevation_m=443)
+    t = ts.utc(2023, 5, 26, 22, 0, np.arange(epochs) * 3600.0 / epochs)
+
+    start = time.perf_counter()
+    propagator = CatalogPropagator(satellites, observatory)
+    setup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    satnums, altitude, azimuth, distance = propagator.altaz(t, chunk_samples)
+    vectorized = time.perf_counter() - start
+
+    sample = satnums[::max(1, len(satnums) // SAMPLE)]
+    start = time.perf_counter()
+    reference = {int(satnum): (satellites[int(satnum)] - observatory).at(t).altaz()[0].degrees for satnum in sample}
+    per_object = (time.perf_counter() - start) * len(satnums) / len(sample)
+
+    rows = {int(satnum): row for row, satnum in enumerate(satnums)}
+    error = max(np.nanmax(np.abs(reference[satnum] - altitude[rows[satnum]]), initial=0) for satnum in reference)
+
+    samples = len(satnums) * epochs
+    print(f"{len(satnums)} objects x {epochs} epochs, chunks of {chunk_samples} samples")
+    print(f"{'skyfield, one object at a time':<34}{per_object:>8.2f} s  {samples / per_object:>12,.0f} samples/s")
+    print(f"{'CatalogPropagator':<34}{vectorized:>8.2f} s  {samples / vectorized:>12,.0f} samples/s")
+    print(f"{'  + SatrecArray setup':<34}{setup:>8.2f} s")
+    print(f"speed-up: x{per_object / vectorized:.0f}, largest altitude difference {error:.1e} deg")
@@ -0,0 +1,138 @@
+'''
+Tracking error along a pass: one constant rate against piecewise rates.
+
+Offline, the mount path is integrated over two whole passes: the rate computed
+30 s ahead and kept for the pass (the original __follow_sat_using_rate), then
+rate_profile at several cadences. Reports the largest pointing error and how long
+the target stays within the threshold of the error thread.
+
+Then, against the local SkyX simulator (PySkyX_sim), the mount is synced on an
+object and RateScheduler sends its rates through the dispatcher for a while; the
+mount position read back is compared with the ephemeris.
+
+Usage : python benchmarks/bench_tracking.py [live seconds] [cadence s]
+'''
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from skyfield.api import load, wgs84, N, E
+
+import PySkyX_ks
+from PySkyX_ks import TSXDispatcher, TSXPriorityMount, TSXSend, getPosition, setTrackingRate, updateTrackingRate
+from PySkyX_sim import startSimulator
+from catalog import COMPILED_CATALOG, SNAPSHOT, CompiledCatalog, LazySatellites, parse_records
+from ephemeris import TargetEphemeris
+from latency import DEFAULT_UPDATE, LatencyStats, timed
+from tracking import RateScheduler, rate_profile
+
+# Same passes as bench_ephemeris.py
+PASSES = [(25544, (2023, 5, 26, 21, 49, 0)), (49108, (2023, 5, 26, 22, 31, 30))]
+DURATION = 900  # [s]
+ALIGNED = 30  # Following starts 30 s after the start of the table, as in __follow_sat_using_rate
+THRESHOLD = 0.0001  # Error of __control_error_thread
+CADENCES = [10.0, 5.0, 2.0]
+
+
+def errors(table, seconds, ra, dec):
+    '''
+    Pointing errors of a mount at (ra, dec) [deg] at the given times: on the sky [arcsec],
+    and as measured by the error thread
+    '''
+    target = np.array([table(s)[2:4] for s in seconds])
+    dra = (ra - target[:, 0] + 180.0) % 360.0 - 180.0
+    ddec = dec - target[:, 1]
+    sky = np.hypot(dra * np.cos(np.radians(target[:, 1])), ddec) * 3600
+    return sky, np.hypot(dra / 360, ddec / 360)
+
+
+def on_target(seconds, thread_error):
+    beyond = np.flatnonzero(thread_error > THRESHOLD)
+    return (seconds[beyond[0]] if len(beyond) else seconds[-1]) - seconds[0]
+
+
+def offline(satellites, observatory, ts):
+    for satnum, start in PASSES:
+        table = TargetEphemeris(satellites[satnum], observatory, ts.utc(*start), DURATION)
+        seconds = np.arange(ALIGNED, DURATION, 0.5)
+        _, _, ra0, dec0, _, _, ra_rate, dec_rate, _, _ = table(ALIGNED)
+        print(f"{satellites[satnum].name} ({satnum}), {DURATION - ALIGNED} s of pass")
+
+        elapsed = seconds - ALIGNED
+        sky, thread_error = errors(table, seconds, ra0 + ra_rate * elapsed / 3600, dec0 + dec_rate * elapsed / 3600)
+        print(f"{'one rate for the pass':<28}largest error {sky.max():>9.1f} arcsec, "
+              f"on target for {on_target(seconds, thread_error):>5.0f} s")
+
+        for cadence in CADENCES:
+            times, ra_rates, dec_rates = rate_profile(table, ALIGNED, DURATION, cadence)
+            index = np.searchsorted(times, seconds, side="right") - 1
+            ra_starts = np.array([table(s)[2] for s in times])
+            dec_starts = np.array([table(s)[3] for s in times])
+            elapsed = seconds - times[index]
+            sky, thread_error = errors(table, seconds, ra_starts[index] + ra_rates[index] * elapsed / 3600,
+                                       dec_starts[index] + dec_rates[index] * elapsed / 3600)
+            print(f"{'rates every %g s' % cadence:<28}largest error {sky.max():>9.1f} arcsec, "
+                  f"on target for {on_target(seconds, thread_error):>5.0f} s")
+        print()
+
+
+def live(satellites, observatory, ts, duration, cadence):
+    server = startSimulator()
+    PySkyX_ks.TSXHost, PySkyX_ks.TSXPort = server.server_address
+    dispatcher = TSXDispatcher()
+
+    # The pass of PASSES[0] is long gone: the object is taken where it is now
+    table = TargetEphemeris(satellites[PASSES[0][0]], observatory, ts.now(), duration + 60)
+    aligned = table.since_start(5)
+    times, ra_rates, dec_rates = rate_profile(table, aligned, aligned + duration, cadence)
+    _, _, ra, dec, _, _, _, _, _, _ = table(aligned)
+
+    time.sleep(max(table.unix0 + aligned - time.time(), 0))
+    dispatcher.call(TSXPriorityMount, TSXSend, "sky6RASCOMTele.Sync(%r, %r, 'target')" % (ra / 15, dec))
+    dispatcher.call(TSXPriorityMount, setTrackingRate, (str(dec_rates[0]), str(ra_rates[0])))
+
+    latency = LatencyStats(DEFAULT_UPDATE)
+    _, round_trip = dispatcher.call(TSXPriorityMount, timed, updateTrackingRate, (str(dec_rates[0]), str(ra_rates[0])))
+    latency.update(round_trip)
+    scheduler = RateScheduler(table, times[1:], ra_rates[1:], dec_rates[1:],
+                              lambda ra_rate, dec_rate: dispatcher.call(TSXPriorityMount, timed, updateTrackingRate,
+                                                                        (str(dec_rate), str(ra_rate)))[1], latency)
+    scheduler.start()
+
+    samples = []
+    while table.since_start() < aligned + duration:
+        time.sleep(1.0)
+        now = table.since_start()
+        mount_ra, mount_dec, _, _ = dispatcher.call(TSXPriorityMount, getPosition)
+        samples.append((now, mount_ra * 15, mount_dec))
+    scheduler.stop()
+    dispatcher.call(TSXPriorityMount, setTrackingRate, switch=False)
+
+    seconds, mount_ra, mount_dec = np.array(samples).T
+    sky, _ = errors(table, seconds, mount_ra, mount_dec)
+    print(f"simulator, {duration:g} s at rates every {cadence:g} s: {scheduler.sent} updates sent "
+          f"({scheduler.skipped} skipped), latency {latency.mean * 1e3:.1f} ms, largest error {sky.max():.1f} arcsec")
+
+    PySkyX_ks.TSXTransport.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    live_seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 60
+    cadence = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+
+    ts = load.timescale()
+    if os.path.exists(COMPILED_CATALOG):
+        satellites = CompiledCatalog(COMPILED_CATALOG, ts)
+    else:
+        with open(SNAPSHOT, "rb") as snapshot:
+            satellites = LazySatellites(parse_records(snapshot.read()), ts)
+    observatory = wgs84.latlon(46.30916667 * N, 6.13472222 * E, elevation_m=443)
+
+    offline(satellites, observatory, ts)
+    if live_seconds > 0:
+        live(satellites, observatory, ts, live_seconds, cadence)
@@ -0,0 +1,56 @@
+'''
+Round trips per second against the local SkyX simulator (PySkyX_sim).
+
+Compares the original transport (one TCP connection per command) with the
+pooled keep-alive transport now used by TSXSend.
+
+Usage : python benchmarks/bench_transport.py [number of commands]
+'''
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import PySkyX_ks
+from PySkyX_sim import startSimulator
+
+
+def one_shot_send(host, port, message):
+    '''
+    The transport as it was: connect, send one statement, read, close.
+    '''
+    TSXSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    TSXSocket.connect((host, port))
+    fullMessage = "/* Java Script */\n/* Socket Start Packet */\n\n" + message + ";\n\n/* Socket End Packet */"
+    TSXSocket.send(fullMessage.encode())
+    data = TSXSocket.recv(4096)
+    TSXSocket.close()
+    return data.decode("latin-1").split("|")[0]
+
+
+def run(label, send, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        send("sky6RASCOMTele.dAz")
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28}{count / elapsed:>10.0f} round trips/s   ({elapsed * 1e6 / count:.0f} us each)")
+    return count / elapsed
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    server = startSimulator()
+    host, port = server.server_address
+
+    PySkyX_ks.TSXHost = host
+    PySkyX_ks.TSXPort = port
+
+    before = run("one socket per command", lambda message: one_shot_send(host, port, message), count)
+    after = run("pooled keep-alive", PySkyX_ks.TSXSend, count)
+    print(f"speed-up: x{after / before:.1f}")
+
+    PySkyX_ks.TSXTransport.close()
+    server.shutdown()
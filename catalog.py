@@ -0,0 +1,758 @@
+'''
+Loading of the TLE catalogs used by TelestoClass
+
+The sources listed in debris_url.txt and satellites_url.txt are downloaded in a
+thread pool; each one is parsed and merged as soon as it arrives, while the
+others are still downloading.
+
+Downloads go through an on-disk cache (tle_cache/), revalidated with the
+server when older than its max age, and used as is when the network is down.
+
+The merged catalog is compiled into catalog.npy, one column per field, which is
+memory-mapped at the next start; satellites are only built when asked for.
+
+    python catalog.py      # compile catalog.npy from the URL lists and personal_tle.txt
+'''
+import bisect
+import collections.abc
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+from sgp4.api import Satrec
+from skyfield.api import EarthSatellite
+
+DOWNLOAD_WORKERS = 4  # Parallel downloads, kept low out of courtesy to CelesTrak
+DOWNLOAD_TIMEOUT = 30.0  # Time allowed for one source, [s]
+USER_AGENT = "TelestoInLine"
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tle_cache")
+CACHE_MAX_AGE = 2 * 3600.0  # CelesTrak updates the GP data every few hours, [s]
+SNAPSHOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gp.php")  # Last resort when offline
+COMPILED_CATALOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog.npy")
+SATELLITE_CACHE_SIZE = 256  # Satellites kept built, a session follows a handful
+
+# Columns of the compiled catalog, besides the raw lines: orbital elements as read by sgp4
+ELEMENTS = ["epoch", "epoch_fraction", "bstar", "ndot", "nddot",
+            "inclo", "nodeo", "ecco", "argpo", "mo", "no_kozai"]
+
+
+def _download(url, timeout, headers=None):
+    '''
+    Download one source, giving up after timeout seconds in total.
+    urllib raises HTTPError for answers other than 2xx (e.g. 304 Not Modified).
+
+    Input : [url, timeout, extra request headers]
+    Ouput : (response headers, content)
+    '''
+    deadline = time.monotonic() + timeout
+    request = urllib.request.Request(url, headers=dict(headers or {}, **{"User-Agent": USER_AGENT}))
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        chunks = []
+        while True:
+            # The socket timeout only bounds each read, the deadline bounds the download
+            if time.monotonic() > deadline:
+                raise TimeoutError("Download of " + url + " took more than " + str(timeout) + " s")
+            chunk = response.read(65536)
+            if not chunk:
+                return response.headers, b"".join(chunks)
+            chunks.append(chunk)
+
+
+def fetch_url(url, timeout=DOWNLOAD_TIMEOUT):
+    '''
+    Download one source, without cache
+
+    Input : [url, timeout]
+    Ouput : content of the source (bytes)
+    '''
+    return _download(url, timeout)[1]
+
+
+class TLECache:
+    '''
+    On-disk cache of the TLE sources, one file per URL.
+
+    A copy younger than max_age is used without asking the server. An older one is
+    revalidated with If-None-Match / If-Modified-Since, so an unchanged source costs a
+    304 instead of a full download. When the server cannot be reached, the last good
+    copy is used, however old.
+    '''
+    def __init__(self, directory=CACHE_DIR, max_age=CACHE_MAX_AGE):
+        self.directory = directory
+        self.max_age = max_age
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode()).hexdigest()
+        return os.path.join(self.directory, key + ".tle"), os.path.join(self.directory, key + ".json")
+
+    def _read(self, url):
+        '''
+        Input : [url]
+        Ouput : (metadata, content) of the cached copy, or (None, None)
+        '''
+        content_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path) as meta_file:
+                meta = json.load(meta_file)
+            with open(content_path, "rb") as content_file:
+                return meta, content_file.read()
+        except (OSError, ValueError):
+            return None, None
+
+    def _write_meta(self, meta_path, meta):
+        with open(meta_path + ".tmp", "w") as meta_file:
+            json.dump(meta, meta_file)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def _write(self, url, headers, content):
+        '''
+        Replace the cached copy. The content goes first, so a crash never leaves
+        metadata pointing to a half written file.
+        '''
+        os.makedirs(self.directory, exist_ok=True)
+        content_path, meta_path = self._paths(url)
+        with open(content_path + ".tmp", "wb") as content_file:
+            content_file.write(content)
+        os.replace(content_path + ".tmp", content_path)
+        self._write_meta(meta_path, {"url": url, "fetched": time.time(),
+                                     "etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified")})
+
+    def age(self, url):
+        '''
+        Input : [url]
+        Ouput : age of the cached copy in seconds, None if there is none
+        '''
+        meta, _ = self._read(url)
+        return None if meta is None else time.time() - meta["fetched"]
+
+    def fetch(self, url, timeout=DOWNLOAD_TIMEOUT):
+        '''
+        Content of a source, from the cache when possible. Same interface as fetch_url.
+
+        Input : [url, timeout]
+        Ouput : content of the source (bytes)
+        '''
+        meta, content = self._read(url)
+        if meta is not None and time.time() - meta["fetched"] < self.max_age:
+            return content
+
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            response_headers, new_content = _download(url, timeout, headers)
+        except urllib.error.HTTPError as error:
+            if error.code == 304 and meta is not None:
+                # Unchanged on the server: the copy is good for another max_age
+                meta["fetched"] = time.time()
+                self._write_meta(self._paths(url)[1], meta)
+                return content
+            if meta is None:
+                raise
+            print("Server error for " + url + " (" + str(error) + "), using the copy from "
+                  + time.strftime("%Y-%m-%d %H:%M", time.localtime(meta["fetched"])))
+            return content
+        except (OSError, TimeoutError) as error:
+            if meta is None:
+                raise
+            print("Unable to reach " + url + " (" + str(error) + "), using the copy from "
+                  + time.strftime("%Y-%m-%d %H:%M", time.localtime(meta["fetched"])))
+            return content
+
+        if not new_content.strip() and content:
+            # CelesTrak answers an empty body when rate limiting, keep the last good copy
+            return content
+        self._write(url, response_headers, new_content)
+        return new_content
+
+
+def download_sources(urls, workers=DOWNLOAD_WORKERS, timeout=DOWNLOAD_TIMEOUT, fetch=fetch_url):
+    '''
+    Download the sources in parallel, yielding each one as soon as it is complete.
+    A URL listed twice is only downloaded once.
+
+    Input : [urls, workers, timeout, fetch(url, timeout) -> bytes]
+    Ouput : generator of (url, content, error), content is None if the download failed
+    '''
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return
+
+    pool = ThreadPoolExecutor(max_workers=min(workers, len(urls)), thread_name_prefix="TLEDownload")
+    try:
+        futures = {pool.submit(fetch, url, timeout): url for url in urls}
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                yield url, future.result(), None
+            except Exception as error:
+                yield url, None, error
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def satnum_of(line1):
+    '''
+    NORAD ID of a TLE, including the Alpha-5 numbers above 99999 (A0000 = 100000)
+
+    Input : [line 1 (str)]
+    Ouput : satnum (int)
+    '''
+    field = line1[2:7]
+    if field[0].isalpha():
+        letter = ord(field[0].upper()) - ord("A")
+        # I and O are not used, they look like 1 and 0
+        letter -= (field[0].upper() > "I") + (field[0].upper() > "O")
+        return (10 + letter) * 10000 + int(field[1:])
+    return int(field)
+
+
+def parse_records(content):
+    '''
+    Split the content of a TLE source into records, without building any satellite.
+    Same rules as skyfield's parse_tle_file: a line before the pair is its name.
+
+    Input : [content (bytes)]
+    Ouput : {satnum: (name, line1, line2)}
+    '''
+    records = {}
+    b0 = b1 = b""
+    for b2 in content.splitlines():
+        if b2.startswith(b"2 ") and len(b2) >= 69 and b1.startswith(b"1 ") and len(b1) >= 69:
+            name = b0.rstrip(b" \n\r")
+            if name.startswith(b"0 "):
+                name = name[2:]  # Spacetrack 3-line format
+            line1 = b1.decode("ascii").rstrip()
+            records[satnum_of(line1)] = (name.decode("ascii").strip(), line1, b2.decode("ascii").rstrip())
+            b0 = b1 = b""
+        else:
+            b0 = b1
+            b1 = b2
+    return records
+
+
+def parse_source(content, ts):
+    '''
+    Parse the content of a TLE source
+
+    Input : [content (bytes), timescale]
+    Ouput : [EarthSatellite]
+    '''
+    return [EarthSatellite(line1, line2, name or None, ts) for name, line1, line2 in parse_records(content).values()]
+
+
+def epoch_of(line1):
+    '''
+    Epoch of a TLE as a sortable number, year * 1000 + day of year
+
+    Input : [line 1 (str)]
+    Ouput : epoch (float)
+    '''
+    year = int(line1[18:20])
+    # Two digit years, 57 to 99 are 1957 to 1999 as in sgp4
+    year += 1900 if year >= 57 else 2000
+    return year * 1000.0 + float(line1[20:32])
+
+
+def source_label(source):
+    '''
+    Short name of a source: the CelesTrak group of an url, or the file name
+
+    Input : [url or path]
+    Ouput : label (str)
+    '''
+    if "GROUP=" in source:
+        return source.split("GROUP=", 1)[1].split("&", 1)[0]
+    return os.path.basename(source.split("?", 1)[0])
+
+
+class CatalogMerge:
+    '''
+    Merge of TLE sources keeping, for each NORAD ID, the element set with the newest
+    epoch, whatever the order the sources are added in. On equal epochs the source
+    with the higher rank (listed later) wins.
+
+    records   {satnum: (name, line1, line2)}
+    sources   {satnum: source the kept element set comes from}
+    groups    {satnum: [labels of every source listing the object]}
+    conflicts [(satnum, kept source, kept epoch, dropped source, dropped epoch)], one
+              per element set dropped for an older one. Identical copies of the
+              same element set (a debris group and "active") are not conflicts.
+    '''
+    def __init__(self):
+        self.records = {}
+        self.sources = {}
+        self.groups = collections.defaultdict(list)
+        self.conflicts = []
+        self._keys = {}
+
+    def add(self, source, records, rank=0):
+        '''
+        Merge the records of one source, in time linear in their number
+
+        Input : [source (url or path), {satnum: (name, line1, line2)}, rank]
+        '''
+        kept_records = self.records
+        kept_keys = self._keys
+        label = source_label(source)
+        for satnum, record in records.items():
+            self.groups[satnum].append(label)
+            key = (epoch_of(record[1]), rank)
+            kept = kept_keys.get(satnum)
+            if kept is None:
+                kept_records[satnum] = record
+                kept_keys[satnum] = key
+                self.sources[satnum] = source
+                continue
+
+            if record[1:] == kept_records[satnum][1:]:
+                # Same element set in an other group, keep the one with the higher rank
+                if key > kept:
+                    kept_keys[satnum] = key
+                    self.sources[satnum] = source
+                continue
+
+            if key > kept:
+                self.conflicts.append((satnum, source, key[0], self.sources[satnum], kept[0]))
+                kept_records[satnum] = record
+                kept_keys[satnum] = key
+                self.sources[satnum] = source
+            else:
+                self.conflicts.append((satnum, self.sources[satnum], kept[0], source, key[0]))
+
+    def report(self, limit=10):
+        '''
+        Print the number of conflicts and the first ones
+        '''
+        if not self.conflicts:
+            return
+        print(len(self.conflicts), "objects had an older element set in another source, the newest epoch was kept")
+        for satnum, kept_source, kept_epoch, dropped_source, dropped_epoch in self.conflicts[:limit]:
+            print("  %5d  kept %s (%.8f) over %s (%.8f)" % (satnum, source_label(kept_source), kept_epoch,
+                                                           source_label(dropped_source), dropped_epoch))
+
+
+def merge_sources(sources, workers=DOWNLOAD_WORKERS, timeout=DOWNLOAD_TIMEOUT, fetch=fetch_url, snapshot=None):
+    '''
+    Download, parse and merge TLE sources, see CatalogMerge.
+
+    sources is a list of (group, url). A source that cannot be downloaded (nor found
+    in the cache, see TLECache.fetch) is reported and skipped; the snapshot file, if
+    given, is then merged too, below every source.
+
+    The snapshot (gp.php) is only a fallback, not a source: its element sets date from
+    when it was saved, so merged every time it would bring back objects decayed since
+    then and offer weeks old elements for objects the sources no longer list.
+
+    Input : [sources, workers, timeout, fetch(url, timeout) -> bytes, snapshot path]
+    Ouput : CatalogMerge
+    '''
+    ranks = {url: rank for rank, (_, url) in enumerate(sources)}
+    groups = {url: group for group, url in sources}
+
+    merge = CatalogMerge()
+    failed = False
+    start = time.perf_counter()
+    for url, content, error in download_sources([url for _, url in sources], workers, timeout, fetch):
+        if error is not None:
+            print("Unable to load " + url + " : " + str(error))
+            failed = True
+            continue
+
+        parsed = parse_records(content)
+        merge.add(url, parsed, ranks[url])
+        print("Loaded", len(parsed), groups[url], "objects from", url,
+              "(%.1f s)" % (time.perf_counter() - start))
+
+    if failed and snapshot is not None and os.path.exists(snapshot):
+        with open(snapshot, "rb") as snapshot_file:
+            merge.add(snapshot, parse_records(snapshot_file.read()), -1)
+        print("Completed with the snapshot", snapshot, "from",
+              time.strftime("%Y-%m-%d", time.localtime(os.path.getmtime(snapshot))))
+
+    return merge
+
+
+class LazySatellites(collections.abc.Mapping):
+    '''
+    Read-only {satnum: EarthSatellite} mapping that only holds the TLE records.
+
+    A satellite is built from its lines when it is asked for; the cache_size most
+    recently used ones are kept built, the others are dropped and built again if
+    needed. "satnum in satellites" never builds anything.
+
+    groups optionally gives the source groups of each object, for CatalogIndex.
+    '''
+    def __init__(self, records, ts, cache_size=SATELLITE_CACHE_SIZE, groups=None):
+        self.records = records
+        self.ts = ts
+        self.cache_size = cache_size
+        self.groups = groups or {}
+        self._satellites = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, satnum):
+        '''
+        Input : [satnum]
+        Ouput : (name, line1, line2), KeyError if the object is not in the catalog
+        '''
+        return self.records[satnum]
+
+    def __getitem__(self, satnum):
+        with self._lock:
+            satellite = self._satellites.get(satnum)
+            if satellite is not None:
+                self._satellites.move_to_end(satnum)
+                return satellite
+
+        name, line1, line2 = self.record(satnum)
+        satellite = EarthSatellite(line1, line2, name or None, self.ts)
+        with self._lock:
+            self._satellites[satnum] = satellite
+            if len(self._satellites) > self.cache_size:
+                self._satellites.popitem(last=False)
+        return satellite
+
+    def __contains__(self, satnum):
+        return satnum in self.records
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+
+def load_catalog(sources, ts, workers=DOWNLOAD_WORKERS, timeout=DOWNLOAD_TIMEOUT, fetch=fetch_url, snapshot=None):
+    '''
+    Same as merge_sources, as a mapping of satellites built on demand
+
+    Input : [sources, timescale, workers, timeout, fetch(url, timeout) -> bytes, snapshot path]
+    Ouput : LazySatellites {satnum: EarthSatellite}
+    '''
+    return LazySatellites(merge_sources(sources, workers, timeout, fetch, snapshot).records, ts)
+
+
+#--------------## Compiled catalog ##-------------
+def compile_catalog(records, path=COMPILED_CATALOG, sources=None, groups=None):
+    '''
+    Write the records as a NumPy structured array holding a single row whose fields are
+    whole columns (satnum, name, intldesg, source, groups, elements, line1, line2),
+    sorted by satnum. Each column is therefore contiguous in the file and can be read
+    without the others.
+
+    Input : [{satnum: (name, line1, line2)}, path, {satnum: source url or path}, {satnum: [group labels]}]
+    Ouput : number of objects written
+    '''
+    satnums = sorted(records)
+    count = len(satnums)
+    names = [records[satnum][0].encode("ascii", "replace") for satnum in satnums]
+    labels = [source_label((sources or {}).get(satnum, "")).encode("ascii", "replace") for satnum in satnums]
+    memberships = [",".join(dict.fromkeys((groups or {}).get(satnum, ()))).encode("ascii", "replace")
+                   for satnum in satnums]
+    models = [Satrec.twoline2rv(records[satnum][1], records[satnum][2]) for satnum in satnums]
+
+    dtype = np.dtype([("satnum", "<i4", (count,)),
+                      ("name", "S%d" % max([len(name) for name in names] + [1]), (count,)),
+                      ("intldesg", "S8", (count,)),
+                      ("source", "S%d" % max([len(label) for label in labels] + [1]), (count,)),
+                      ("groups", "S%d" % max([len(membership) for membership in memberships] + [1]), (count,))]
+                     + [(element, "<f8", (count,)) for element in ELEMENTS]
+                     + [("line1", "S69", (count,)), ("line2", "S69", (count,))])
+    table = np.zeros((), dtype)
+    table["satnum"] = satnums
+    table["name"] = names
+    table["intldesg"] = [records[satnum][1][9:17].strip().encode() for satnum in satnums]
+    table["source"] = labels
+    table["groups"] = memberships
+    table["epoch"] = [model.jdsatepoch for model in models]
+    table["epoch_fraction"] = [model.jdsatepochF for model in models]
+    for element in ELEMENTS[2:]:
+        table[element] = [getattr(model, element) for model in models]
+    table["line1"] = [records[satnum][1].encode() for satnum in satnums]
+    table["line2"] = [records[satnum][2].encode() for satnum in satnums]
+
+    # Written aside and renamed, a running session may have the old file mapped
+    with open(path + ".tmp", "wb") as compiled:
+        np.save(compiled, table)
+    os.replace(path + ".tmp", path)
+    return count
+
+
+def compiled_is_fresh(path, max_age, dependencies=()):
+    '''
+    True if the compiled catalog exists, is younger than max_age and newer than its input files
+
+    Input : [path, max_age (s), [paths]]
+    Ouput : bool
+    '''
+    if not os.path.exists(path):
+        return False
+    compiled_time = os.path.getmtime(path)
+    if time.time() - compiled_time > max_age:
+        return False
+    return all(os.path.getmtime(dependency) <= compiled_time
+               for dependency in dependencies if os.path.exists(dependency))
+
+
+class CompiledCatalog(LazySatellites):
+    '''
+    LazySatellites over a memory-mapped compiled catalog.
+
+    Opening it only reads the header of the file. Lookups are a binary search in the
+    satnum column, the lines are read from the file when a satellite is built.
+    The columns are available as arrays through column(name).
+    '''
+    def __init__(self, path, ts, cache_size=SATELLITE_CACHE_SIZE):
+        LazySatellites.__init__(self, None, ts, cache_size)
+        self.path = path
+        self.table = np.load(path, mmap_mode="r")
+        self.satnums = self.table["satnum"]
+
+    def column(self, name):
+        return self.table[name]
+
+    def index(self, satnum):
+        '''
+        Input : [satnum]
+        Ouput : row of the object in the columns, None if it is not in the catalog
+        '''
+        try:
+            position = int(np.searchsorted(self.satnums, satnum))
+        except TypeError:
+            return None
+        if position < len(self.satnums) and self.satnums[position] == satnum:
+            return position
+        return None
+
+    def record(self, satnum):
+        '''
+        Input : [satnum]
+        Ouput : (name, line1, line2)
+        '''
+        position = self.index(satnum)
+        if position is None:
+            raise KeyError(satnum)
+        return (self.table["name"][position].decode("ascii"),
+                self.table["line1"][position].decode("ascii"),
+                self.table["line2"][position].decode("ascii"))
+
+    def source(self, satnum):
+        '''
+        Input : [satnum]
+        Ouput : label of the source the element set was taken from (see source_label)
+        '''
+        position = self.index(satnum)
+        if position is None:
+            raise KeyError(satnum)
+        return self.table["source"][position].decode("ascii")
+
+    def __contains__(self, satnum):
+        return self.index(satnum) is not None
+
+    def __iter__(self):
+        return iter(self.satnums.tolist())
+
+    def __len__(self):
+        return len(self.satnums)
+
+
+#--------------## Search ##-------------
+def designator(intldesg):
+    '''
+    International designator in the usual form, "82092A" -> "1982-092A"
+
+    Input : [designator as in the TLE]
+    Ouput : designator (str), empty if unknown
+    '''
+    intldesg = intldesg.strip()
+    if len(intldesg) < 5 or not intldesg[:5].isdigit():
+        return intldesg
+    year = int(intldesg[:2])
+    year += 1900 if year >= 57 else 2000
+    return str(year) + "-" + intldesg[2:]
+
+
+def normalize(text):
+    '''
+    Form used to compare names: upper case, "-" and "_" as spaces, single spaces
+    '''
+    return " ".join(text.upper().replace("-", " ").replace("_", " ").split())
+
+
+class CatalogIndex:
+    '''
+    Prefix and substring search on the name, international designator and source
+    groups of the objects of a catalog.
+
+    The normalized values of each field are kept sorted, a prefix search is a bisect.
+    They are also joined into one string, one value per line, so a substring search is
+    a few str.find over that string instead of a Python loop over the objects.
+    '''
+    FIELDS = ("name", "designator", "group")
+
+    def __init__(self, entries):
+        '''
+        Input : [iterable of (satnum, name, designator, [groups])]
+        '''
+        self.names = {}
+        self.designators = {}
+        values = {field: [] for field in self.FIELDS}
+        for satnum, name, object_designator, groups in entries:
+            self.names[satnum] = name
+            self.designators[satnum] = object_designator
+            values["name"].append((normalize(name), satnum))
+            values["designator"].append((normalize(object_designator), satnum))
+            values["group"].extend((normalize(group), satnum) for group in groups)
+
+        self._sorted = {}
+        self._text = {}
+        self._starts = {}
+        self._satnums = {}
+        for field, field_values in values.items():
+            field_values = [value for value in field_values if value[0]]
+            field_values.sort()
+            self._sorted[field] = field_values
+            self._text[field] = "".join(value + "\n" for value, _ in field_values)
+            self._starts[field] = list(itertools.accumulate((len(value) + 1 for value, _ in field_values[:-1]), initial=0))
+            self._satnums[field] = [satnum for _, satnum in field_values]
+
+    @classmethod
+    def from_catalog(cls, satellites):
+        '''
+        Index of a CompiledCatalog (from its columns) or of a LazySatellites (from its records)
+        '''
+        if hasattr(satellites, "column"):
+            columns = [satellites.column(name).tolist() for name in ("satnum", "name", "intldesg", "groups")]
+            return cls((satnum, name.decode("ascii"), designator(intldesg.decode("ascii")),
+                        [group for group in groups.decode("ascii").split(",") if group])
+                       for satnum, name, intldesg, groups in zip(*columns))
+        return cls((satnum, record[0], designator(record[1][9:17]), satellites.groups.get(satnum, []))
+                   for satnum, record in ((satnum, satellites.record(satnum)) for satnum in satellites))
+
+    def _prefix(self, field, query):
+        field_values = self._sorted[field]
+        position = bisect.bisect_left(field_values, (query,))
+        while position < len(field_values) and field_values[position][0].startswith(query):
+            yield field_values[position][1]
+            position += 1
+
+    def _substring(self, field, query):
+        text = self._text[field]
+        starts = self._starts[field]
+        satnums = self._satnums[field]
+        position = text.find(query)
+        while position != -1:
+            line = bisect.bisect_right(starts, position) - 1
+            yield satnums[line]
+            if line + 1 == len(starts):
+                return
+            position = text.find(query, starts[line + 1])
+
+    def search(self, query, limit=20, fields=FIELDS):
+        '''
+        Objects matching query, best first: NORAD ID, prefixes, then substrings
+
+        Input : [query, limit, fields searched]
+        Ouput : [satnum]
+        '''
+        query = normalize(query)
+        if not query:
+            return []
+
+        candidates = []
+        if query.isdigit() and int(query) in self.names:
+            candidates.append([int(query)])
+        # Values equal to the query sort first among the ones it is a prefix of
+        for field in fields:
+            candidates.append(self._prefix(field, query))
+        for field in fields:
+            candidates.append(self._substring(field, query))
+
+        found = {}
+        for satnums in candidates:
+            for satnum in satnums:
+                found.setdefault(satnum, None)
+                if len(found) >= limit:
+                    return list(found)
+        return list(found)
+
+
+def merge_catalog(sources, personal_paths=(), workers=DOWNLOAD_WORKERS, timeout=DOWNLOAD_TIMEOUT,
+                  fetch=fetch_url, snapshot=None):
+    '''
+    Merge the sources and the personal TLE files (which win over every source on equal
+    epochs), reporting the conflicts
+
+    Input : [sources, [personal TLE paths], workers, timeout, fetch, snapshot path]
+    Ouput : CatalogMerge
+    '''
+    merge = merge_sources(sources, workers, timeout, fetch, snapshot)
+    for rank, personal_path in enumerate(personal_paths, len(sources)):
+        with open(personal_path, "rb") as personal_file:
+            merge.add(personal_path, parse_records(personal_file.read()), rank)
+    merge.report()
+    return merge
+
+
+def build_catalog(sources, personal_paths=(), path=COMPILED_CATALOG, workers=DOWNLOAD_WORKERS,
+                  timeout=DOWNLOAD_TIMEOUT, fetch=fetch_url, snapshot=None):
+    '''
+    Merge the sources and the personal TLE files and compile the result to path.
+    The snapshot (gp.php) is only merged when a source is missing, see merge_sources.
+
+    Input : [sources, [personal TLE paths], path, workers, timeout, fetch, snapshot path]
+    Ouput : number of objects compiled
+    '''
+    merge = merge_catalog(sources, personal_paths, workers, timeout, fetch, snapshot)
+    return compile_catalog(merge.records, path, merge.sources, merge.groups)
+
+
+def catalog_changes(old, new):
+    '''
+    Differences between two catalogs (LazySatellites or CompiledCatalog)
+
+    Input : [old catalog, new catalog]
+    Ouput : ([(satnum, old epoch, new epoch)] of the objects with a new element set, [added satnums], [removed satnums])
+    '''
+    changed = []
+    for satnum in new:
+        if satnum in old:
+            old_line1 = old.record(satnum)[1]
+            new_line1 = new.record(satnum)[1]
+            if old_line1 != new_line1:
+                changed.append((satnum, epoch_of(old_line1), epoch_of(new_line1)))
+    added = [satnum for satnum in new if satnum not in old]
+    removed = [satnum for satnum in old if satnum not in new]
+    return changed, added, removed
+
+
+def read_url_list(path):
+    '''
+    Input : [path of a text file with one url per line]
+    Ouput : [urls]
+    '''
+    with open(path) as url_file:
+        return [url.strip() for url in url_file if url.strip()]
+
+
+if __name__ == "__main__":
+    root = os.path.dirname(os.path.abspath(__file__))
+    sources = [("deb", url) for url in read_url_list(os.path.join(root, "debris_url.txt"))] + \
+              [("sat", url) for url in read_url_list(os.path.join(root, "satellites_url.txt"))]
+    start = time.perf_counter()
+    count = build_catalog(sources, [os.path.join(root, "personal_tle.txt")],
+                          fetch=TLECache().fetch, snapshot=SNAPSHOT)
+    print("Compiled", count, "objects to", COMPILED_CATALOG, "(%.1f s)" % (time.perf_counter() - start))
@@ -0,0 +1,166 @@
+'''
+Dense ephemeris of the followed target
+
+Computing a position with skyfield takes about a millisecond: the difference
+vector, the Earth orientation and the frame conversions are rebuilt at every
+call. During a pass the same target is asked for again and again (alignment,
+rates, error thread), so its positions and velocities are computed once on a
+time grid and then interpolated.
+
+The table holds the target position relative to the observatory, in the true
+equator and equinox of date (RA/Dec) and in the horizon frame (alt/az), with the
+velocities as derivatives: a cubic Hermite polynomial on every interval gives
+both between the grid times. Vectors stay smooth where the angles do not (RA
+near the pole, azimuth near the zenith); angles and rates are derived from them
+when read. The grid step is halved until the error, measured against skyfield
+in the middle of every interval where it is largest, is below the tolerance.
+
+    table = TargetEphemeris(telesto.target, telesto.observatory, ts.now(), 900)
+    alt, az, ra, dec, alt_rate, az_rate, ra_rate, dec_rate, distance, range_rate = table(table.since_start(30))
+'''
+import math
+import time
+
+import numpy as np
+from skyfield.constants import DAY_S
+from skyfield.framelib import true_equator_and_equinox_of_date
+
+EPHEMERIS_STEP = 10.0  # First grid step tried, [s]
+MIN_STEP = 0.5  # Finest grid step, [s]
+TOLERANCE = 0.1  # Largest error on the sky [arcsec] and on the angular rate [arcsec/s]
+REFRACTION_DELTA = 1e-3  # Altitude step for the refraction derivative, [deg]
+
+ARCSEC = math.pi / (180 * 3600)  # [rad]
+
+
+def ephemeris_key(satellite):
+    '''
+    Identifies an element set: the table of a target is valid as long as its key is the same
+
+    Input : [EarthSatellite]
+    Ouput : (Norad ID, epoch Julian date, epoch fraction)
+    '''
+    model = satellite.model
+    return model.satnum, model.jdsatepoch, model.jdsatepochF
+
+
+def _sample(satellite, observatory, t):
+    '''
+    Table columns and their derivatives at the times t, from skyfield: equatorial x, y, z,
+    horizon x (north), y (east), z (up) [km] and refraction [deg]
+
+    Ouput : (values, rates per second), arrays of shape (len(t), 7)
+    '''
+    topocentric = (satellite - observatory).at(t)
+    equatorial, equatorial_velocity = topocentric.frame_xyz_and_velocity(true_equator_and_equinox_of_date)
+    horizon, horizon_velocity = topocentric.frame_xyz_and_velocity(observatory)
+    alt, _, _, alt_rate, _, _ = topocentric.frame_latlon_and_rates(observatory)
+
+    # Same atmospheric correction as altaz('standard'), derived along the altitude. skyfield
+    # stops refracting above 89.9 deg, a step of 0.5 arcsec the interpolation smooths out
+    altitude = alt.degrees
+    refraction = observatory.refract(altitude, 'standard', 'standard').degrees - altitude
+    slope = (observatory.refract(altitude + REFRACTION_DELTA, 'standard', 'standard').degrees -
+             observatory.refract(altitude - REFRACTION_DELTA, 'standard', 'standard').degrees) / (2 * REFRACTION_DELTA)
+
+    values = np.concatenate([equatorial.km, horizon.km, [refraction]]).T
+    rates = np.concatenate([equatorial_velocity.km_per_s, horizon_velocity.km_per_s,
+                            [(slope - 1) * alt_rate.degrees.per_second]]).T
+    return values, rates
+
+
+def _spherical(x, y, z, vx, vy, vz):
+    # Latitude, longitude [rad], their rates [rad/s], distance [km] and range rate [km/s]
+    rho2 = x * x + y * y
+    rho = math.sqrt(rho2)
+    r2 = rho2 + z * z
+    lat = math.atan2(z, rho)
+    lon = math.atan2(y, x) % (2 * math.pi)
+    lon_rate = (x * vy - y * vx) / rho2
+    lat_rate = (vz * rho2 - z * (x * vx + y * vy)) / (r2 * rho)
+    r = math.sqrt(r2)
+    return lat, lon, lat_rate, lon_rate, r, (x * vx + y * vy + z * vz) / r
+
+
+class TargetEphemeris:
+    '''
+    Positions and rates of a satellite seen from the observatory, tabulated over
+    [t0, t0 + duration] and read by interpolation.
+
+    Input : [EarthSatellite, observatory (wgs84.latlon), start (skyfield Time), duration [s],
+             first step [s], tolerance [arcsec]]
+    '''
+    def __init__(self, satellite, observatory, t0, duration, step=EPHEMERIS_STEP, tolerance=TOLERANCE):
+        self.key = ephemeris_key(satellite)
+        self.t0 = t0
+        self.unix0 = t0.utc_datetime().timestamp()
+        self.duration = float(duration)
+
+        while True:
+            count = max(int(np.ceil(self.duration / step)), 1)
+            self.step = self.duration / count
+            seconds = np.arange(count + 1) * self.step
+            self.__fit(*_sample(satellite, observatory, t0 + seconds / DAY_S))
+
+            # Hermite interpolation errs the most around the middle of the intervals
+            middle = seconds[:-1] + self.step / 2
+            exact, exact_rates = _sample(satellite, observatory, t0 + middle / DAY_S)
+            interpolated, interpolated_rates = self.__evaluate(middle)
+            distance = np.linalg.norm(exact[:, None, :3], axis=2)
+            errors = np.linalg.norm((interpolated - exact)[:, :6].reshape(-1, 2, 3), axis=2) / distance
+            rate_errors = np.linalg.norm((interpolated_rates - exact_rates)[:, :6].reshape(-1, 2, 3), axis=2) / distance
+            self.max_error = float(errors.max() / ARCSEC)
+            self.max_rate_error = float(rate_errors.max() / ARCSEC)
+            if (self.max_error <= tolerance and self.max_rate_error <= tolerance) or self.step / 2 < MIN_STEP:
+                break
+            step = self.step / 2
+
+    def __fit(self, values, rates):
+        # Cubic of every interval in u = (s - s_i) / step, coefficients of u^0 to u^3
+        p0, p1 = values[:-1], values[1:]
+        m0, m1 = rates[:-1] * self.step, rates[1:] * self.step
+        self.coefficients = np.stack([p0, m0, 3 * (p1 - p0) - 2 * m0 - m1, 2 * (p0 - p1) + m0 + m1], axis=1)
+        # Read one time at a time, plain floats are much faster than numpy for that
+        self.rows = [list(zip(*interval)) for interval in self.coefficients.tolist()]
+
+    def __evaluate(self, seconds):
+        index = np.clip((seconds // self.step).astype(int), 0, len(self.coefficients) - 1)
+        u = ((seconds - index * self.step) / self.step)[:, None]
+        c0, c1, c2, c3 = np.moveaxis(self.coefficients[index], 1, 0)
+        return ((c3 * u + c2) * u + c1) * u + c0, ((3 * c3 * u + 2 * c2) * u + c1) / self.step
+
+    def covers(self, seconds):
+        '''
+        Input : [seconds after t0]
+        Ouput : True if the table can answer for that time
+        '''
+        return 0.0 <= seconds <= self.duration
+
+    def since_start(self, offset=0.0):
+        '''
+        Input : [offset from now, [s]]
+        Ouput : seconds after t0 of now + offset, from the system clock (UTC)
+        '''
+        return time.time() - self.unix0 + offset
+
+    def __call__(self, seconds):
+        '''
+        Position and rates of the target, seconds after t0
+
+        Input : [seconds after t0 (within the table)]
+        Ouput : (Altitude (refracted), Azimuth, Right Ascension, Declination [deg], Alt rate, Az rate,
+                 RA rate, Dec rate [arcsec/s], Distance [km], Range rate [km/s])
+        '''
+        index = min(max(int(seconds // self.step), 0), len(self.rows) - 1)
+        u = (seconds - index * self.step) / self.step
+        values = []
+        rates = []
+        for c0, c1, c2, c3 in self.rows[index]:
+            values.append(((c3 * u + c2) * u + c1) * u + c0)
+            rates.append(((3 * c3 * u + 2 * c2) * u + c1) / self.step)
+
+        dec, ra, dec_rate, ra_rate, distance, range_rate = _spherical(*values[0:3], *rates[0:3])
+        alt, az, alt_rate, az_rate, _, _ = _spherical(*values[3:6], *rates[3:6])
+        return (math.degrees(alt) + values[6], math.degrees(az), math.degrees(ra), math.degrees(dec),
+                alt_rate / ARCSEC + rates[6] * 3600, az_rate / ARCSEC, ra_rate / ARCSEC, dec_rate / ARCSEC,
+                distance, range_rate)
@@ -6,8 +6,8 @@ Definition of the functions used in the TelestoInLine.py script
 # Generic imports
 import time
 import threading
+import numpy as np
 from subprocess import Popen, DEVNULL
-from datetime import timedelta
 
 # Skyfield is a Python library for computing positions of celestial bodies in the sky.
 import skyfield
@@ -17,11 +17,28 @@ from skyfield.api import N, E
 # Library to control the telescope, send command in javascript.
 from PySkyX_ks import *
 
+# TLE catalogs: download, cache and compiled catalog
+from catalog import TLECache, CompiledCatalog, LazySatellites, CatalogIndex, build_catalog, merge_catalog, compile_catalog, \
+    compiled_is_fresh, catalog_changes, normalize, SNAPSHOT, COMPILED_CATALOG
+# Propagation of the whole catalog at once
+from propagation import CatalogPropagator
+# Pass prediction for the whole catalog
+from passes import predict_passes
+# Sun and Earth shadow for the optical visibility of the passes
+from visibility import load_ephemeris
+# Interpolated positions and rates of the followed target
+from ephemeris import TargetEphemeris, ephemeris_key
+# Tracking rates updated along the pass
+from tracking import RateScheduler, rate_profile, TRACKING_CADENCE
+# Measured latencies of the mount commands, for the lead time and the send instants
+from latency import MountLatency, calibrate, slew_distance, sleep_until, time_rate_commands, timed, LATENCY_FILE, \
+    MIN_SAMPLES
+
 
 
 ### Telesto control ###
 class TelestoClass: 
-    def __init__(self): 
+    def __init__(self, simulation=False): 
         self.satellites = {}
         self.location = [46.30916667, 6.13472222]  # raw location of the observatory (WGS84), simpler than automatically get it
         self.observatory = skyfield.api.wgs84.latlon(self.location[0]*N, self.location[1]*E, elevation_m=443)  # vector used to compute topocentric coordinates
@@ -36,6 +53,44 @@ class TelestoClass:
         self.error_thread_stop_event = threading.Event()
         self.picture_thread = None
         self.picture_thread_stop_event = threading.Event()
+        # Local copies of the TLE catalogs, downloaded again when older than max_age [s]
+        self.tle_cache = TLECache(max_age=2*3600)
+        # Search by name, international designator and group, built with the catalog
+        self.catalog_index = None
+        # The catalog is reloaded in the background, swapped with the index under this lock
+        self.catalog_lock = threading.Lock()
+        self.refresh_interval = 2*3600  # [s], same as the TLE cache max_age
+        self.refresh_thread = None
+        self.refresh_stop_event = threading.Event()
+        # Whole catalog propagation, built the first time it is needed
+        self.propagator = None
+        # Last pass prediction of the catalog (passes.PassTable), see predict_passes
+        self.passes = None
+        # JPL ephemeris for the Sun, None when it could not be downloaded (analytic Sun instead)
+        self.ephemeris = None
+        # Positions and rates of the target over its pass, built again for a new target or TLE
+        self.target_ephemeris = None
+        self.ephemeris_duration = 20*60  # [s], when the pass of the target is not predicted
+        # Tracking rates sent every tracking_cadence seconds, ahead by the measured latency
+        self.tracking_cadence = TRACKING_CADENCE  # [s]
+        self.rate_scheduler = None
+        # Deadline of each mount command while following, instead of the 600 s TSXTimeout:
+        # a command that late is no use for a pass
+        self.follow_timeout = 10  # [s]
+        # Stopping may come from the GUI and from the error thread at once
+        self.rate_scheduler_lock = threading.Lock()
+        # Pointing error checked every error_check_interval seconds, the errors of the target in tracking_errors
+        self.error_check_interval = 30  # [s]
+        self.tracking_errors = []
+        # Slew and rate command latencies, kept from one session to the next (latency.json)
+        self.latency_file = LATENCY_FILE
+        self.latency = MountLatency.load(self.latency_file)
+        # TheSkyX traffic statistics of every session, written at exit
+        self.stats_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tsx_stats')
+        # Single thread sending all the TheSkyX commands, mount before camera before focuser
+        self.dispatcher = TSXDispatcher()
+        # Exposures are waited for in jobs this long at most: a rate update waits no longer for its turn
+        self.exposure_poll = 0.2  # [s]
 
         # String containing program status
         self.status = "Please start the program"
@@ -45,6 +100,11 @@ class TelestoClass:
         self.original_session_name = "chazelas"
         self.original_binning_X = "1"
         self.original_binning_Y = "1"
+
+        # Imaging profile of TheSkyX on the observatory PC, the observer name is written in it
+        self.imaging_profile = 'C:\\Users\\admin\\Documents\\Software Bisque\\TheSkyX Professional Edition\\Imaging System Profiles\\ImagingSystem.ini'
+        # True when running against PySkyX_sim: no software to launch and no imaging profile to edit
+        self.simulation = simulation
     
 
     ##### Public methods call by the user #####
@@ -76,29 +136,38 @@ class TelestoClass:
             # Set session informations
             self.session_name = session_name
             print("Session name set to "+self.session_name)
-            init_file = open('C:\\Users\\admin\\Documents\\Software Bisque\\TheSkyX Professional Edition\\Imaging System Profiles\\ImagingSystem.ini', 'rt')
-            content = init_file.read()
-            content = content.replace("m_csobserver="+self.original_session_name,"m_csobserver="+self.session_name)
-            init_file.close()
-            init_file = open('C:\\Users\\admin\\Documents\\Software Bisque\\TheSkyX Professional Edition\\Imaging System Profiles\\ImagingSystem.ini', 'wt')
-            init_file.write(content)
-            init_file.close()
+            if not self.simulation:
+                init_file = open(self.imaging_profile, 'rt')
+                content = init_file.read()
+                content = content.replace("m_csobserver="+self.original_session_name,"m_csobserver="+self.session_name)
+                init_file.close()
+                init_file = open(self.imaging_profile, 'wt')
+                init_file.write(content)
+                init_file.close()
             
 
-            # start necessary software
-            self.__launch_software()
+                # start necessary software
+                self.__launch_software()
 
-            # wait for software to be correctly launch
-            time.sleep(5)
+                # wait for software to be correctly launch
+                time.sleep(5)
+
+            # static properties cached by a previous session may be stale
+            TSXInvalidateCache()
 
             # connect camera
-            TSXSend("ccdsoftCamera.Connect()")
+            self.dispatcher.call(TSXPriorityHousekeeping, TSXSend, "ccdsoftCamera.Connect()")
 
             # check correct launch
-            if preRun() == "Fail":
+            if self.dispatcher.call(TSXPriorityHousekeeping, preRun) == "Fail":
                 return True
 
             self.has_started = True
+
+            # Reload the catalog periodically for the rest of the night
+            self.refresh_stop_event = threading.Event()  #Reset the flag
+            self.refresh_thread = threading.Thread(target=self.__refresh_catalog_thread, daemon=True)
+            self.refresh_thread.start()
             
             # Update status
             self.status = "Ready"
@@ -117,28 +186,37 @@ class TelestoClass:
             print("You are following a target. please stop following before exit.")
             return False
         # set back original settings
-        TSXSend("cddsoftCamera.BinX = "+self.original_binning_X)
-        TSXSend("cddsoftCamera.BinY = " + self.original_binning_Y)
-
-        init_file = open(
-            'C:\\Users\\admin\\Documents\\Software Bisque\\TheSkyX Professional Edition\\Imaging System Profiles\\ImagingSystem.ini',
-            'rt')
-
-        content = init_file.read()
-        content = content.replace(self.session_name, self.original_session_name)
-        init_file.close()
-        init_file = open(
-            'C:\\Users\\admin\\Documents\\Software Bisque\\TheSkyX Professional Edition\\Imaging System Profiles\\ImagingSystem.ini',
-            'wt')
-        init_file.write(content)
-        init_file.close()
+        self.dispatcher.call(TSXPriorityHousekeeping, TSXSendBatch, ["cddsoftCamera.BinX = "+self.original_binning_X,
+                                                                    "cddsoftCamera.BinY = " + self.original_binning_Y])
+
+        if not self.simulation:
+            init_file = open(self.imaging_profile, 'rt')
+
+            content = init_file.read()
+            content = content.replace(self.session_name, self.original_session_name)
+            init_file.close()
+            init_file = open(self.imaging_profile, 'wt')
+            init_file.write(content)
+            init_file.close()
+
+        # Stop catalog refresh
+        self.refresh_stop_event.set()
 
         print("Disconnect Cam...\n")
-        camDisconnect("Imager")
+        self.dispatcher.call(TSXPriorityHousekeeping, camDisconnect, "Imager")
+        self.dispatcher.close()
+
+        # Keep the TheSkyX traffic statistics of the session
+        os.makedirs(self.stats_dir, exist_ok=True)
+        stats_path = os.path.join(self.stats_dir,
+                                  "tsx_stats_" + self.session_name + "_" + time.strftime("%Y%m%d_%H%M%S") + ".json")
+        TSXStats.export(stats_path, {"dispatcher": self.dispatcher.summary()})
+        print("TheSkyX traffic statistics saved in " + stats_path)
 
-        print("closing all app...\n")
-        self.Maestro.terminate()
-        self.SkyX.terminate()
+        if not self.simulation:
+            print("closing all app...\n")
+            self.Maestro.terminate()
+            self.SkyX.terminate()
 
         print("App closed")
 
@@ -159,23 +237,28 @@ class TelestoClass:
             print("You are following a satellite. Please stop following before moving to another target")
             return False,"You are following a satellite. Please stop following before moving to another target"
 
-        args = arg.split()
-        if len(args) != 1:
-            print("\nInvalid argument number: target_satellites [catalog number]\n")
-            return False,"Invalid argument number: target_satellites [Norad ID]"
-        
-        if int(args[0]) not in self.satellites:
-            print("\nInvalid target: please use an existing target\n")
-            return False,"Invalid target: please use an existing target"
+        # The catalog may be swapped by the refresh thread meanwhile
+        with self.catalog_lock:
+            satnum, message = self.__find_target(arg)
+            if satnum is None:
+                print("\n"+message+"\n")
+                return False,message
 
-        self.target = self.satellites[int(args[0])]
+            self.target = self.satellites[satnum]
         # Update status
         self.status = "Following "+self.target.name+"..."
 
-        if not self.__follow_sat_using_rate():
-            return False,"Target will be too low in the sky. Please choose another target"
+        try:
+            if not self.__follow_sat_using_rate():
+                return False,"Target will be too low in the sky. Please choose another target"+self.__next_pass(satnum)
+        except TSXError as error:
+            print('TheSkyX error while aligning the telescope:', error)
+            self.is_following = False
+            self.status = "Ready"
+            return False,"TheSkyX error: "+str(error)
 
         # Start error thread
+        self.tracking_errors = []
         self.error_thread_stop_event = threading.Event()  #Reset the flag
         self.tracking_error_thread = threading.Thread(target=self.__control_error_thread)
         self.tracking_error_thread.start()
@@ -200,13 +283,118 @@ class TelestoClass:
         if self.picture_thread is not None:
             self.picture_thread_stop_event.set()
         #Stop Telescope movement
-        setTrackingRate(switch=False) # stop tracking
+        self.__stop_tracking()
 
         # Update status
         self.status = "Ready"
 
         return True, ""
 
+    def calibrate_latency(self):
+        '''
+        Measure the slew and rate command latencies of the mount (it moves, see latency.calibrate),
+        used for the lead time of the next targets
+
+        Input : None
+        Ouput : (True, "") or (False, message)
+        '''
+        if not self.has_started:
+            print("\nLaunch starting procedure first\n")
+            return False,"Launch starting procedure first"
+        if self.is_following:
+            print("You are following a satellite. Please stop following before calibrating")
+            return False,"You are following a satellite. Please stop following before calibrating"
+
+        self.status = "Calibrating..."
+        try:
+            calibrate(self.dispatcher, self.latency)
+        except TSXError as error:
+            print('TheSkyX error while calibrating:', error)
+            self.status = "Ready"
+            return False,"TheSkyX error: "+str(error)
+        self.__save_latency()
+        print(self.latency.report())
+        self.status = "Ready"
+        return True,""
+
+    def search_satellites(self, query, limit=20):
+        '''
+        Search the catalog by name ("STARLINK-1234"), international designator ("1982-092"),
+        source group or Norad ID, best matches first
+
+        Input : [query, limit]
+        Ouput : [(Norad ID, name, international designator)]
+        '''
+        if self.catalog_index is None:
+            return []
+        return [(satnum, self.catalog_index.names[satnum], self.catalog_index.designators[satnum])
+                for satnum in self.catalog_index.search(query, limit)]
+
+    def refresh_catalog(self):
+        '''
+        Reload the TLE sources (through the TLE cache) and swap in the new catalog.
+        The followed target keeps the element set it was started with.
+
+        Input : None
+        Ouput : ([(Norad ID, old epoch, new epoch)], [added Norad IDs], [removed Norad IDs])
+        '''
+        sources, personal_paths = self.__catalog_sources()
+        merge = merge_catalog(sources, personal_paths, fetch=self.tle_cache.fetch, snapshot=SNAPSHOT)
+
+        # Built aside, the session keeps using the current catalog until the swap
+        satellites = LazySatellites(merge.records, self.ts, groups=merge.groups)
+        catalog_index = CatalogIndex.from_catalog(satellites)
+        changed, added, removed = catalog_changes(self.satellites, satellites)
+        with self.catalog_lock:
+            self.satellites = satellites
+            self.catalog_index = catalog_index
+
+        print("Catalog refreshed:", len(changed), "new element sets,", len(added), "added,", len(removed), "removed")
+        target = self.target
+        if self.is_following and target is not None and target.model.satnum in [satnum for satnum, _, _ in changed]:
+            print("The followed target "+str(target.name)+" has a new element set, used when it is followed again")
+
+        # For the next start. A mapped catalog.npy cannot be replaced on Windows, it is then compiled at the next start
+        try:
+            compile_catalog(merge.records, COMPILED_CATALOG, merge.sources, merge.groups)
+        except OSError as error:
+            print("Compiled catalog not updated:", error)
+
+        return changed, added, removed
+
+    def satellites_above(self, min_altitude=10):
+        '''
+        List the objects of the catalog above min_altitude right now, highest first. Objects
+        with stale elements or propagated out of any Earth orbit are left out (see propagation.py)
+
+        Input : [min_altitude (degrees)]
+        Ouput : [(Norad ID, name, Altitude, Azimuth, Distance (km))]
+        '''
+        # The whole catalog is propagated at once, see propagation.py
+        if self.propagator is None or self.propagator.satellites is not self.satellites:
+            self.propagator = CatalogPropagator(self.satellites, self.observatory)
+
+        satnums, alt, az, distance = self.propagator.above(self.ts.now(), min_altitude)
+        return [(int(satnum), self.satellites.record(int(satnum))[0], float(alt[i]), float(az[i]), float(distance[i]))
+                for i, satnum in enumerate(satnums)]
+
+    def predict_passes(self, hours=12, min_altitude=10):
+        '''
+        Predict the passes of every object of the catalog from now on, kept in self.passes,
+        each with its visible part (object in sunlight, Sun below -6 degrees)
+
+        Input : [hours, min_altitude (degrees)]
+        Ouput : passes.PassTable sorted by start, times in seconds after its t0
+        '''
+        with self.catalog_lock:
+            satellites = self.satellites
+        # Shards of the catalog predicted in a process pool, see passes.py
+        self.passes = predict_passes(satellites, self.observatory, self.ts.now(), hours, min_altitude,
+                                     ephemeris=self.ephemeris)
+        print(len(self.passes), "passes above", min_altitude, "degrees in the next", hours, "hours,",
+              len(self.passes.visible()), "of them visible")
+        return self.passes
+
     def take_picture(self, exposure_time, binning_X, binning_Y, filter, interval=0, duration=0):
         '''
         \nTake a picture \n
@@ -226,6 +414,46 @@ class TelestoClass:
             return False,"Invalid argument: binning must be greater than 0"
         
         ## Settting parameters
+        try:
+            filter_num = self.dispatcher.call(TSXPriorityCamera, self.__set_camera, exposure_time, binning_X, binning_Y, filter)
+        except TSXError as error:
+            print("Error: " + str(error))
+            return False,"Unable to set the camera: "+str(error)
+
+        if interval == "": # Only one observation
+            # Update status
+            self.status = "Taking picture..."
+            # Take picture
+            success = self.__take_image()
+            if not success:
+                return False,"Unable to take picture"
+            
+            print("Picture taken")
+            # Update status
+            self.status = "Following "+str(self.target.name)+"..."
+            return True,""
+
+        else:
+            # Start a thread to take pictures
+            # Update status
+            self.status = "Taking pictures of "+str(self.target.name)+"..."
+            filter_name = self.dispatcher.call(TSXPriorityCamera, TSXSendCached,
+                                               "ccdsoftCamera.szFilterName(" + str(filter_num) + ")")
+            print("Imager: " + str(exposure_time) + "s exposure through " + filter_name + " filter.")
+            self.picture_param_thread = [interval, duration]
+            self.picture_thread_stop_event = threading.Event()  #Reset the flag
+            self.picture_thread = threading.Thread(target=self.__take_picture_thread)
+            self.picture_thread.start()
+
+            return True,""
+
+    def __set_camera(self, exposure_time, binning_X, binning_Y, filter):
+        '''
+        Set exposure time, binning and filter of the camera, as one dispatcher job
+
+        Input : [exposure_time, binning_X, binning_Y, filter]
+        Ouput : index of the selected filter
+        '''
         TSXSend("ccdsoftCamera.ExposureTime = " + str(exposure_time))
         TSXSend("ccdsoftCamera.BinX = "+str(binning_X))
         TSXSend("ccdsoftCamera.BinY = " + str(binning_Y))
@@ -264,31 +492,7 @@ class TelestoClass:
             TSXSend("ccdsoftCamera.FilterIndexZeroBased = 0")
             filter_num = 0
 
-        if interval == "": # Only one observation
-            # Update status
-            self.status = "Taking picture..."
-            # Take picture
-            success = self.__take_image()
-            if not success:
-                return False,"Unable to take picture"
-            
-            print("Picture taken")
-            # Update status
-            self.status = "Following "+str(self.target.name)+"..."
-            return True,""
-
-        else:
-            # Start a thread to take pictures
-            # Update status
-            self.status = "Taking pictures of "+str(self.target.name)+"..."
-            print("Imager: " + str(exposure_time) + "s exposure through " \
-                      + TSXSend("ccdsoftCamera.szFilterName(" + str(filter_num) + ")") + " filter.")
-            self.picture_param_thread = [interval, duration]
-            self.picture_thread_stop_event = threading.Event()  #Reset the flag
-            self.picture_thread = threading.Thread(target=self.__take_picture_thread)
-            self.picture_thread.start()
-
-            return True,""
+        return filter_num
 
     def stop_taking_picture(self):
         '''
@@ -310,6 +514,20 @@ class TelestoClass:
         '''
         \nChange the focus\n
         '''
+        try:
+            self.dispatcher.call(TSXPriorityFocus, self.__move_focuser, step)
+        except TSXError as error:
+            print("Error while moving the focuser:", error)
+            return False,"Unable to move the focuser: "+str(error)
+        return True,""
+
+    def __move_focuser(self, step):
+        '''
+        Move the focuser by step, as one dispatcher job
+
+        Input : [step]
+        Ouput : None
+        '''
         # Connect the focuser
         TSXSend("ccdsoftCamera::focConnect()")
         # Change focus
@@ -319,7 +537,6 @@ class TelestoClass:
             TSXSend("ccdsoftCamera::focMoveIn("+str(abs(step))+")")
         # Disconnect the focuser
         TSXSend("ccdsoftCamera::focDisconnect()")
-        return True,""
 
     def update_display(self):
         '''
@@ -362,28 +579,92 @@ class TelestoClass:
     def __init_time(self):
         self.ts = load.timescale()
         self.time = self.ts.now()
+        # Cached in ephemeris/, downloaded at the first start
+        self.ephemeris = load_ephemeris()
 
     # Load all satellites and debris from TLE files
     def __init_file(self):
+        root = os.path.dirname(os.path.abspath(__file__))
+        url_paths = [os.path.join(root, 'debris_url.txt'), os.path.join(root, 'satellites_url.txt')]
+
+        # The compiled catalog is rebuilt when older than the TLE cache, or when a list changed
+        sources, personal_paths = self.__catalog_sources()
+        if compiled_is_fresh(COMPILED_CATALOG, self.tle_cache.max_age, url_paths + personal_paths):
+            print("Load compiled catalog\n")
+        else:
+            # download every file at once, each one is merged in the general dictionary as soon as it arrives
+            print("Load debris and satellites files and personal tle\n")
+            build_catalog(sources, personal_paths, COMPILED_CATALOG, fetch=self.tle_cache.fetch, snapshot=SNAPSHOT)
+
+        # Memory-mapped, a satellite is only built when it is followed
+        self.satellites = CompiledCatalog(COMPILED_CATALOG, self.ts)
+        self.catalog_index = CatalogIndex.from_catalog(self.satellites)
+
+        print("Loaded", len(self.satellites), "debris and satellites")
+
+    def __catalog_sources(self):
+        '''
+        Sources of the catalog: the URLs of the debris and satellites lists and the personal TLE file
+
+        Input : None
+        Ouput : ([(group, url)], [personal TLE paths])
+        '''
         # Read URLs from text files
         debris_urls = self.__read_url('debris_url.txt')
         satellites_urls = self.__read_url('satellites_url.txt')
+        sources = [("deb", url) for url in debris_urls] + [("sat", url) for url in satellites_urls]
         # Read personal TLE file
-        personal_paths = 'personal_tle.txt'
-
-        # load each files then append it in a general dictionary
-        print("Load debris files\n")
-        self.__load_file("deb", debris_urls)
+        personal_paths = [os.path.join(os.path.dirname(os.path.abspath(__file__)), 'personal_tle.txt')]
+        return sources, personal_paths
 
-        print("Load satellites files\n")
-        self.__load_file("sat", satellites_urls)
-
-        print("Load personal tle\n")
-        temp = load.tle_file(personal_paths, reload=True)
-        self.satellites.update({sat.model.satnum: sat for sat in temp})
+    def __refresh_catalog_thread(self):
+        '''
+        Refresh the catalog every refresh_interval seconds until exit
+        '''
+        while not self.refresh_stop_event.wait(self.refresh_interval):
+            try:
+                self.refresh_catalog()
+            except Exception as error:
+                print("Catalog refresh failed:", error)
 
+    def __find_target(self, arg):
+        '''
+        Norad ID of the target given by the user: the ID itself, or a name or designator
+        matching a single object
 
-        print("Loaded", len(self.satellites), "debris and satellites")
+        Input : [arg]
+        Ouput : (Norad ID or None, error message)
+        '''
+        query = arg.strip()
+        if not query:
+            return None,"Invalid argument number: target_satellites [Norad ID]"
+        if query.isdigit():
+            if int(query) not in self.satellites:
+                return None,"Invalid target: please use an existing target"
+            return int(query),""
+
+        matches = self.search_satellites(query, 6)
+        # A full name wins over the longer names it is the start of ("ISS (ZARYA)" and "ISS (ZARYA) DEB")
+        exact = [match for match in matches if normalize(match[1]) == normalize(query)]
+        if len(exact) == 1:
+            matches = exact
+        if not matches:
+            return None,"Invalid target: please use an existing target"
+        if len(matches) > 1:
+            return None,"Several objects match '"+query+"': "+", ".join(name+" ("+str(satnum)+")" for satnum, name, _ in matches[:5])
+        return matches[0][0],""
+
+    def __next_pass(self, satnum):
+        # Next rise of the target in the last pass prediction, if any
+        if self.passes is None:
+            return ""
+        now = (self.ts.now() - self.passes.t0) * 86400
+        for row in self.passes.for_satellite(satnum):
+            if row["start"] > now:
+                visible = "not visible" if np.isnan(row["visible_start"]) else \
+                    "visible from "+self.passes.datetime(row["visible_start"]).strftime("%H:%M:%S")
+                return ". Next pass at "+self.passes.datetime(row["start"]).strftime("%H:%M:%S")+" UTC, up to %.0f degrees, " % row["max_altitude"]+visible
+        return ""
 
     def __read_url(self, filename):
         '''
@@ -392,125 +673,171 @@ class TelestoClass:
         Input : [filename]
         Ouput : [urls]
         '''
-        url_file = open(os.path.dirname(os.path.abspath(__file__))+'\\'+filename, 'r')
+        url_file = open(os.path.join(os.path.dirname(os.path.abspath(__file__)), filename), 'r')
 
         # read debris url
         url_lines = url_file.readlines()
         urls = []
         for url in url_lines:
-            urls.append(url)
+            if url.strip():
+                urls.append(url.strip())
 
         return urls
 
-    def __load_file(self, url_type, urls):
+    def __target_position(self, offset=0):
         '''
-        Function that loads TLE files from a list of urls, and append it in a general dictionary.
+        Position and rates of the target in offset seconds, interpolated in its ephemeris table
+        (see ephemeris.py), built again for a new target, a new TLE or past the end of the table
 
-        Input : [Params, url_type, urls]
-        Ouput : None
+        Input : [offset (in seconds)]
+        Ouput : [Altitude, Azimuth, RA, Dec (degrees), Alt, Az, RA, Dec rates (arcsec/s), Distance (km), Radial velocity (km/s)]
         '''
-        for url in urls:
-            temp = load.tle_file(url, reload=True)
-            if url_type == "deb":
-                self.satellites.update({debris.model.satnum: debris for debris in temp})
-            elif url_type == "sat":
-                self.satellites.update({sat.model.satnum: sat for sat in temp})
-            
+        target = self.target
+        table = self.target_ephemeris
+        if table is None or table.key != ephemeris_key(target) or not table.covers(table.since_start(offset)):
+            start = self.ts.now()
+            duration = max(self.ephemeris_duration, offset + 60)
+            # Up to the end of the predicted pass of the target, if any
+            if self.passes is not None:
+                now = (start - self.passes.t0) * 86400
+                for row in self.passes.for_satellite(target.model.satnum):
+                    if row["start"] <= now + offset <= row["end"]:
+                        duration = max(duration, row["end"] - now + 60)
+            table = TargetEphemeris(target, self.observatory, start, duration)
+            self.target_ephemeris = table
+        return table(table.since_start(offset))
 
     def __compute_alt_az(self,offset=0):  
         '''
-        Compute the altitude and azimuth of the satellite, from the observatory position :
+        Compute the altitude and azimuth of the satellite, from the observatory position, 
+        with the atmospheric correction
 
         Input : [params, offset(in seconds)]
-        Ouput : [Altitude, Azimuth]
+        Ouput : [Altitude, Azimuth] in degrees
         '''
-        difference = self.target - self.observatory
-
-        # add x seconds to the current time
-        prevision_time = self.ts.now().utc_datetime() + timedelta(seconds=offset) 
-        # Compute the position for the given time, coordinates (x,y,z)
-        topocentric = difference.at(self.ts.utc(prevision_time)) 
-
-        # altitude, azimuth, distance; 'standard' allow atmospheric correction
-        alt, az, _ = topocentric.altaz('standard') 
-
+        alt, az, _, _, _, _, _, _, _, _ = self.__target_position(offset)
         return alt, az
 
-    def __compute_celestial_parameters(self,offset=0,frame='equatorial'):
+    def __compute_celestial_parameters(self,offset=0):
         '''
-        Compute the rate and coordinate of the satellite : 
+        Compute the rate and coordinate of the satellite, true equator and equinox of date : 
 
-        Input : [params, offset, frame]
-        Ouput : [Declination, Right Ascension, Radial distance, ra_rate, dec_rate, Radial velocity]
+        Input : [params, offset]
+        Ouput : [Declination (degrees), Right Ascension (hours), Radial distance (km), ra_rate, dec_rate (arcsec/s), Radial velocity (km/s)]
         '''
-        difference = self.target - self.observatory
-        if offset:
-            prevision_time = self.ts.now().utc_datetime() + timedelta(seconds=offset)
-
-            topocentric = difference.at(self.ts.utc(prevision_time)) # position of the satellite at the next minute, coordinates (x,y,z)
-        else:
-            topocentric = difference.at(self.ts.now()) # position of the satellite at the current time, coordinates (x,y,z)
-
-        # Switch depend on the frame
-        if frame == 'equatorial': 
-            Dec, Ra, rad_dist, ra_rate, dec_rate, rad_vel = topocentric.frame_latlon_and_rates(skyfield.framelib.true_equator_and_equinox_of_date)     
-        elif frame == 'xxxx' : # Not tested, need to find another frame
-            Dec, Ra, rad_dist, ra_rate, dec_rate, _ = topocentric.frame_latlon_and_rates(skyfield.framelib.xxxx)
-            
-        return Dec, Ra, rad_dist, ra_rate, dec_rate, rad_vel 
+        _, _, ra, dec, _, _, ra_rate, dec_rate, distance, range_rate = self.__target_position(offset)
+        return dec, ra/15, distance, ra_rate, dec_rate, range_rate
 
     def __follow_sat_using_rate(self):
         '''
         Follow the satellite using the rate computed from the current position 
-        of the satellite
+        of the satellite. The telescope waits where the target will be after a lead time
+        long enough for the slew, both from the measured latencies (see latency.py)
 
         Input : [params]
         Ouput : None 
         '''
         print('\n')
         start = time.perf_counter()
-        deltaT_ahead = 30 # How many seconds ahead the telescope will be. 
-        alt, az = self.__compute_alt_az(deltaT_ahead)
-        if alt.degrees <= 10:
+        start_unix = time.time()
+        # How many seconds ahead the telescope will be: the slew to where the target is
+        # then depends on the lead time itself, two passes are enough
+        mnt_ra, mnt_dec, _, _ = self.dispatcher.call(TSXPriorityMount, getPosition)
+        deltaT_ahead = self.latency.lead_time(0)
+        for _ in range(2):
+            dec, ra, _, _, _, _ = self.__compute_celestial_parameters(deltaT_ahead - (time.perf_counter() - start))
+            distance = slew_distance(mnt_ra*15, mnt_dec, ra*15, dec)
+            deltaT_ahead = self.latency.lead_time(distance)
+        print('Lead time', deltaT_ahead, 's for a slew of', distance, 'degrees')
+
+        offset = deltaT_ahead - (time.perf_counter() - start)
+        alt, az = self.__compute_alt_az(offset)
+        if alt <= 10:
             print("Target will be too low in sky. Stop following\n")
             return False
-        print('Coordinates : Altitude', alt._degrees, '- Azimuth', az._degrees)
+        print('Coordinates : Altitude', alt, '- Azimuth', az)
 
         #Calculating the rate :
         print('Calculating celestial rate')
-        dec, ra, _, ra_rate, dec_rate, _ = self.__compute_celestial_parameters(deltaT_ahead)
+        dec, ra, _, ra_rate, dec_rate, _ = self.__compute_celestial_parameters(offset)
+        # Rates of the pass by segments, the first one is set when following starts
+        table = self.target_ephemeris
+        aligned = start_unix + deltaT_ahead - table.unix0
+        times, ra_rates, dec_rates = rate_profile(table, aligned, table.duration, self.tracking_cadence)
+        ra_rate, dec_rate = ra_rates[0], dec_rates[0]
         #display the coordinates and rates
-        print('Celestial coordinates : RA ', ra._hours, '- Dec', dec._degrees)
-        print('Celestial rate : RA ', ra_rate.arcseconds.per_second, '- Dec', dec_rate.arcseconds.per_second,'\n')
+        print('Celestial coordinates : RA ', ra, '- Dec', dec)
+        print('Celestial rate : RA ', ra_rate, '- Dec', dec_rate,'\n')
         print('time elapsed = ', time.perf_counter() - start,'\n')
 
         print('Aligning the telescope')
         #slew
-        slewToCoords((str(ra._hours), str(dec._degrees)), self.target.name)
+        slew_start = time.perf_counter()
+        with TSXTimeoutScope(self.follow_timeout):
+            self.dispatcher.call(TSXPriorityMount, slewToCoords, (str(ra), str(dec)), self.target.name)
+        self.latency.slew.update(slew_distance(mnt_ra*15, mnt_dec, ra*15, dec), time.perf_counter() - slew_start)
         print('Telesto is in the target path\n')
         print('time elapsed = ', time.perf_counter() - start,'\n')
 
         print('##################################')
-        disp = 0
-        time_send_cmd = 3 # Time needed to send the command to the telescope, [s]
-        while time.perf_counter() - start < deltaT_ahead-time_send_cmd:
-            time.sleep(0.01)
-            if disp%200 == 0:
-                print('Waiting the target to be in the field of view',time.perf_counter() - start,'s')
-            disp += 1
+        # Sent too early, the rates take the mount away from the point before the target arrives:
+        # their round trips are measured first, while the mount waits there (one second left for that)
+        while ((self.latency.tracking.count < MIN_SAMPLES or self.latency.update.count < MIN_SAMPLES) and
+               time.perf_counter() < start + deltaT_ahead - 1):
+            time_rate_commands(self.dispatcher, self.latency)
+        # The rates are sent so that they reach the mount when the target arrives
+        send_at = start + deltaT_ahead - self.latency.tracking.expected()
+        if time.perf_counter() > send_at:
+            print('Slew longer than the lead time, following starts late by', time.perf_counter() - send_at, 's')
+        while time.perf_counter() < send_at:
+            print('Waiting the target to be in the field of view',time.perf_counter() - start,'s')
+            sleep_until(min(send_at, time.perf_counter() + 2))
         print('##################################\n')
         print('time elapsed = ', time.perf_counter() - start,'\n')
 
         print('Start following')
         self.is_following=True
         #Set the rate 
-        setTrackingRate((str(ra_rate.arcseconds.per_second),str(dec_rate.arcseconds.per_second)))
+        with TSXTimeoutScope(self.follow_timeout):
+            _, duration = self.dispatcher.call(TSXPriorityMount, timed, setTrackingRate, (str(dec_rate),str(ra_rate)))  # (dDec, dRa)
+        self.latency.tracking.update(duration)
+
+        # Then the next segments, each one sent ahead by the latency of an update
+        scheduler = RateScheduler(table, times[1:], ra_rates[1:], dec_rates[1:], self.__update_rate,
+                                  self.latency.update)
+        with self.rate_scheduler_lock:
+            self.rate_scheduler = scheduler
+        scheduler.start()
+        self.__save_latency()
         return True
 
+    def __update_rate(self, ra_rate, dec_rate):
+        '''
+        Send new tracking rates to the mount already following (see tracking.RateScheduler)
+
+        Input : [ra_rate, dec_rate (arcsec/s)]
+        Ouput : round trip of the command [s], without its wait in the dispatcher queue
+        '''
+        with TSXTimeoutScope(self.follow_timeout):
+            _, duration = self.dispatcher.call(TSXPriorityMount, timed, updateTrackingRate, (str(dec_rate),str(ra_rate)))  # (dDec, dRa)
+        return duration
+
+    def __save_latency(self):
+        '''
+        Keep the latency statistics for the next sessions
+
+        Input : None
+        Ouput : None
+        '''
+        try:
+            self.latency.save(self.latency_file)
+        except OSError as error:
+            print('Latency statistics not saved:', error)
+
     def __control_error_thread(self):
         '''
-        Compute the error of the telescope each 30 second, if the error is too big, 
-        the telescope will raise a flag.
+        Compute the error of the telescope each error_check_interval seconds, if the error is too big, 
+        the telescope will raise a flag. The target is taken where it was when the mount position was read.
 
         Input : [params]
         Ouput : None
@@ -520,45 +847,85 @@ class TelestoClass:
         print('Start controlling error')
         while not self.error_thread_stop_event.is_set():
             # Waiting loop, need to close the thread if the stop_event is set
-            wait_time = 30 # [s]
+            wait_time = self.error_check_interval # [s]
             for i in range(wait_time):
                 if self.error_thread_stop_event.is_set():
                     return
                 time.sleep(1)
 
-            alt, _ = self.__compute_alt_az(30)
-            if alt.degrees <= 10:
+            alt, _ = self.__compute_alt_az(self.error_check_interval)
+            if alt <= 10:
                 print("Target will be too low in sky. Stop following\n")
                 self.is_following = False
                 self.tracking_msg = 'Target will be too low in sky. Stop following'
-                setTrackingRate(switch=False) # stop tracking
+                self.__stop_tracking()
                 # Stop picture thread
                 self.picture_thread_stop_event.set()
                 self.status = "Ready"
                 return
             
             # Compute the mean square error
-            dec, ra, _, _, _, _ = self.__compute_celestial_parameters()
             try:
-                mnt_ra, mnt_dec, _, _ = getPosition()
-            except:
-                print('Error while getting the position')
+                # A short deadline: a hung TheSkyX must not freeze the error check
+                with TSXTimeoutScope(5):
+                    (mnt_ra, mnt_dec, _, _), reading = self.dispatcher.call(TSXPriorityMount, self.__timed_position)
+            except (TSXError, ValueError) as error:
+                # TheSkyX not answering (e.g. restarting) or error reply: try again at the next check
+                print('Error while getting the position:', error)
                 continue
-            error_ra = abs(ra._hours - mnt_ra)/24
-            error_dec = abs(dec._degrees - mnt_dec)/360
+            # A LEO moves 0.04 degrees in 0.1 s: the target at the time of the reading, not of the check
+            dec, ra, _, _, _, _ = self.__compute_celestial_parameters(reading - time.time())
+            error_ra = abs((ra - mnt_ra + 12) % 24 - 12)/24
+            error_dec = abs(dec - mnt_dec)/360
             error = (error_ra**2 + error_dec**2)**0.5
             print('Error : ', error)
+            self.tracking_errors.append(error)
             if error > threshold:
                 print('Error too big, stop following')
                 self.is_following = False
                 self.tracking_msg = 'Error too big, stop following'
                 self.picture_thread_stop_event.set()
-                setTrackingRate(switch=False) # stop tracking
+                self.__stop_tracking()
                 self.status = "Ready"
                 return
         self.status = "Ready"
         return
     
+    def __timed_position(self):
+        '''
+        Position of the mount (see getPosition) and when it was read, in the middle of the round trip
+
+        Input : None
+        Ouput : ([RA, Dec, Az, Alt], time (time.time()))
+        '''
+        start = time.time()
+        position = getPosition()
+        return position, (start + time.time()) / 2
+
+    def __stop_tracking(self):
+        '''
+        Stop the tracking of the mount, reporting TheSkyX errors instead of raising them
+
+        Input : None
+        Ouput : True if the mount was told to stop
+        '''
+        # No rate update may reach the mount after the stop. Stopping from another thread
+        # at the same time waits under the lock for the scheduler to be stopped.
+        with self.rate_scheduler_lock:
+            scheduler, self.rate_scheduler = self.rate_scheduler, None
+            if scheduler is not None:
+                scheduler.stop()
+        if scheduler is not None:
+            # With the round trips of the updates of this pass
+            self.__save_latency()
+        try:
+            self.dispatcher.call(TSXPriorityAbort, setTrackingRate, switch=False) # stop tracking
+            return True
+        except TSXError as error:
+            print('Error while stopping the tracking:', error)
+            self.tracking_msg = 'Unable to stop the tracking: '+str(error)
+            return False
+
     def __take_picture_thread(self):
         '''
         Take a picture of the satellite each X second
@@ -615,18 +982,38 @@ class TelestoClass:
 
     def __take_image(self):
         '''
-        Take a picture with the camera
+        Take a picture with the camera. The exposure runs asynchronously, so that mount
+        commands keep going through the dispatcher while waiting for it.
 
         Input : [params]
         Ouput : None
         '''
-        camMesg = TSXSend("ccdsoftCamera.TakeImage()")
+        try:
+            camMesg = self.dispatcher.call(TSXPriorityCamera, TSXSendBatch, ["ccdsoftCamera.Asynchronous = true",
+                                                                            "ccdsoftCamera.TakeImage()"])[-1]
+
+            if camMesg == "0":
+                # Wait in short jobs, each one hands back to the dispatcher: a rate update comes
+                # in between within exposure_poll seconds
+                while True:
+                    try:
+                        self.dispatcher.call(TSXPriorityCamera, TSXWaitUntil, "ccdsoftCamera.IsExposureComplete != 0",
+                                             self.exposure_poll)
+                        break
+                    except TSXTimeoutError:
+                        continue
+
+                _, _, cameraImagePath = self.dispatcher.call(TSXPriorityCamera, TSXSendBatch, [
+                    "ccdsoftCamera.Asynchronous = false",
+                    "ccdsoftCameraImage.AttachToActiveImager()",
+                    "ccdsoftCameraImage.Path"])
+                cameraImagePath = cameraImagePath.split("/")[-1]
+        except TSXError as error:
+            print("Error: " + str(error))
+            return False
 
         if camMesg == "0":
 
-            TSXSend("ccdsoftCameraImage.AttachToActiveImager()")
-            cameraImagePath = TSXSend("ccdsoftCameraImage.Path").split("/")[-1]
-
             if cameraImagePath == "":
                 cameraImagePath = "Image not saved"
 
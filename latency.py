@@ -0,0 +1,264 @@
+'''
+Measured latencies of the mount commands
+
+Following a target starts with a slew to where it will be after a lead time,
+then the tracking rates are sent so that they reach the mount when the target
+arrives. Both delays used to be guessed (30 s ahead, rates sent 3 s early). They
+are now measured on every command and kept as running statistics:
+  - a slew takes a fixed time plus a time per degree of its longest axis move
+    (both axes move at once), fitted on the slews done,
+  - setTrackingRate and updateTrackingRate take a round trip each.
+The lead time is the predicted slew plus a margin of a few standard deviations;
+the rates are sent one mean round trip before they are needed. A rate sent early
+leaves the target at the speed of the target, so the round trips are measured
+before the first rates are sent (time_rate_commands, with zero rates the mount
+keeps waiting at the sidereal rate). The statistics are saved in latency.json
+for the next sessions; calibrate() measures them on purpose, against the mount
+or PySkyX_sim.
+
+    latency = MountLatency.load()
+    lead = latency.lead_time(distance)
+'''
+import json
+import math
+import os
+import time
+
+from PySkyX_ks import TSXPriorityMount, getPosition, setTrackingRate, slewToCoordsAzAlt, updateTrackingRate
+
+LATENCY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "latency.json")
+MIN_SAMPLES = 3  # Below, the defaults are used
+SIGMAS = 3.0  # Margin in standard deviations
+DEFAULT_LEAD = 30.0  # Lead time before any slew was measured, [s]
+DEFAULT_TRACKING = 0.05  # setTrackingRate round trip (one batch) before any was measured, [s]
+DEFAULT_UPDATE = 0.05  # updateTrackingRate round trip before any was measured, [s]
+COMPUTE_TIME = 0.5  # Computing the target and reading the mount before the slew, [s]
+MIN_LEAD = 5.0  # [s]
+CALIBRATION_SLEWS = (2.0, 10.0, 30.0, 60.0)  # [deg], each one there and back
+CALIBRATION_ALTITUDE = 45.0  # [deg]
+
+
+def sleep_until(deadline, clock=time.perf_counter, spin=0.002):
+    '''
+    Sleep until clock() reaches deadline: the OS sleep gets close, the last
+    milliseconds are spent yielding so that the wake up is not late by a scheduler tick.
+    '''
+    while True:
+        remaining = deadline - clock()
+        if remaining <= 0:
+            return
+        time.sleep(remaining - spin if remaining > spin else 0)
+
+
+class LatencyStats:
+    '''
+    Running mean and standard deviation of a latency (Welford)
+    '''
+    def __init__(self, default, count=0, mean=0.0, m2=0.0):
+        self.default = default
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def update(self, seconds):
+        self.count += 1
+        delta = seconds - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (seconds - self.mean)
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def expected(self):
+        '''
+        Ouput : mean latency [s], the default until one was measured
+        '''
+        return self.mean if self.count else self.default
+
+    def upper(self):
+        '''
+        Ouput : latency not exceeded but rarely [s], at least the default until enough samples
+        '''
+        if self.count < MIN_SAMPLES:
+            return max(self.default, self.expected())
+        return self.mean + SIGMAS * self.std
+
+    def state(self):
+        return {"count": self.count, "mean": self.mean, "m2": self.m2}
+
+
+class SlewStats:
+    '''
+    Slew time as a fixed time plus a time per degree, running least squares on (distance, duration)
+    '''
+    def __init__(self, count=0, sum_d=0.0, sum_t=0.0, sum_dd=0.0, sum_dt=0.0, sum_tt=0.0):
+        self.count = count
+        self.sum_d = sum_d
+        self.sum_t = sum_t
+        self.sum_dd = sum_dd
+        self.sum_dt = sum_dt
+        self.sum_tt = sum_tt
+
+    def update(self, distance, seconds):
+        self.count += 1
+        self.sum_d += distance
+        self.sum_t += seconds
+        self.sum_dd += distance * distance
+        self.sum_dt += distance * seconds
+        self.sum_tt += seconds * seconds
+
+    def fit(self):
+        '''
+        Ouput : (fixed time [s], time per degree [s/deg], residual standard deviation [s])
+        '''
+        n = self.count
+        spread = n * self.sum_dd - self.sum_d ** 2
+        if spread <= 1e-9 * max(n * self.sum_dd, 1.0):
+            # All the slews had the same length: no slope
+            slope = 0.0
+        else:
+            slope = (n * self.sum_dt - self.sum_d * self.sum_t) / spread
+        intercept = (self.sum_t - slope * self.sum_d) / n
+        residuals = (self.sum_tt - 2 * intercept * self.sum_t - 2 * slope * self.sum_dt + n * intercept ** 2 +
+                     2 * intercept * slope * self.sum_d + slope ** 2 * self.sum_dd)
+        std = math.sqrt(max(residuals, 0.0) / (n - 2)) if n > 2 else 0.0
+        return intercept, slope, std
+
+    def upper(self, distance):
+        '''
+        Input : [distance [deg]]
+        Ouput : slew time not exceeded but rarely [s], None until enough samples
+        '''
+        if self.count < MIN_SAMPLES:
+            return None
+        intercept, slope, std = self.fit()
+        return intercept + slope * distance + SIGMAS * std
+
+    def state(self):
+        return {"count": self.count, "sum_d": self.sum_d, "sum_t": self.sum_t, "sum_dd": self.sum_dd,
+                "sum_dt": self.sum_dt, "sum_tt": self.sum_tt}
+
+
+class MountLatency:
+    '''
+    Latencies of the mount: slews, setTrackingRate and updateTrackingRate
+    '''
+    def __init__(self, slew=None, tracking=None, update=None):
+        self.slew = slew or SlewStats()
+        self.tracking = tracking or LatencyStats(DEFAULT_TRACKING)
+        self.update = update or LatencyStats(DEFAULT_UPDATE)
+
+    @classmethod
+    def load(cls, path=LATENCY_FILE):
+        '''
+        Statistics of the previous sessions, empty ones if there are none (or unreadable)
+        '''
+        try:
+            with open(path) as file:
+                state = json.load(file)
+            return cls(SlewStats(**state["slew"]), LatencyStats(DEFAULT_TRACKING, **state["tracking"]),
+                       LatencyStats(DEFAULT_UPDATE, **state["update"]))
+        except (OSError, ValueError, KeyError, TypeError):
+            return cls()
+
+    def save(self, path=LATENCY_FILE):
+        state = {"slew": self.slew.state(), "tracking": self.tracking.state(), "update": self.update.state()}
+        temporary = path + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump(state, file, indent=1)
+        os.replace(temporary, path)
+
+    def lead_time(self, distance):
+        '''
+        How far ahead of the target to slew: the mount has to get there and the
+        rates have to be sent before it arrives
+
+        Input : [slew distance [deg]]
+        Ouput : lead time [s]
+        '''
+        slew = self.slew.upper(distance)
+        if slew is None:
+            return DEFAULT_LEAD
+        return max(COMPUTE_TIME + slew + self.tracking.upper(), MIN_LEAD)
+
+    def report(self):
+        lines = []
+        if self.slew.count >= MIN_SAMPLES:
+            intercept, slope, std = self.slew.fit()
+            lines.append("slew: %.2f s + %.3f s/deg (+- %.2f s, %d slews)" % (intercept, slope, std, self.slew.count))
+        else:
+            lines.append("slew: not calibrated, lead time %g s" % DEFAULT_LEAD)
+        for name, stats in (("setTrackingRate", self.tracking), ("updateTrackingRate", self.update)):
+            if stats.count:
+                lines.append("%s: %.1f ms (+- %.1f ms, %d calls)" % (name, stats.mean * 1e3, stats.std * 1e3,
+                                                                      stats.count))
+            else:
+                lines.append("%s: not measured, %g ms assumed" % (name, stats.default * 1e3))
+        return "\n".join(lines)
+
+
+def slew_distance(ra1, dec1, ra2, dec2):
+    '''
+    Length of a slew for an equatorial mount: its longest axis move, not the angle on the
+    sky (a slew near the pole is a long move in RA for a short angle)
+
+    Input : [from RA, Dec, to RA, Dec [deg]]
+    Ouput : distance [deg]
+    '''
+    return max(abs((ra2 - ra1 + 180.0) % 360.0 - 180.0), abs(dec2 - dec1))
+
+
+def timed(function, *args):
+    '''
+    Run function and time it. Submitted as the dispatcher job itself, the time spent in the
+    queue behind other jobs is left out: only the round trips to the mount are measured.
+
+    Input : [function, arguments]
+    Ouput : (result, duration [s])
+    '''
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def time_rate_commands(dispatcher, latency):
+    '''
+    Measure one setTrackingRate and one updateTrackingRate round trip, with zero rates:
+    the mount tracks at the sidereal rate, it stays where it is pointing
+
+    Input : [TSXDispatcher, MountLatency updated in place]
+    Ouput : None
+    '''
+    _, duration = dispatcher.call(TSXPriorityMount, timed, setTrackingRate, ('0', '0'))
+    latency.tracking.update(duration)
+    _, duration = dispatcher.call(TSXPriorityMount, timed, updateTrackingRate, ('0', '0'))
+    latency.update.update(duration)
+
+
+def calibrate(dispatcher, latency, slews=CALIBRATION_SLEWS, rates=10):
+    '''
+    Measure the latencies by moving the mount: slews of each length there and back in
+    azimuth at CALIBRATION_ALTITUDE, then rates commands. The slew distances are taken
+    from the RA/Dec read back. The mount is left tracking at sidereal rate.
+
+    Input : [TSXDispatcher, MountLatency updated in place, slew lengths [deg], number of rates commands]
+    Ouput : None
+    '''
+    _, _, az, alt = dispatcher.call(TSXPriorityMount, getPosition)
+    base = (az, CALIBRATION_ALTITUDE)
+    dispatcher.call(TSXPriorityMount, slewToCoordsAzAlt, (str(base[0]), str(base[1])), "Calibration")
+
+    ra, dec, _, _ = dispatcher.call(TSXPriorityMount, getPosition)
+    for length in slews:
+        for target in ((base[0] + length) % 360.0, base[0]):
+            start = time.perf_counter()
+            dispatcher.call(TSXPriorityMount, slewToCoordsAzAlt, (str(target), str(base[1])), "Calibration")
+            duration = time.perf_counter() - start
+            new_ra, new_dec, _, _ = dispatcher.call(TSXPriorityMount, getPosition)
+            latency.slew.update(slew_distance(ra * 15, dec, new_ra * 15, new_dec), duration)
+            ra, dec = new_ra, new_dec
+
+    for _ in range(rates):
+        time_rate_commands(dispatcher, latency)
+    dispatcher.call(TSXPriorityMount, setTrackingRate, switch=False)
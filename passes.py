@@ -0,0 +1,372 @@
+'''
+Pass prediction for the whole catalog
+
+Every object is first propagated on a coarse time grid (see propagation.py); the
+grid samples above the altitude limit give, for each pass, a bracket around its
+rise and its set and the sample closest to its culmination. Those are then
+refined on the object alone: regula falsi (Illinois) for rise and set, successive
+parabolas for the culmination. Passes shorter than the grid step above the limit
+can be missed.
+
+Each pass also gets the part of it where the object can be imaged, in sunlight
+while the Sun is low enough at the observatory (see visibility.py), sampled on
+the same grid and refined the same way.
+
+The catalog is split in shards of objects predicted in a process pool.
+
+    passes = predict_passes(telesto.satellites, telesto.observatory, ts.now(), hours=12)
+    print(passes.visible().sort("max_altitude", reverse=True).format(20))
+'''
+import concurrent.futures
+import itertools
+import os
+from datetime import timedelta
+
+import numpy as np
+from skyfield.api import load, wgs84
+from skyfield.constants import DAY_S
+from skyfield.sgp4lib import theta_GMST1982
+
+from catalog import LazySatellites
+from propagation import CatalogPropagator
+from visibility import DARK_SUN_ALTITUDE, SunTrack, umbra_margin
+
+SCAN_STEP = 30.0  # Coarse grid step, [s]
+MIN_ALTITUDE = 10.0  # Same limit as TelestoClass, [deg]
+REFINE_ITERATIONS = 5  # Refinement iterations, rise, set and culmination end up within 0.1 s
+SHARDS_PER_WORKER = 4  # Smaller shards even the load between the workers
+
+# Times are seconds after the start of the prediction. rise and set are NaN when the
+# pass started before or ends after the prediction window, start and end never are.
+# visible_start and visible_end bound the visible part of the pass, NaN if there is none.
+PASS_DTYPE = np.dtype([("satnum", "<i8"),
+                       ("rise", "<f8"), ("culmination", "<f8"), ("set", "<f8"),
+                       ("start", "<f8"), ("end", "<f8"),
+                       ("max_altitude", "<f8"),
+                       ("rise_azimuth", "<f8"), ("culmination_azimuth", "<f8"), ("set_azimuth", "<f8"),
+                       ("visible_start", "<f8"), ("visible_end", "<f8")])
+
+
+class _Clock:
+    '''
+    Times of the prediction as seconds after its start, converted to what sgp4 and
+    GMST need. Over a night GMST is linear in time to far better than an arcsecond.
+    '''
+    def __init__(self, t):
+        self.jd = float(t.whole[0])
+        self.fraction = float(t.tai_fraction[0] - t._leap_seconds()[0] / DAY_S)
+        theta, theta_dot = theta_GMST1982(self.jd, float(t.ut1_fraction[0]))
+        self.theta = float(theta)
+        self.theta_rate = float(theta_dot) / DAY_S
+
+    def __call__(self, seconds):
+        seconds = np.asarray(seconds, dtype=float)
+        return np.full(seconds.shape, self.jd), self.fraction + seconds / DAY_S, self.theta + self.theta_rate * seconds
+
+
+def _altaz(propagator, satrec, clock, seconds):
+    '''
+    Altitude and azimuth of one object at the given times
+    '''
+    jd, fraction, theta = clock(seconds)
+    error, r, _ = satrec.sgp4_array(jd, fraction)
+    altitude, azimuth, _ = propagator.horizon(r, theta)
+    altitude[error != 0] = np.nan
+    return altitude, azimuth
+
+
+def _illinois(a, b, fa, fb, c, fc):
+    # Regula falsi step, Illinois: halve the value of the end that stays, so that it moves too
+    flip = fc * fb < 0
+    return np.where(flip, b, a), c, np.where(flip, fb, fa / 2), fc
+
+
+def _crossings(function, a, b, fa, fb):
+    '''
+    Zeros of function, one per bracket [a, b], fa and fb being of opposite signs
+    '''
+    for _ in range(REFINE_ITERATIONS):
+        c = b - fb * (b - a) / (fb - fa)
+        a, b, fa, fb = _illinois(a, b, fa, fb, c, function(c))
+    return b
+
+
+def _refine(propagator, satrec, clock, min_altitude, step, a, b, fa, fb, center, low, high):
+    '''
+    Refine together, one sgp4 call per iteration:
+      - the times where the altitude crosses the limit, one per bracket [a, b], f being
+        the altitude minus the limit at both ends (of opposite signs), by regula falsi;
+      - the times of the highest altitude, starting from the coarse samples center and
+        staying within [low, high], by successive parabolas.
+
+    Ouput : (crossing times, culmination times)
+    '''
+    half_width = np.full(center.shape, step)
+    crossings = len(a)
+    for _ in range(REFINE_ITERATIONS):
+        c = b - fb * (b - a) / (fb - fa)
+        s0 = np.clip(center - half_width, low, high)
+        s2 = np.clip(center + half_width, low, high)
+        s1 = (s0 + s2) / 2
+        altitude = _altaz(propagator, satrec, clock, np.concatenate([c, s0, s1, s2]))[0]
+
+        a, b, fa, fb = _illinois(a, b, fa, fb, c, altitude[:crossings] - min_altitude)
+
+        f0, f1, f2 = altitude[crossings:].reshape(3, -1)
+        # Vertex of the parabola through the three points, spaced by h. At the edge of
+        # the window the altitude can be monotonic, the highest point is then kept.
+        h = (s2 - s0) / 2
+        curvature = f0 - 2 * f1 + f2
+        best = np.choose(np.argmax(np.nan_to_num(np.stack([f0, f1, f2]), nan=-90.0), axis=0), [s0, s1, s2])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            vertex = s1 + h * (f0 - f2) / (2 * curvature)
+        center = np.clip(np.where((curvature < 0) & ~np.isnan(vertex), vertex, best), low, high)
+        half_width = half_width / 4
+    return b, center
+
+
+def _visibility_margin(satrec, clock, sun, seconds, dark, times):
+    '''
+    How far one object is from being visible, positive when it is: the smallest of its
+    distance to the umbra and of the Sun depression below the dark sky limit, [deg].
+    dark is the latter on the grid seconds, the same for every object.
+    '''
+    jd, fraction, _ = clock(times)
+    error, r, _ = satrec.sgp4_array(jd, fraction)
+    margin = np.minimum(umbra_margin(r, sun(times)), np.interp(times, seconds, dark))
+    margin[error != 0] = np.nan
+    return margin
+
+
+def _visible_intervals(satrec, clock, sun, seconds, dark, rows, starts, ends):
+    '''
+    First and last visible instants of the passes of one object, from the grid samples
+    of each pass and its exact start and end.
+    '''
+    def margin(times):
+        return _visibility_margin(satrec, clock, sun, seconds, dark, times)
+
+    # The Sun altitude is interpolated, a pass without a dark sample around it is in daylight
+    night = [index for index, (start, end) in enumerate(zip(starts, ends))
+             if dark[max(start - 1, 0):end + 2].max() > 0]
+    if not night:
+        return
+    segments = [np.concatenate([[rows["start"][index]], seconds[starts[index]:ends[index] + 1], [rows["end"][index]]])
+                for index in night]
+    samples = np.concatenate(segments)
+    values = margin(samples)
+    visible = values > 0
+
+    # Sample indexes around the boundaries to refine, and the passes they belong to
+    lows, highs, passes, is_start = [], [], [], []
+    offset = 0
+    for index, segment in zip(night, segments):
+        inside = visible[offset:offset + len(segment)]
+        if inside.any():
+            first = offset + np.argmax(inside)
+            last = offset + len(segment) - 1 - np.argmax(inside[::-1])
+            rows["visible_start"][index] = samples[first]
+            rows["visible_end"][index] = samples[last]
+            if first > offset:
+                lows.append(first - 1), highs.append(first), passes.append(index), is_start.append(True)
+            if last < offset + len(segment) - 1:
+                lows.append(last), highs.append(last + 1), passes.append(index), is_start.append(False)
+        offset += len(segment)
+    if not lows:
+        return
+
+    lows = np.array(lows)
+    highs = np.array(highs)
+    boundaries = _crossings(margin, samples[lows], samples[highs], values[lows], values[highs])
+    passes = np.array(passes)
+    is_start = np.array(is_start)
+    rows["visible_start"][passes[is_start]] = boundaries[is_start]
+    rows["visible_end"][passes[~is_start]] = boundaries[~is_start]
+
+
+def _object_passes(propagator, satrec, satnum, clock, seconds, altitude, min_altitude, step, sun, dark):
+    '''
+    Refined passes of one object from its coarse altitudes
+    '''
+    above = altitude > min_altitude
+    edges = np.diff(above.astype(np.int8))
+    rises = np.flatnonzero(edges == 1)  # crossing between samples i and i + 1
+    sets = np.flatnonzero(edges == -1)
+    starts = rises + 1
+    ends = sets
+    if above[0]:
+        starts = np.concatenate([[0], starts])
+    if above[-1]:
+        ends = np.concatenate([ends, [len(seconds) - 1]])
+
+    f = altitude - min_altitude
+    brackets = np.concatenate([rises, sets])
+    peaks = np.array([start + np.argmax(altitude[start:end + 1]) for start, end in zip(starts, ends)], dtype=int)
+    crossings, culminations = _refine(propagator, satrec, clock, min_altitude, step,
+                                      seconds[brackets], seconds[brackets + 1], f[brackets], f[brackets + 1],
+                                      seconds[peaks], seconds[np.maximum(peaks - 1, 0)],
+                                      seconds[np.minimum(peaks + 1, len(seconds) - 1)])
+    rise_times = dict(zip(rises + 1, crossings[:len(rises)]))
+    set_times = dict(zip(sets, crossings[len(rises):]))
+
+    rows = np.zeros(len(starts), PASS_DTYPE)
+    rows["satnum"] = satnum
+    rows["rise"] = [rise_times.get(start, np.nan) for start in starts]
+    rows["set"] = [set_times.get(end, np.nan) for end in ends]
+    rows["culmination"] = culminations
+    rows["start"] = np.where(np.isnan(rows["rise"]), seconds[0], rows["rise"])
+    rows["end"] = np.where(np.isnan(rows["set"]), seconds[-1], rows["set"])
+
+    times = np.concatenate([rows["start"], rows["culmination"], rows["end"]])
+    altitudes, azimuths = _altaz(propagator, satrec, clock, times)
+    altitudes = altitudes.reshape(3, -1)
+    azimuths = azimuths.reshape(3, -1)
+    rows["max_altitude"] = altitudes[1]
+    rows["rise_azimuth"] = np.where(np.isnan(rows["rise"]), np.nan, azimuths[0])
+    rows["culmination_azimuth"] = azimuths[1]
+    rows["set_azimuth"] = np.where(np.isnan(rows["set"]), np.nan, azimuths[2])
+
+    rows["visible_start"] = np.nan
+    rows["visible_end"] = np.nan
+    _visible_intervals(satrec, clock, sun, seconds, dark, rows, starts, ends)
+    return rows
+
+
+def _predict_shard(records, location, t0_tt, duration, step, min_altitude, sun, sun_altitude):
+    '''
+    Passes of a shard of objects, run in a worker process
+
+    Input : [[(satnum, name, line1, line2)], (latitude, longitude, elevation_m), (TT whole, TT fraction)
+             of the start, duration [s], grid step [s], min_altitude [deg], SunTrack, sun_altitude [deg]]
+    Ouput : structured array of PASS_DTYPE
+    '''
+    ts = load.timescale()
+    observatory = wgs84.latlon(location[0], location[1], elevation_m=location[2])
+    satellites = LazySatellites({satnum: (name, line1, line2) for satnum, name, line1, line2 in records}, ts)
+    propagator = CatalogPropagator(satellites, observatory)
+
+    seconds = np.append(np.arange(0.0, duration, step), float(duration))
+    t = ts.tt_jd(t0_tt[0], t0_tt[1] + seconds / DAY_S)
+    clock = _Clock(t)
+    # Sun depression below sun_altitude on the grid, [deg]
+    dark = sun_altitude - propagator.horizon(sun(seconds), clock(seconds)[2])[0]
+
+    passes = [np.zeros(0, PASS_DTYPE)]
+    first = 0
+    for satnums, altitude, _, _ in propagator.altaz_chunks(t):
+        for row in np.flatnonzero(np.nan_to_num(altitude, nan=-90.0).max(axis=1) > min_altitude):
+            passes.append(_object_passes(propagator, propagator.satrecs[first + row], int(satnums[row]),
+                                         clock, seconds, altitude[row], min_altitude, step, sun, dark))
+        first += len(satnums)
+    return np.concatenate(passes)
+
+
+class PassTable:
+    '''
+    Predicted passes, one row per pass (see PASS_DTYPE), times in seconds after t0.
+
+    sort, select and for_satellite return new tables; rows gives the structured array.
+    '''
+    def __init__(self, rows, t0, names=None):
+        self.rows = rows
+        self.t0 = t0
+        self.names = names or {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def sort(self, by="start", reverse=False):
+        '''
+        Input : [column, reverse]
+        Ouput : PassTable sorted on the column, NaN last
+        '''
+        key = self.rows[by]
+        order = np.argsort(-key if reverse else key, kind="stable")
+        return PassTable(self.rows[order], self.t0, self.names)
+
+    def select(self, mask):
+        return PassTable(self.rows[mask], self.t0, self.names)
+
+    def visible(self):
+        '''
+        Ouput : PassTable of the passes with a visible part
+        '''
+        return self.select(~np.isnan(self.rows["visible_start"]))
+
+    def for_satellite(self, satnum):
+        return self.select(self.rows["satnum"] == satnum).sort("start")
+
+    def time(self, seconds):
+        '''
+        Input : [seconds after t0]
+        Ouput : skyfield Time
+        '''
+        return self.t0 + np.asarray(seconds) / DAY_S
+
+    def datetime(self, seconds):
+        '''
+        Input : [seconds after t0]
+        Ouput : UTC datetime, None for NaN
+        '''
+        if np.isnan(seconds):
+            return None
+        return self.t0.utc_datetime() + timedelta(seconds=float(seconds))
+
+    def format(self, limit=None):
+        '''
+        Input : [number of rows]
+        Ouput : the table as text, times in UTC
+        '''
+        def clock(seconds, azimuth):
+            if np.isnan(seconds):
+                return "%-13s" % "-"
+            return self.datetime(seconds).strftime("%H:%M:%S") + " %3.0f" % azimuth
+
+        def interval(start, end):
+            if np.isnan(start):
+                return "-"
+            return self.datetime(start).strftime("%H:%M:%S") + "-" + self.datetime(end).strftime("%H:%M:%S")
+
+        lines = ["%7s  %-24s  %-13s  %-18s  %-13s  %s" % ("NORAD", "Name", "Rise     Az", "Culmination Alt Az",
+                                                          "Set      Az", "Visible")]
+        for row in self.rows[:limit]:
+            lines.append("%7d  %-24s  %s  %s %3.0f  %s  %s" % (
+                row["satnum"], self.names.get(int(row["satnum"]), "")[:24],
+                clock(row["rise"], row["rise_azimuth"]),
+                clock(row["culmination"], row["culmination_azimuth"])[:8] + "   ", row["max_altitude"],
+                clock(row["set"], row["set_azimuth"]), interval(row["visible_start"], row["visible_end"])))
+        return "\n".join(lines)
+
+
+def predict_passes(satellites, observatory, t0, hours=12, min_altitude=MIN_ALTITUDE, step=SCAN_STEP,
+                   workers=None, satnums=None, ephemeris=None, sun_altitude=DARK_SUN_ALTITUDE):
+    '''
+    Passes above min_altitude of the objects of a catalog, with their visible part
+
+    Input : [LazySatellites or CompiledCatalog, observatory (wgs84.latlon), start (skyfield Time), hours,
+             min_altitude [deg], coarse step [s], worker processes (default: one per core, 1 runs in
+             this process), satnums (default: all), JPL ephemeris (default: analytic Sun, see
+             visibility.load_ephemeris), highest Sun altitude for a dark sky [deg]]
+    Ouput : PassTable sorted by start
+    '''
+    satnums = sorted(satellites) if satnums is None else list(satnums)
+    records = [(satnum,) + tuple(satellites.record(satnum)) for satnum in satnums]
+    names = {satnum: name for satnum, name, _, _ in records}
+    location = (observatory.latitude.degrees, observatory.longitude.degrees, observatory.elevation.m)
+    sun = SunTrack(t0, hours * 3600.0, ephemeris)
+    arguments = (location, (t0.whole, t0.tt_fraction), hours * 3600.0, step, min_altitude, sun, sun_altitude)
+
+    workers = workers or os.cpu_count() or 1
+    shard_count = min(len(records), workers * SHARDS_PER_WORKER) if workers > 1 else 1
+    # Interleaved, consecutive NORAD IDs are often similar orbits
+    shards = [records[shard::shard_count] for shard in range(max(shard_count, 1))]
+    if workers == 1:
+        results = [_predict_shard(shard, *arguments) for shard in shards]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_predict_shard, shards, *[itertools.repeat(argument) for argument in arguments]))
+
+    return PassTable(np.concatenate(results), t0, names).sort("start")
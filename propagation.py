@@ -0,0 +1,139 @@
+'''
+Propagation of the whole catalog at once
+
+sgp4's SatrecArray propagates every object over a grid of times in one call. The
+TEME positions are rotated to the Earth-fixed frame (GMST 1982, polar motion
+neglected, as skyfield does by default) and then to the horizon of the observer.
+Objects are propagated by chunks, so that a long time grid over the whole catalog
+never needs more than chunk_samples positions in memory at once.
+
+sgp4 does not flag every element set it should: decayed objects and elements far
+from their epoch can still propagate without error, to nonsense positions (under
+the ground, or 1e12 km away). Those positions are dropped like sgp4 errors.
+
+    propagator = CatalogPropagator(telesto.satellites, telesto.observatory)
+    satnums, alt, az, distance = propagator.above(ts.now(), 10)
+'''
+import numpy as np
+from sgp4.api import Satrec, SatrecArray
+from skyfield.constants import DAY_S
+from skyfield.sgp4lib import theta_GMST1982
+
+CHUNK_SAMPLES = 1000000  # objects x epochs propagated at once, 24 MB per array of positions
+EARTH_RADIUS_KM = 6378.137
+MAX_DISTANCE_KM = 500000.0  # Farther from the Earth than any Earth orbit, [km]
+MAX_AGE_REVOLUTIONS = 450.0  # Elements older than this many orbits are stale (30 days for a LEO), [rev]
+
+
+def _satrec(satellites, satnum):
+    '''
+    Satrec of an object, read from its lines when the catalog can give them (see
+    catalog.LazySatellites) so that the whole catalog is not built as satellites.
+    '''
+    if hasattr(satellites, "record"):
+        _, line1, line2 = satellites.record(satnum)
+        return Satrec.twoline2rv(line1, line2)
+    return satellites[satnum].model
+
+
+class CatalogPropagator:
+    '''
+    Alt/az/range of every object of a catalog, seen from the observatory.
+
+    Input : [{satnum: EarthSatellite} or LazySatellites, observatory (wgs84.latlon), satnums (default: all)]
+    '''
+    def __init__(self, satellites, observatory, satnums=None):
+        self.satellites = satellites
+        self.satnums = np.array(sorted(satellites) if satnums is None else list(satnums), dtype=np.int64)
+        self.satrecs = [_satrec(satellites, int(satnum)) for satnum in self.satnums]
+        # Epochs [Julian date] and how long the elements stay valid [days], from the mean motion [rad/min]
+        self.epochs = np.array([satrec.jdsatepoch + satrec.jdsatepochF for satrec in self.satrecs])
+        mean_motion = np.array([satrec.no_kozai for satrec in self.satrecs]) * 1440 / (2 * np.pi)  # [rev/day]
+        with np.errstate(divide="ignore"):
+            self.max_age = MAX_AGE_REVOLUTIONS / mean_motion
+
+        self.observer_km = np.array(observatory.itrs_xyz.km)
+        lat = observatory.latitude.radians
+        lon = observatory.longitude.radians
+        # Rows: east, north, up unit vectors in the Earth-fixed frame
+        self.enu = np.array([[-np.sin(lon), np.cos(lon), 0.0],
+                             [-np.sin(lat) * np.cos(lon), -np.sin(lat) * np.sin(lon), np.cos(lat)],
+                             [np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)]])
+
+    def horizon(self, r, theta):
+        '''
+        Alt/az/range seen from the observatory of TEME positions
+
+        Input : [TEME positions [km] (..., 3), Greenwich mean sidereal angle [rad] broadcastable to r[..., 0]]
+        Ouput : (altitude [deg], azimuth [deg], range [km])
+        '''
+        cos_theta = np.cos(theta)
+        sin_theta = np.sin(theta)
+
+        # TEME -> Earth-fixed, then relative to the observer
+        dx = cos_theta * r[..., 0] + sin_theta * r[..., 1] - self.observer_km[0]
+        dy = cos_theta * r[..., 1] - sin_theta * r[..., 0] - self.observer_km[1]
+        dz = r[..., 2] - self.observer_km[2]
+
+        east = self.enu[0, 0] * dx + self.enu[0, 1] * dy
+        north = self.enu[1, 0] * dx + self.enu[1, 1] * dy + self.enu[1, 2] * dz
+        up = self.enu[2, 0] * dx + self.enu[2, 1] * dy + self.enu[2, 2] * dz
+        distance = np.sqrt(dx * dx + dy * dy + dz * dz)
+
+        altitude = np.degrees(np.arcsin(up / distance))
+        azimuth = np.degrees(np.arctan2(east, north)) % 360.0
+        return altitude, azimuth, distance
+
+    def altaz_chunks(self, t, chunk_samples=CHUNK_SAMPLES):
+        '''
+        Propagate the catalog by chunks of objects.
+
+        Input : [skyfield Time (scalar or array), chunk_samples]
+        Ouput : generator of (satnums, altitude [deg], azimuth [deg], range [km]), arrays of
+                shape (objects, epochs). Objects sgp4 cannot propagate (decayed), with
+                stale elements or at a position no Earth orbit reaches are NaN.
+        '''
+        # sgp4 takes UTC Julian dates, GMST takes UT1, as in skyfield's EarthSatellite
+        jd = np.atleast_1d(t.whole).astype(float)
+        fraction = np.atleast_1d(t.tai_fraction - t._leap_seconds() / DAY_S).astype(float)
+        theta, _ = theta_GMST1982(jd, np.atleast_1d(t.ut1_fraction))
+
+        step = max(1, chunk_samples // len(jd))
+        for start in range(0, len(self.satrecs), step):
+            error, r, _ = SatrecArray(self.satrecs[start:start + step]).sgp4(jd, fraction)
+            altitude, azimuth, distance = self.horizon(r, theta)
+            geocentric = np.linalg.norm(r, axis=-1)
+            del r
+            age = np.abs(jd + fraction - self.epochs[start:start + step, None])
+            failed = ((error != 0) | ~(geocentric >= EARTH_RADIUS_KM) | ~(geocentric <= MAX_DISTANCE_KM) |
+                      (age > self.max_age[start:start + step, None]))
+            altitude[failed] = np.nan
+            azimuth[failed] = np.nan
+            distance[failed] = np.nan
+            yield self.satnums[start:start + step], altitude, azimuth, distance
+
+    def altaz(self, t, chunk_samples=CHUNK_SAMPLES):
+        '''
+        Same as altaz_chunks, for the whole catalog at once
+
+        Input : [skyfield Time, chunk_samples]
+        Ouput : (satnums, altitude, azimuth, range), arrays of shape (objects, epochs)
+        '''
+        chunks = list(self.altaz_chunks(t, chunk_samples))
+        if not chunks:
+            empty = np.empty((0, len(np.atleast_1d(t.whole))))
+            return self.satnums, empty, empty, empty
+        return tuple(np.concatenate(parts) for parts in zip(*chunks))
+
+    def above(self, t, min_altitude=10.0, chunk_samples=CHUNK_SAMPLES):
+        '''
+        Objects above min_altitude at a single time, highest first
+
+        Input : [skyfield Time (scalar), min_altitude [deg], chunk_samples]
+        Ouput : (satnums, altitude, azimuth, range)
+        '''
+        satnums, altitude, azimuth, distance = self.altaz(t, chunk_samples)
+        altitude = altitude[:, 0]
+        visible = np.flatnonzero(altitude > min_altitude)
+        visible = visible[np.argsort(-altitude[visible])]
+        return satnums[visible], altitude[visible], azimuth[visible, 0], distance[visible, 0]
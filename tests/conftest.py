@@ -0,0 +1,104 @@
+import math
+import os
+import socket
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sgp4.api import Satrec, WGS72
+from sgp4.exporter import export_tle
+from skyfield.api import load
+
+import PySkyX_ks
+from PySkyX_sim import startSimulator
+from catalog import LazySatellites
+from propagation import CatalogPropagator
+
+
+def make_tle(ts, satnum, age, mean_motion, eccentricity, mean_anomaly, node=100.0, name=None):
+    '''
+    TLE record of an object with its epoch age days ago, mean motion [rev/day], mean anomaly
+    and right ascension of the ascending node [deg]
+    '''
+    satrec = Satrec()
+    satrec.sgp4init(WGS72, 'i', satnum, ts.now().ut1 - age - 2433281.5, 1e-4, 0.0, 0.0, eccentricity,
+                    math.radians(30), math.radians(51.6), math.radians(mean_anomaly),
+                    mean_motion * 2 * math.pi / 1440, math.radians(node))
+    line1, line2 = export_tle(satrec)
+    return name or "OBJECT " + str(satnum), line1, line2
+
+
+def overhead_leo(ts, observatory, satnum, start, end):
+    '''
+    TLE record of a LEO with fresh elements, as high as possible over the observatory between
+    start and end seconds from now, and that lowest altitude [deg]
+    '''
+    grid = [(node, anomaly) for node in range(0, 360, 4) for anomaly in range(0, 360, 2)]
+    records = {index: make_tle(ts, satnum, 0.01, 15.5, 0.0005, anomaly, node)
+               for index, (node, anomaly) in enumerate(grid)}
+    propagator = CatalogPropagator(LazySatellites(records, ts), observatory)
+    t = ts.now()
+    _, altitude, _, _ = propagator.altaz(t + np.linspace(start, end, 10) / 86400)
+    best = int(np.nanargmax(np.nanmin(altitude, axis=1)))
+    return records[best], float(np.nanmin(altitude[best]))
+
+
+REPLY = b"done|No error. Error = 0."
+
+
+class DroppingServer:
+    '''
+    Replies to the first packet of every connection, then reads the next one and closes without replying
+    '''
+    def __init__(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen()
+        self.address = self.listener.getsockname()
+        self.packets = []
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            try:
+                connection, _ = self.listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.handle, args=(connection,), daemon=True).start()
+
+    def read_packet(self, connection):
+        data = b""
+        while b"/* Socket End Packet */" not in data:
+            chunk = connection.recv(4096)
+            if not chunk:
+                return None
+            data += chunk
+        self.packets.append(data)
+        return data
+
+    def handle(self, connection):
+        with connection:
+            if self.read_packet(connection) is None:
+                return
+            connection.sendall(REPLY)
+            self.read_packet(connection)
+
+
+@pytest.fixture
+def simulator():
+    server = startSimulator()
+    address = PySkyX_ks.TSXHost, PySkyX_ks.TSXPort
+    PySkyX_ks.TSXHost, PySkyX_ks.TSXPort = server.server_address
+    yield server
+    PySkyX_ks.TSXTransport.close()
+    PySkyX_ks.TSXHost, PySkyX_ks.TSXPort = address
+    server.shutdown()
+
+
+@pytest.fixture
+def timescale():
+    return load.timescale()
@@ -0,0 +1,55 @@
+'''
+Asyncio client against the SkyX simulator (PySkyX_sim).
+'''
+import asyncio
+
+import pytest
+
+import PySkyX_async
+from conftest import REPLY, DroppingServer
+from PySkyX_ks import TSXConnectionError, _TSXPacket
+
+
+def run(coroutine):
+    # The pool is bound to the event loop of its connections: emptied after every test
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await PySkyX_async.TSXTransport.close()
+    return asyncio.run(main())
+
+
+def test_exchange(simulator):
+    async def exchanges():
+        reply = await PySkyX_async.TSXSend("sky6RASCOMTele.IsConnected")
+        positions = await asyncio.gather(*[PySkyX_async.getPosition() for _ in range(4)])
+        batch = await PySkyX_async.TSXSendBatch(["1 + 1", "sky6RASCOMTele.dDec"])
+        return reply, positions, batch
+
+    reply, positions, batch = run(exchanges())
+    assert reply == "1"
+    assert len(positions) == 4 and all(len(position) == 4 for position in positions)
+    assert abs(positions[0][1] - positions[-1][1]) < 1e-3
+    assert batch[0] == "2"
+
+
+def test_no_resend_after_send():
+    server = DroppingServer()
+    host, port = server.address
+
+    async def exchanges():
+        pool = PySkyX_async.TSXAsyncConnectionPool()
+        try:
+            assert await pool.exchange(host, port, _TSXPacket("first").encode(), 5) == REPLY
+            with pytest.raises(TSXConnectionError) as error:
+                await pool.exchange(host, port, _TSXPacket("ccdsoftCamera.TakeImage()").encode(), 5)
+            assert error.value.sent
+        finally:
+            await pool.close()
+
+    try:
+        asyncio.run(exchanges())
+        assert len(server.packets) == 2
+    finally:
+        server.listener.close()
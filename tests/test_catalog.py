@@ -0,0 +1,238 @@
+'''
+catalog.py: the on-disk cache of the TLE sources, merging them, the compiled catalog and its search.
+'''
+import http.server
+import threading
+import time
+
+import pytest
+
+from catalog import CatalogIndex, CatalogMerge, CompiledCatalog, LazySatellites, TLECache, compile_catalog, \
+    designator, parse_records, satnum_of
+
+TLE = (b"ISS (ZARYA)\n"
+       b"1 25544U 98067A   24001.50000000  .00016717  00000+0  30270-3 0  9994\n"
+       b"2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.50377579432812\n")
+
+
+def with_satnum(content, field):
+    '''
+    TLE content with the NORAD ID field (5 characters, Alpha-5 above 99999) replaced
+    '''
+    name, line1, line2 = content.splitlines()
+    return b"\n".join([name, line1[:2] + field + line1[7:], line2[:2] + field + line2[7:]]) + b"\n"
+
+
+def with_epoch(content, epoch):
+    '''
+    Records of TLE content with the epoch field (YYDDD.DDDDDDDD) replaced
+    '''
+    return {satnum: (name, line1[:18] + epoch + line1[32:], line2)
+            for satnum, (name, line1, line2) in parse_records(content).items()}
+
+
+class TLEServer(http.server.ThreadingHTTPServer):
+    '''
+    Serves content with an ETag, answers 304 to a request carrying it. Keeps the request headers.
+    '''
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), TLEHandler)
+        self.content = TLE
+        self.etag = '"1"'
+        self.requests = []
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return "http://%s:%d/gp.php?GROUP=stations" % self.server_address
+
+
+class TLEHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == self.server.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", self.server.etag)
+        self.send_header("Content-Length", str(len(self.server.content)))
+        self.end_headers()
+        self.wfile.write(self.server.content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = TLEServer()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_fresh_copy_used_without_asking(server, tmp_path):
+    cache = TLECache(str(tmp_path))
+    assert cache.fetch(server.url) == TLE
+    assert cache.fetch(server.url) == TLE
+    assert len(server.requests) == 1
+
+
+def test_revalidated_with_etag(server, tmp_path):
+    cache = TLECache(str(tmp_path), max_age=0)
+    assert cache.fetch(server.url) == TLE
+
+    # Unchanged: a 304, the copy is kept and counts as fetched again
+    revalidated = time.time()
+    assert cache.fetch(server.url) == TLE
+    assert server.requests[1].get("If-None-Match") == '"1"'
+    assert cache.age(server.url) <= time.time() - revalidated
+
+    # Changed: the new content replaces the copy, with its ETag
+    server.content = TLE.replace(b"ISS (ZARYA)", b"ISS")
+    server.etag = '"2"'
+    assert cache.fetch(server.url) == server.content
+    assert server.requests[2].get("If-None-Match") == '"1"'
+    server.content = b""
+    assert cache.fetch(server.url) == TLE.replace(b"ISS (ZARYA)", b"ISS")
+    assert server.requests[3].get("If-None-Match") == '"2"'
+
+
+def test_last_copy_when_unreachable(server, tmp_path):
+    cache = TLECache(str(tmp_path), max_age=0)
+    url = server.url
+    assert cache.fetch(url) == TLE
+    server.shutdown()
+    server.server_close()
+    assert cache.fetch(url, timeout=2) == TLE
+
+
+def test_empty_answer_keeps_the_copy(server, tmp_path):
+    cache = TLECache(str(tmp_path), max_age=0)
+    assert cache.fetch(server.url) == TLE
+    server.content = b""
+    server.etag = '"2"'
+    assert cache.fetch(server.url) == TLE
+
+
+def test_no_copy_and_unreachable(server, tmp_path):
+    cache = TLECache(str(tmp_path))
+    url = server.url
+    server.shutdown()
+    server.server_close()
+    with pytest.raises(OSError):
+        cache.fetch(url, timeout=2)
+
+
+@pytest.mark.parametrize("field, satnum", [("25544", 25544), ("00005", 5), ("A0000", 100000), ("E8493", 148493),
+                                           ("H9999", 179999), ("J0000", 180000), ("N9999", 229999),
+                                           ("P0000", 230000), ("Z9999", 339999)])
+def test_satnum_of(field, satnum):
+    # Alpha-5 skips I and O, which look like 1 and 0
+    assert satnum_of("1 " + field + "U 98067A   24001.50000000") == satnum
+
+
+def test_compiled_catalog(tmp_path, timescale):
+    content = TLE + with_satnum(TLE, b"A0001").replace(b"ISS (ZARYA)", b"ALPHA FIVE") + \
+        with_satnum(TLE, b"00005").replace(b"ISS (ZARYA)", b"VANGUARD 1")
+    records = parse_records(content)
+    assert sorted(records) == [5, 25544, 100001]
+
+    path = str(tmp_path / "catalog.npy")
+    sources = {satnum: "https://celestrak.org/NORAD/elements/gp.php?GROUP=stations" for satnum in records}
+    assert compile_catalog(records, path, sources, {100001: ["stations", "active"]}) == 3
+
+    catalog = CompiledCatalog(path, timescale)
+    assert list(catalog) == [5, 25544, 100001]
+    assert catalog.record(100001) == records[100001]
+    assert catalog.source(25544) == "stations"
+    assert catalog.column("groups")[2] == b"stations,active"
+    assert 6 not in catalog and "25544" not in catalog
+    with pytest.raises(KeyError):
+        catalog.record(6)
+    assert catalog[100001].name == "ALPHA FIVE"
+    assert catalog[100001].model.satnum == 100001
+
+
+STATIONS = "https://celestrak.org/NORAD/elements/gp.php?GROUP=stations"
+ACTIVE = "https://celestrak.org/NORAD/elements/gp.php?GROUP=active"
+
+
+@pytest.mark.parametrize("order", [(0, 1), (1, 0)])
+def test_merge_keeps_newest_epoch(order):
+    # Whatever the order the sources arrive in, even against their rank
+    sources = [(STATIONS, with_epoch(TLE, "24001.50000000"), 1), (ACTIVE, with_epoch(TLE, "24002.25000000"), 0)]
+    merge = CatalogMerge()
+    for index in order:
+        merge.add(*sources[index])
+
+    assert merge.records[25544][1][18:32] == "24002.25000000"
+    assert merge.sources[25544] == ACTIVE
+    assert sorted(merge.groups[25544]) == ["active", "stations"]
+    assert [conflict[:2] + conflict[3:4] for conflict in merge.conflicts] == [(25544, ACTIVE, STATIONS)]
+
+
+def test_merge_equal_epochs():
+    # Same epoch, other element set: the higher rank wins. Identical copies are not conflicts.
+    merge = CatalogMerge()
+    merge.add(STATIONS, parse_records(TLE), 1)
+    merge.add(ACTIVE, parse_records(TLE), 0)
+    assert merge.sources[25544] == STATIONS and not merge.conflicts
+
+    name, line1, line2 = TLE.decode().splitlines()
+    line2 = line2.replace("51.6416", "51.6417")
+    merge.add("personal_tle.txt", {25544: ("ISS", line1, line2)}, 2)
+    assert merge.records[25544] == ("ISS", line1, line2)
+    assert merge.sources[25544] == "personal_tle.txt"
+    assert len(merge.conflicts) == 1
+
+    # The same element set again, from a source of lower rank: nothing changes
+    merge.add(ACTIVE, {25544: (name, line1, line2)}, 0)
+    assert merge.records[25544] == ("ISS", line1, line2)
+    assert len(merge.conflicts) == 1
+
+
+OBJECTS = [(25544, "ISS (ZARYA)", "1998-067A", ["stations", "active"]),
+           (49044, "ISS (NAUKA)", "2021-066A", ["stations"]),
+           (20580, "HST", "1990-037B", ["science", "active"]),
+           (25545, "SL-16 R/B", "1998-067B", ["cosmos-2251-debris"]),
+           (44713, "STARLINK-1007", "2019-074A", ["starlink", "active"]),
+           (44714, "STARLINK-1008", "2019-074B", ["starlink", "active"]),
+           (1007, "NUSAT_ISS TEST", "1963-055A", [])]
+
+
+def test_designator():
+    assert designator("98067A  ") == "1998-067A"
+    assert designator("57001B") == "1957-001B"
+    assert designator("") == ""
+
+
+def test_search():
+    index = CatalogIndex(OBJECTS)
+    # NORAD ID first, then name prefixes (sorted), then name substrings
+    assert index.search("1007") == [1007, 44713]
+    assert index.search("iss") == [49044, 25544, 1007]
+    assert index.search("starlink_1007") == [44713]
+    assert index.search("SL 16") == [25545]
+    assert index.search("1998-067") == [25544, 25545]
+    assert index.search("stations") == [25544, 49044]
+    assert index.search("active", limit=2) == [20580, 25544]
+    assert index.search("STARLINK", fields=("group",)) == [44713, 44714]
+    assert index.search("ZARYA", fields=("designator", "group")) == []
+    assert index.search(" - ") == []
+
+
+def test_search_compiled(tmp_path, timescale):
+    # Same results from the columns of a compiled catalog as from the records
+    content = TLE + with_satnum(TLE, b"25545").replace(b"ISS (ZARYA)", b"SL-16 R/B")
+    records = parse_records(content)
+    groups = {25544: ["stations", "active"], 25545: ["cosmos-2251-debris"]}
+    path = str(tmp_path / "catalog.npy")
+    compile_catalog(records, path, groups=groups)
+
+    for satellites in (LazySatellites(records, timescale, groups=groups), CompiledCatalog(path, timescale)):
+        index = CatalogIndex.from_catalog(satellites)
+        assert index.search("1998-067") == [25544, 25545]
+        assert index.search("r/b") == [25545]
+        assert index.search("debris") == [25545]
@@ -0,0 +1,62 @@
+'''
+TSXDispatcher jobs that call the dispatcher again, directly or from TSXMap threads, and closing.
+'''
+import threading
+import time
+
+import pytest
+
+from PySkyX_ks import TSXDispatcher, TSXMap, TSXPriorityCamera, TSXPriorityMount
+
+
+def test_job_calls_dispatcher():
+    dispatcher = TSXDispatcher()
+    try:
+        result = dispatcher.submit(TSXPriorityMount, lambda: dispatcher.call(TSXPriorityMount, lambda: 42))
+        assert result.result(timeout=5) == 42
+    finally:
+        dispatcher.close(wait=False)
+
+
+def test_fan_out_threads_call_dispatcher():
+    dispatcher = TSXDispatcher()
+    threads = []
+
+    def on_host(host):
+        # A helper of a fan-out thread going through the dispatcher, e.g. a position read
+        threads.append(threading.current_thread().name)
+        return dispatcher.call(TSXPriorityCamera, lambda: host.upper())
+
+    try:
+        result = dispatcher.submit(TSXPriorityMount, TSXMap, ["a:3040", "b:3040", "c:3040"], on_host)
+        assert result.result(timeout=5) == ["A:3040", "B:3040", "C:3040"]
+        assert all(name.startswith("TSXFanOut") for name in threads)
+
+        # Outside of a job, the fan-out threads queue their calls as usual
+        assert TSXMap(["a:3040", "b:3040"], on_host) == ["A:3040", "B:3040"]
+    finally:
+        dispatcher.close(wait=False)
+
+
+
+def test_close_while_submitting():
+    # A job submitted as the dispatcher closes either runs or is refused, it is never left pending
+    dispatcher = TSXDispatcher()
+    put = dispatcher._queue.put
+    checked = threading.Event()
+
+    def slow_put(item):
+        if item[5] is not None:
+            # submit() is past its closed check: close() comes in now
+            checked.set()
+            time.sleep(0.2)
+        put(item)
+
+    dispatcher._queue.put = slow_put
+    closer = threading.Thread(target=lambda: (checked.wait(), dispatcher.close()))
+    closer.start()
+    future = dispatcher.submit(TSXPriorityCamera, lambda: 42)
+    closer.join()
+    assert future.result(timeout=1) == 42
+    with pytest.raises(RuntimeError):
+        dispatcher.submit(TSXPriorityCamera, lambda: 42)
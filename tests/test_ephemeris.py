@@ -0,0 +1,81 @@
+'''
+ephemeris.py: the interpolated table of the target against skyfield, within its tolerance.
+'''
+import time
+
+import numpy as np
+import pytest
+from skyfield.api import EarthSatellite, load, wgs84
+from skyfield.constants import DAY_S
+from skyfield.framelib import true_equator_and_equinox_of_date
+
+from conftest import overhead_leo
+from ephemeris import MIN_STEP, TOLERANCE, TargetEphemeris, ephemeris_key
+
+OBSERVATORY = wgs84.latlon(46.30916667, 6.13472222, elevation_m=443)
+DURATION = 600  # [s]
+
+
+@pytest.fixture(scope="module")
+def pass_table():
+    # A pass high in the sky, where the azimuth turns fastest
+    ts = load.timescale()
+    (name, line1, line2), altitude = overhead_leo(ts, OBSERVATORY, 90001, 200, 400)
+    assert altitude > 20
+    satellite = EarthSatellite(line1, line2, name, ts)
+    t0 = ts.now()
+    return satellite, t0, TargetEphemeris(satellite, OBSERVATORY, t0, DURATION)
+
+
+def reference(satellite, t):
+    # What the table replaces: skyfield at every call
+    difference = satellite - OBSERVATORY
+    alt, az, _ = difference.at(t).altaz('standard')
+    dec, ra, distance, dec_rate, ra_rate, range_rate = \
+        difference.at(t).frame_latlon_and_rates(true_equator_and_equinox_of_date)
+    return (alt.degrees, az.degrees, ra.degrees, dec.degrees, ra_rate.arcseconds.per_second,
+            dec_rate.arcseconds.per_second, distance.km, range_rate.km_per_s)
+
+
+def separation(lat1, lon1, lat2, lon2):
+    # Angle on the sky between two directions [arcsec], from degrees
+    lat1, lon1, lat2, lon2 = np.radians([lat1, lon1, lat2, lon2])
+    cos_angle = np.sin(lat1) * np.sin(lat2) + np.cos(lat1) * np.cos(lat2) * np.cos(lon1 - lon2)
+    return np.degrees(np.arccos(np.clip(cos_angle, -1.0, 1.0))) * 3600
+
+
+def test_within_tolerance(pass_table):
+    satellite, t0, table = pass_table
+    assert table.max_error <= TOLERANCE and table.max_rate_error <= TOLERANCE
+
+    # Anywhere in the intervals, not only in their middle where the step is checked
+    seconds = np.concatenate([np.random.default_rng(0).uniform(0, DURATION, 300), [0.0, DURATION]])
+    alt, az, ra, dec, ra_rate, dec_rate, distance, range_rate = reference(satellite, t0 + seconds / DAY_S)
+    interpolated = np.array([table(s) for s in seconds]).T
+
+    # The refraction is interpolated on its own, out of the checked error
+    assert separation(interpolated[0], interpolated[1], alt, az).max() < 2 * TOLERANCE
+    assert separation(interpolated[3], interpolated[2], dec, ra).max() < TOLERANCE
+    rate_error = np.hypot((interpolated[6] - ra_rate) * np.cos(np.radians(dec)), interpolated[7] - dec_rate)
+    assert rate_error.max() < TOLERANCE
+    assert np.abs(interpolated[8] - distance).max() < 0.001
+    assert np.abs(interpolated[9] - range_rate).max() < 0.001
+
+
+def test_step_halved(pass_table):
+    # From too coarse a grid, halved until within the tolerance, down to MIN_STEP
+    satellite, t0, _ = pass_table
+    coarse = TargetEphemeris(satellite, OBSERVATORY, t0, DURATION, step=300)
+    assert coarse.step < 300
+    assert coarse.max_error <= TOLERANCE and coarse.max_rate_error <= TOLERANCE
+
+    finest = TargetEphemeris(satellite, OBSERVATORY, t0, DURATION, tolerance=0.0)
+    assert MIN_STEP <= finest.step < 2 * MIN_STEP
+
+
+def test_table_times(pass_table):
+    satellite, t0, table = pass_table
+    assert table.key == ephemeris_key(satellite)
+    assert table.covers(0.0) and table.covers(DURATION) and not table.covers(-0.1)
+    assert not table.covers(DURATION + 0.1)
+    assert abs(table.since_start(10) - 10 - (time.time() - t0.utc_datetime().timestamp())) < 0.01
@@ -0,0 +1,123 @@
+'''
+Following a LEO through TelestoClass against the SkyX simulator (PySkyX_sim), in real time.
+
+The simulated mount slews ten times faster than its default and the pointing error is
+checked every few seconds, so that a test takes seconds rather than a minute.
+'''
+import time
+
+import functions
+import latency
+from conftest import overhead_leo
+from catalog import LazySatellites
+from functions import TelestoClass
+from latency import MIN_SAMPLES, MountLatency
+from PySkyX_ks import updateTrackingRate
+from tracking import RateScheduler
+
+SATNUM = 90001
+SLEW_SPEED = 40.0  # [deg/s]
+
+
+def make_telesto(simulator, timescale, tmp_path, start, end):
+    '''
+    TelestoClass started on a catalog of a single LEO, above the observatory from start to end seconds from now
+    '''
+    simulator.simulator.mount.slewSpeed = SLEW_SPEED
+    telesto = TelestoClass(simulation=True)
+    telesto.ts = timescale
+    telesto.has_started = True
+    telesto.latency_file = str(tmp_path / "latency.json")
+    telesto.error_check_interval = 3
+    # The pass is taken high in the sky, where its path bends most: shorter segments than the default
+    telesto.tracking_cadence = 2.0
+    record, altitude = overhead_leo(timescale, telesto.observatory, SATNUM, start, end)
+    assert altitude > 20
+    telesto.satellites = LazySatellites({SATNUM: record}, timescale)
+    return telesto
+
+
+def simulator_latency():
+    '''
+    Slews of the simulated mount measured already, with a margin: the round trips of the rates are not
+    '''
+    measured = MountLatency()
+    for distance in (2.0, 10.0, 30.0, 60.0, 90.0):
+        measured.slew.update(distance, 1.5 + distance / SLEW_SPEED)
+    return measured
+
+
+def stop(telesto):
+    telesto.stop_following()
+    for thread in (telesto.tracking_error_thread, telesto.picture_thread):
+        if thread is not None:
+            thread.join(10)
+    telesto.dispatcher.close()
+
+
+def test_follow_uncalibrated(simulator, timescale, tmp_path, monkeypatch):
+    # No latency measured yet: the default lead time, then one error check
+    monkeypatch.setattr(latency, "DEFAULT_LEAD", 8.0)
+    telesto = make_telesto(simulator, timescale, tmp_path, 5, 120)
+    telesto.latency = MountLatency()
+    try:
+        assert telesto.follow_satellites(str(SATNUM)) == (True, "")
+        time.sleep(telesto.error_check_interval + 1)
+        assert telesto.is_following, telesto.tracking_msg
+        assert len(telesto.tracking_errors) >= 1
+        assert telesto.latency.tracking.count >= MIN_SAMPLES
+        assert telesto.latency.update.count >= MIN_SAMPLES
+    finally:
+        stop(telesto)
+
+
+def test_follow_two_error_checks(simulator, timescale, tmp_path):
+    # The target stays within the threshold of the error thread (0.0001) along the pass
+    telesto = make_telesto(simulator, timescale, tmp_path, 5, 120)
+    telesto.latency = simulator_latency()
+    try:
+        assert telesto.follow_satellites(str(SATNUM)) == (True, "")
+        time.sleep(2 * telesto.error_check_interval + 1)
+        assert telesto.is_following, telesto.tracking_msg
+        assert len(telesto.tracking_errors) >= 2
+        assert max(telesto.tracking_errors) < 0.0001
+    finally:
+        stop(telesto)
+
+
+def test_follow_while_imaging(simulator, timescale, tmp_path, monkeypatch):
+    # Rate updates get to the mount when they are due, not after the exposure wait in progress
+    telesto = make_telesto(simulator, timescale, tmp_path, 5, 120)
+    telesto.latency = simulator_latency()
+    telesto.tracking_cadence = 1.0
+
+    ran = []
+    delays = []
+
+    def recording_update(rate):
+        ran.append(time.time())
+        return updateTrackingRate(rate)
+
+    class RecordingScheduler(RateScheduler):
+        def __init__(self, table, times, ra_rates, dec_rates, send, stats):
+            def recording_send(ra_rate, dec_rate):
+                called = time.time()
+                round_trip = send(ra_rate, dec_rate)
+                delays.append(ran[-1] - called)
+                return round_trip
+            super().__init__(table, times, ra_rates, dec_rates, recording_send, stats)
+
+    monkeypatch.setattr(functions, "updateTrackingRate", recording_update)
+    monkeypatch.setattr(functions, "RateScheduler", RecordingScheduler)
+    try:
+        assert telesto.follow_satellites(str(SATNUM)) == (True, "")
+        assert telesto.take_picture(3, 1, 1, "Clear", 0, 0) == (True, "")
+        time.sleep(8)
+        assert telesto.is_following, telesto.tracking_msg
+        assert telesto.rate_scheduler.sent >= 5
+        # Queued behind one exposure_poll wait at most
+        assert max(delays) < telesto.exposure_poll + 0.1, delays
+        # The wait in the queue is not taken for a round trip
+        assert telesto.latency.update.mean < 0.05
+    finally:
+        stop(telesto)
@@ -0,0 +1,67 @@
+'''
+PySkyX_journal: a session recorded against the simulator replays without it.
+'''
+import time
+
+import pytest
+
+import PySkyX_ks
+from PySkyX_journal import TSXJournalRecorder, TSXReplayMismatch, readJournal, startJournal, startReplay, \
+    stopJournal
+from PySkyX_ks import TSXSend, TSXSendBatch
+
+
+SESSION = ["sky6RASCOMTele.IsConnected", "sky6RASCOMTele.GetRaDec(); sky6RASCOMTele.dRa",
+           "SelectedHardware.mountModel", "sky6RASCOMTele.IsConnected"]
+
+
+def record(path, gap=0.0):
+    replies = []
+    startJournal(path)
+    try:
+        for command in SESSION:
+            replies.append(TSXSend(command))
+            time.sleep(gap)
+        replies.append(TSXSendBatch(["1 + 1", "sky6RASCOMTele.dDec"]))
+    finally:
+        stopJournal()
+    return replies
+
+
+def replay():
+    replies = [TSXSend(command) for command in SESSION]
+    replies.append(TSXSendBatch(["1 + 1", "sky6RASCOMTele.dDec"]))
+    return replies
+
+
+@pytest.fixture
+def transport():
+    original = PySkyX_ks.TSXTransport
+    yield
+    PySkyX_ks.TSXTransport = original
+
+
+def test_round_trip(simulator, transport, tmp_path):
+    path = str(tmp_path / "night.tsxj")
+    recorded = record(path)
+    assert not isinstance(PySkyX_ks.TSXTransport, TSXJournalRecorder)
+    assert len(readJournal(path)) == len(SESSION) + 1
+
+    simulator.shutdown()
+    replayTransport = startReplay(path)
+    assert replay() == recorded
+    assert replayTransport.remaining() == 0
+    with pytest.raises(TSXReplayMismatch):
+        TSXSend("sky6RASCOMTele.Park()")
+
+
+def test_speed_scales_the_gaps(simulator, transport, tmp_path):
+    path = str(tmp_path / "night.tsxj")
+    record(path, gap=0.2)
+    recordedSpan = readJournal(path)[-1][0] - readJournal(path)[0][0]
+
+    startReplay(path, speed=4)
+    start = time.monotonic()
+    replay()
+    replayed = time.monotonic() - start
+    assert recordedSpan / 4 <= replayed < recordedSpan / 2
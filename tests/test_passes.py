@@ -0,0 +1,86 @@
+'''
+passes.py: the passes found on the coarse grid, refined, against skyfield on one object at a time.
+'''
+import numpy as np
+import pytest
+from skyfield.api import load, wgs84
+
+from catalog import LazySatellites
+from conftest import make_tle
+from passes import MIN_ALTITUDE, predict_passes
+
+OBSERVATORY = wgs84.latlon(46.30916667, 6.13472222, elevation_m=443)
+
+
+@pytest.fixture(scope="module")
+def prediction():
+    ts = load.timescale()
+    records = {satnum: make_tle(ts, satnum, 0.2, 15.5, 0.0005, 0.0, node=40.0 * satnum) for satnum in range(1, 5)}
+    records[9] = make_tle(ts, 9, 0.2, 14.2, 0.001, 90.0, node=200.0)
+    satellites = LazySatellites(records, ts)
+    t0 = ts.now()
+    return satellites, t0, predict_passes(satellites, OBSERVATORY, t0, hours=12, workers=1)
+
+
+def altitude(satellite, passes, seconds):
+    return (satellite - OBSERVATORY).at(passes.time(seconds)).altaz()[0].degrees
+
+
+def crossing(satellite, passes, a, b):
+    '''
+    Time the altitude crosses MIN_ALTITUDE between a and b, by bisection on skyfield
+    '''
+    fa = altitude(satellite, passes, a) - MIN_ALTITUDE
+    for _ in range(40):
+        middle = (a + b) / 2
+        fm = altitude(satellite, passes, middle) - MIN_ALTITUDE
+        if (fm > 0) == (fa > 0):
+            a, fa = middle, fm
+        else:
+            b = middle
+    return (a + b) / 2
+
+
+def test_refined_passes(prediction):
+    satellites, t0, passes = prediction
+    assert len(passes) >= 4
+
+    for row in passes:
+        satellite = satellites[int(row["satnum"])]
+        if not np.isnan(row["rise"]):
+            assert abs(crossing(satellite, passes, row["rise"] - 5, row["rise"] + 5) - row["rise"]) < 0.01
+        if not np.isnan(row["set"]):
+            assert abs(crossing(satellite, passes, row["set"] - 5, row["set"] + 5) - row["set"]) < 0.01
+
+        # The culmination, on a 0.01 s grid around it
+        seconds = np.linspace(row["culmination"] - 3, row["culmination"] + 3, 601)
+        altitudes = altitude(satellite, passes, seconds)
+        assert abs(seconds[np.argmax(altitudes)] - row["culmination"]) < 0.05
+        assert abs(altitudes.max() - row["max_altitude"]) < 1e-4
+        assert row["start"] < row["culmination"] < row["end"]
+
+
+def test_no_pass_missed(prediction):
+    # The passes skyfield finds over the window, but those barely above the limit (shorter than
+    # the grid step, they can be missed), and no other
+    satellites, t0, passes = prediction
+    for satnum in satellites:
+        satellite = satellites[satnum]
+        times, events = satellite.find_events(OBSERVATORY, t0, passes.time(12 * 3600.0),
+                                              altitude_degrees=MIN_ALTITUDE)
+        culminations = np.array([(t - t0) * 86400 for t, event in zip(times, events) if event == 1])
+        rows = passes.for_satellite(satnum).rows
+        for seconds in culminations:
+            if altitude(satellite, passes, seconds) > MIN_ALTITUDE + 1:
+                assert np.min(np.abs(rows["culmination"] - seconds)) < 1.0
+        # Passes cut by the window may culminate at its edge, skyfield has no event for those
+        for seconds in rows["culmination"][~np.isnan(rows["rise"]) & ~np.isnan(rows["set"])]:
+            assert np.min(np.abs(culminations - seconds)) < 1.0
+
+
+def test_workers(prediction):
+    # Split in shards over processes, the same passes
+    satellites, t0, passes = prediction
+    sharded = predict_passes(satellites, OBSERVATORY, t0, hours=12, workers=2)
+    for field in passes.rows.dtype.names:
+        assert np.array_equal(sharded.rows[field], passes.rows[field], equal_nan=field != "satnum")
@@ -0,0 +1,26 @@
+'''
+Objects that sgp4 propagates without error to positions no Earth orbit has are
+left out of satellites_above.
+'''
+from catalog import LazySatellites
+from conftest import make_tle
+from functions import TelestoClass
+
+
+def test_satellites_above_drops_unphysical_objects(timescale):
+    records = {
+        1: make_tle(timescale, 1, 0.5, 15.5, 0.0005, 0.0),  # LEO, fresh elements
+        2: make_tle(timescale, 2, 200.0, 15.5, 0.0005, 0.0),  # LEO, elements 200 days (3100 orbits) old
+        3: make_tle(timescale, 3, 0.5, 0.05, 0.9, 180.0),  # at the apogee of a 590 000 km orbit
+        4: make_tle(timescale, 4, 200.0, 1.0027, 0.0002, 0.0),  # geostationary, 200 orbits old
+    }
+    telesto = TelestoClass(simulation=True)
+    try:
+        telesto.ts = timescale
+        telesto.satellites = LazySatellites(records, timescale)
+        above = telesto.satellites_above(min_altitude=-90)
+    finally:
+        telesto.dispatcher.close()
+
+    assert sorted(satnum for satnum, _, _, _, _ in above) == [1, 4]
+    assert all(distance < 100000 for _, _, _, _, distance in above)
@@ -0,0 +1,85 @@
+'''
+TSXPropertyCache: static properties read once per session, errors never kept.
+'''
+import pytest
+
+import PySkyX_ks
+from PySkyX_ks import TSXPropertyCache, TSXInvalidateCache, TSXSendBatch, TSXSendCached
+
+
+class Fetch:
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.calls = []
+
+    def __call__(self, expression):
+        self.calls.append(expression)
+        return self.replies.pop(0)
+
+
+def test_read_once():
+    cache = TSXPropertyCache()
+    fetch = Fetch("Telescope Mount Simulator")
+    assert cache.get("host:3040", "SelectedHardware.mountModel", fetch) == "Telescope Mount Simulator"
+    assert cache.get("host:3040", "SelectedHardware.mountModel", fetch) == "Telescope Mount Simulator"
+    assert len(fetch.calls) == 1
+
+
+def test_expiry():
+    cache = TSXPropertyCache(defaultTTL=0.0)
+    fetch = Fetch("0", "1")
+    assert cache.get("host:3040", "ccdsoftCamera.ImageUseDigitizedSkySurvey", fetch) == "0"
+    assert cache.get("host:3040", "ccdsoftCamera.ImageUseDigitizedSkySurvey", fetch) == "1"
+
+
+@pytest.mark.parametrize("error", ["TypeError: Result of expression is undefined Error = 21.",
+                                   "Mount is parked. Error = 216.",
+                                   "TypeError: undefined is not an object"])
+def test_errors_not_cached(error):
+    cache = TSXPropertyCache()
+    fetch = Fetch(error, "<No Filter Wheel Selected>")
+    assert cache.get("host:3040", "SelectedHardware.filterWheelModel", fetch) == error
+    assert cache.get("host:3040", "SelectedHardware.filterWheelModel", fetch) == "<No Filter Wheel Selected>"
+    cache.put("host:3040", "SelectedHardware.filterWheelModel", error)
+    assert cache.get("host:3040", "SelectedHardware.filterWheelModel", fetch) == "<No Filter Wheel Selected>"
+
+
+def test_values_that_mention_errors_are_cached():
+    cache = TSXPropertyCache()
+    fetch = Fetch("Error correction focuser")
+    cache.get("host:3040", "SelectedHardware.focuserModel", fetch)
+    cache.get("host:3040", "SelectedHardware.focuserModel", fetch)
+    assert len(fetch.calls) == 1
+
+
+def test_invalidate():
+    cache = TSXPropertyCache()
+    for host in ("a:3040", "b:3040"):
+        for expression in ("SelectedHardware.mountModel", "ccdsoftCamera.szFilterName(0)"):
+            cache.put(host, expression, "value")
+
+    cache.invalidate(prefix="ccdsoftCamera.")
+    cache.invalidate(host="b:3040")
+    fetch = Fetch("new", "new", "new")
+    assert cache.get("a:3040", "SelectedHardware.mountModel", fetch) == "value"
+    assert cache.get("a:3040", "ccdsoftCamera.szFilterName(0)", fetch) == "new"
+    assert cache.get("b:3040", "SelectedHardware.mountModel", fetch) == "new"
+
+    cache.invalidate()
+    assert cache.get("a:3040", "SelectedHardware.mountModel", fetch) == "new"
+    assert len(fetch.calls) == 3
+
+
+def test_batch_error_slot_not_cached(simulator):
+    TSXInvalidateCache()
+    host = PySkyX_ks.TSXHost + ":" + str(PySkyX_ks.TSXPort)
+    value, error = TSXSendBatch(["SelectedHardware.mountModel", "SelectedHardware.noSuchModel.length"])
+    PySkyX_ks.TSXCache.put(host, "SelectedHardware.mountModel", value)
+    PySkyX_ks.TSXCache.put(host, "SelectedHardware.noSuchModel.length", error)
+    try:
+        assert "Error" in error
+        assert PySkyX_ks.TSXCache.get(host, "SelectedHardware.noSuchModel.length", lambda _: "fetched") \
+            == "fetched"
+        assert TSXSendCached("SelectedHardware.mountModel") == value
+    finally:
+        TSXInvalidateCache()
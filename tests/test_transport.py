@@ -0,0 +1,50 @@
+'''
+TSXConnectionPool: a command that reached SkyX is never sent twice. TSXCircuitBreaker probes.
+'''
+import time
+
+import pytest
+
+import PySkyX_ks
+from conftest import REPLY, DroppingServer
+from PySkyX_ks import TSXConnectionError, TSXConnectionPool, _TSXPacket
+
+
+def test_no_resend_after_send():
+    server = DroppingServer()
+    pool = TSXConnectionPool()
+    host, port = server.address
+    try:
+        assert pool.exchange(host, port, _TSXPacket("first").encode(), 5) == REPLY
+        # Over the kept connection, SkyX gets the command and drops the connection
+        with pytest.raises(TSXConnectionError) as error:
+            pool.exchange(host, port, _TSXPacket("sky6RASCOMTele.SlewToRaDec(1, 2, '')").encode(), 5)
+        assert error.value.sent
+        assert len(server.packets) == 2
+    finally:
+        pool.close()
+        server.listener.close()
+
+
+class FailingTransport:
+    def __init__(self, error):
+        self.error = error
+
+    def exchange(self, host, port, fullMessage, timeout=None):
+        raise self.error
+
+
+def test_probe_ending_in_another_error(monkeypatch):
+    breaker = PySkyX_ks.TSXBreaker("probe.invalid", 3040)
+    for _ in range(breaker.threshold):
+        breaker.failure()
+    time.sleep(breaker.resetTimeout)
+
+    monkeypatch.setattr(PySkyX_ks, "TSXTransport", FailingTransport(RuntimeError("interrupted")))
+    with pytest.raises(RuntimeError):
+        PySkyX_ks.TSXSendRemote("probe.invalid:3040", "sky6RASCOMTele.IsConnected")
+
+    # The probe is over: the next command is let through instead of the circuit staying open
+    assert breaker.allow("probe.invalid:3040")
+    breaker.success()
+    assert not breaker.isOpen
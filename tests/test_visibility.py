@@ -0,0 +1,120 @@
+'''
+visibility.py: the shadow of the Earth, the Sun, and the visible part of the passes against skyfield.
+'''
+import numpy as np
+import pytest
+from skyfield.api import load, wgs84
+from skyfield.constants import AU_KM, DAY_S
+from skyfield.sgp4lib import TEME
+
+from catalog import LazySatellites
+from conftest import make_tle
+from passes import predict_passes
+from visibility import DARK_SUN_ALTITUDE, EARTH_RADIUS_KM, PENUMBRA, SUNLIT, UMBRA, SunTrack, shadow, sun_teme, \
+    umbra_margin
+
+OBSERVATORY = wgs84.latlon(46.30916667, 6.13472222, elevation_m=443)
+ZENITH = wgs84.latlon(46.30916667, 6.13472222, elevation_m=1443)
+SUN = np.array([AU_KM, 0.0, 0.0])
+RADIUS = EARTH_RADIUS_KM + 500.0
+
+
+def angle(u, v):
+    return np.degrees(np.arccos(np.clip(np.sum(u * v, axis=-1) /
+                                        (np.linalg.norm(u, axis=-1) * np.linalg.norm(v, axis=-1)), -1.0, 1.0)))
+
+
+def behind(separation):
+    '''
+    Positions at LEO radius, separation [deg] away from the antisolar direction, seen from the Earth
+    '''
+    s = np.radians(separation)
+    return RADIUS * np.stack([-np.cos(s), np.sin(s), np.zeros_like(s)], axis=-1)
+
+
+def test_shadow():
+    earth_radius = np.degrees(np.arcsin(EARTH_RADIUS_KM / RADIUS))
+    positions = np.array([[RADIUS, 0.0, 0.0], [0.0, 0.0, RADIUS], [-RADIUS, 0.0, 0.0]])
+    assert list(shadow(positions, SUN)) == [SUNLIT, SUNLIT, UMBRA]
+    # Sun and Earth discs 0.27 deg and about 68 deg wide: the penumbra is a narrow ring around the umbra
+    assert list(shadow(behind(np.array([earth_radius - 0.5, earth_radius, earth_radius + 0.5])), SUN)) == \
+        [UMBRA, PENUMBRA, SUNLIT]
+
+
+def test_umbra_margin():
+    separations = np.linspace(0.0, 180.0, 18001)
+    positions = behind(separations)
+    margin = umbra_margin(positions, SUN)
+    states = shadow(positions, SUN)
+    assert np.all((margin > 0) == (states != UMBRA))
+    # Continuous, and close to the separation itself (the parallax of the Sun is 0.003 deg)
+    assert np.max(np.abs(np.diff(margin))) < 0.011
+    assert np.all(np.diff(margin) > 0)
+    assert margin[-1] == pytest.approx(180.0 - np.degrees(np.arcsin(EARTH_RADIUS_KM / RADIUS)) + 0.2666, abs=0.01)
+
+
+@pytest.mark.parametrize("utc, direction", [((2024, 3, 20, 3, 6), (1.0, 0.0, 0.0)),
+                                            ((2024, 6, 20, 20, 51), (0.0, 0.91747, 0.39777)),
+                                            ((2024, 9, 22, 12, 44), (-1.0, 0.0, 0.0)),
+                                            ((2024, 12, 21, 9, 21), (0.0, -0.91747, -0.39777))])
+def test_analytic_sun(utc, direction):
+    # Equinoxes and solstices: the Sun on the equinox, or at the obliquity of the ecliptic
+    ts = load.timescale()
+    position = sun_teme(ts.utc(*utc))
+    assert angle(position, np.array(direction)) < 0.01
+    assert 0.983 * AU_KM < np.linalg.norm(position) < 1.017 * AU_KM
+
+
+def test_sun_track():
+    ts = load.timescale()
+    t0 = ts.utc(2024, 3, 20)
+    sun = SunTrack(t0, 3 * 3600 + 100)
+    assert sun.seconds[-1] == 3 * 3600 + 100
+    assert np.allclose(sun(sun.seconds), sun.positions)
+    # Between the samples the Earth moves on by 0.007 deg at most, the chord is off by 1e-9 rad
+    seconds = np.linspace(0, 3 * 3600 + 100, 200)
+    exact = sun_teme(t0 + seconds / DAY_S)
+    assert np.max(np.linalg.norm(sun(seconds) - exact, axis=-1) / np.linalg.norm(exact, axis=-1)) < 1e-8
+
+
+def margin(satellite, t):
+    '''
+    How far from visible, as predict_passes counts it, from skyfield positions: distance to the
+    umbra and Sun depression below DARK_SUN_ALTITUDE, [deg]
+    '''
+    sun = sun_teme(t)
+    observer = OBSERVATORY.at(t).frame_xyz(TEME).km
+    up = ZENITH.at(t).frame_xyz(TEME).km - observer
+    to_sun = sun - observer
+    sun_altitude = 90.0 - angle(to_sun, up)
+    return min(umbra_margin(satellite.at(t).frame_xyz(TEME).km, sun), DARK_SUN_ALTITUDE - sun_altitude)
+
+
+def test_visible_passes():
+    # Over a day at least a dusk and a dawn, some passes in sunlight under a dark sky
+    ts = load.timescale()
+    records = {satnum: make_tle(ts, satnum, 0.2, 15.5, 0.0005, 30.0 * satnum, node=45.0 * satnum)
+               for satnum in range(1, 9)}
+    satellites = LazySatellites(records, ts)
+    passes = predict_passes(satellites, OBSERVATORY, ts.now(), hours=24, workers=1)
+    visible = passes.visible()
+    assert len(visible) >= 1
+
+    def at(row, seconds):
+        return margin(satellites[int(row["satnum"])], passes.time(seconds))
+
+    for row in visible.rows:
+        assert row["start"] <= row["visible_start"] <= row["visible_end"] <= row["end"]
+        assert at(row, row["visible_start"]) > -0.01 and at(row, row["visible_end"]) > -0.01
+        # Unless cut by the pass, the visible part starts and ends where the margin crosses zero
+        if row["visible_start"] > row["start"]:
+            assert abs(at(row, row["visible_start"])) < 0.01
+            assert at(row, row["visible_start"] - 1) < 0 < at(row, row["visible_start"] + 1)
+        if row["visible_end"] < row["end"]:
+            assert abs(at(row, row["visible_end"])) < 0.01
+            assert at(row, row["visible_end"] - 1) > 0 > at(row, row["visible_end"] + 1)
+
+    # The other passes are out of sight all along
+    for row in passes.select(np.isnan(passes.rows["visible_start"])).rows:
+        seconds = np.linspace(row["start"], row["end"], 20)
+        assert max(at(row, s) for s in seconds) < 0.01
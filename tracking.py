@@ -0,0 +1,95 @@
+'''
+Piecewise tracking rates for the followed target
+
+A single rate, computed at the start of the pass, lets the target drift out of
+the field within minutes: its RA/Dec rates change all along the pass. The pass
+is instead cut in segments of a few seconds, each with the rate that takes the
+mount from the target position at the start of the segment to its position at
+the end (see ephemeris.py). The mount then meets the target at every boundary,
+and in between only strays by the curvature of the path over one segment.
+
+Each new rate is sent ahead of its segment by the time a rate update takes to
+reach the mount, measured on the updates already sent (see latency.py).
+
+    times, ra_rates, dec_rates = rate_profile(table, aligned, table.duration)
+    scheduler = RateScheduler(table, times[1:], ra_rates[1:], dec_rates[1:], send, latency.update)
+    scheduler.start()
+'''
+import threading
+import time
+
+import numpy as np
+
+from latency import DEFAULT_UPDATE, LatencyStats, sleep_until
+
+TRACKING_CADENCE = 5.0  # Length of a segment at constant rates, [s]
+
+
+def rate_profile(table, start, end, cadence=TRACKING_CADENCE):
+    '''
+    Rates of the segments of [start, end]
+
+    Input : [TargetEphemeris, start, end (seconds after table.t0), cadence [s]]
+    Ouput : (segment starts (seconds after table.t0), RA rates, Dec rates [arcsec/s])
+    '''
+    boundaries = np.append(np.arange(start, end, cadence), end)
+    if len(boundaries) > 2 and boundaries[-1] - boundaries[-2] < cadence / 2:
+        boundaries = np.delete(boundaries, -2)  # no last segment much shorter than the others
+    positions = np.array([table(seconds)[2:4] for seconds in boundaries])
+    ra_moves = (np.diff(positions[:, 0]) + 180.0) % 360.0 - 180.0
+    durations = np.diff(boundaries)
+    return boundaries[:-1], ra_moves * 3600 / durations, np.diff(positions[:, 1]) * 3600 / durations
+
+
+class RateScheduler:
+    '''
+    Sends the rates of a profile to the mount, each one a mean round trip of send before its
+    segment. send returns its round trip, which is added to the latency statistics: timed
+    where the command is sent, waits in a queue before it are not part of it.
+
+    Input : [TargetEphemeris, segment starts (seconds after table.t0), RA rates, Dec rates [arcsec/s],
+             send(ra_rate, dec_rate) -> round trip [s], latency.LatencyStats]
+    '''
+    def __init__(self, table, times, ra_rates, dec_rates, send, latency=None):
+        self.table = table
+        self.times = times
+        self.ra_rates = ra_rates
+        self.dec_rates = dec_rates
+        self.send = send
+        self.latency = latency if latency is not None else LatencyStats(DEFAULT_UPDATE)
+        self.sent = 0
+        self.skipped = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.__rates_thread, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        '''
+        Stop sending rates. Waits for an update in progress, so that none reaches the
+        mount after this returns.
+        '''
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def __rates_thread(self):
+        for index, seconds in enumerate(self.times):
+            lead = self.latency.expected()
+            send_at = self.table.unix0 + seconds - lead
+            # Too late for this segment if the next one has to be sent already
+            if index + 1 < len(self.times) and time.time() > self.table.unix0 + self.times[index + 1] - lead:
+                self.skipped += 1
+                continue
+            # Interruptible wait, then to the millisecond
+            if self.stop_event.wait(max(send_at - time.time() - 0.002, 0)):
+                return
+            sleep_until(send_at, time.time)
+            try:
+                self.latency.update(self.send(self.ra_rates[index], self.dec_rates[index]))
+                self.sent += 1
+            except Exception as error:
+                # Mount not answering: it keeps the previous rates for one more segment
+                print('Error while updating the tracking rate:', error)
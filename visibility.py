@@ -0,0 +1,129 @@
+'''
+Optical visibility of the satellites: in sunlight, seen from a dark sky
+
+The Sun is taken in the TEME frame of sgp4, so that the shadow of the Earth is
+tested directly on the positions sgp4 gives, and its altitude at the observatory
+comes from the same conversion as the satellites (CatalogPropagator.horizon).
+Its position is read from a JPL ephemeris cached in ephemeris/ (downloaded once
+by skyfield), or from the low precision formula of the Astronomical Almanac
+(0.01 deg) when the ephemeris cannot be downloaded.
+
+The Earth is a sphere and its shadow a cone (umbra) inside a wider one (penumbra).
+A satellite counts as lit until it enters the umbra: in the penumbra it is dimmer
+but still visible, and a LEO object crosses it in a few seconds.
+
+    sun = SunTrack(ts.now(), 12 * 3600, load_ephemeris())
+    states = shadow(r, sun(seconds))  # SUNLIT, PENUMBRA or UMBRA
+'''
+import os
+
+import numpy as np
+from skyfield.api import Loader
+from skyfield.constants import AU_KM, DAY_S
+from skyfield.sgp4lib import TEME
+
+EPHEMERIS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ephemeris")
+EPHEMERIS = "de421.bsp"  # 17 MB, 1900 to 2050
+SUN_STEP = 600.0  # Sun positions are interpolated between samples this far apart, [s]
+DARK_SUN_ALTITUDE = -6.0  # Sky dark enough below this Sun altitude (end of civil twilight), [deg]
+
+EARTH_RADIUS_KM = 6378.137
+SUN_RADIUS_KM = 696000.0
+
+SUNLIT = 0
+PENUMBRA = 1
+UMBRA = 2
+
+
+def load_ephemeris(name=EPHEMERIS, directory=EPHEMERIS_DIR):
+    '''
+    JPL ephemeris from the local cache, downloaded the first time
+
+    Input : [file name, cache directory]
+    Ouput : skyfield SpiceKernel, None if it cannot be downloaded
+    '''
+    try:
+        return Loader(directory, verbose=False)(name)
+    except (OSError, ValueError) as error:
+        print("JPL ephemeris not available, the Sun position is computed instead:", error)
+        return None
+
+
+def sun_teme(t, ephemeris=None):
+    '''
+    Geocentric position of the Sun in the TEME frame
+
+    Input : [skyfield Time (array), SpiceKernel or None for the analytic formula]
+    Ouput : positions [km], shape (len(t), 3)
+    '''
+    if ephemeris is not None:
+        return (ephemeris["sun"] - ephemeris["earth"]).at(t).frame_xyz(TEME).km.T
+
+    # Astronomical Almanac, mean equinox of date, which TEME follows to a few arcseconds
+    n = t.tt - 2451545.0
+    mean_longitude = np.radians(280.460 + 0.9856474 * n)
+    anomaly = np.radians(357.528 + 0.9856003 * n)
+    longitude = mean_longitude + np.radians(1.915 * np.sin(anomaly) + 0.020 * np.sin(2 * anomaly))
+    obliquity = np.radians(23.439 - 0.0000004 * n)
+    distance = (1.00014 - 0.01671 * np.cos(anomaly) - 0.00014 * np.cos(2 * anomaly)) * AU_KM
+    return np.stack([distance * np.cos(longitude),
+                     distance * np.cos(obliquity) * np.sin(longitude),
+                     distance * np.sin(obliquity) * np.sin(longitude)], axis=-1)
+
+
+class SunTrack:
+    '''
+    Sun positions (TEME) over a prediction window, as a function of the seconds after
+    its start. Small enough to be sent to the worker processes of passes.py.
+
+    Input : [start (skyfield Time), duration [s], SpiceKernel or None, step [s]]
+    '''
+    def __init__(self, t0, duration, ephemeris=None, step=SUN_STEP):
+        self.seconds = np.append(np.arange(0.0, duration, step), float(duration))
+        self.positions = sun_teme(t0 + self.seconds / DAY_S, ephemeris)
+        self.source = "JPL " + EPHEMERIS if ephemeris is not None else "analytic"
+
+    def __call__(self, seconds):
+        '''
+        Input : [seconds after the start]
+        Ouput : positions [km], shape (..., 3)
+        '''
+        seconds = np.asarray(seconds, dtype=float)
+        return np.stack([np.interp(seconds, self.seconds, self.positions[:, axis]) for axis in range(3)], axis=-1)
+
+
+def _disc_angles(r, sun):
+    # Seen from the satellite: angular radii of the Sun and of the Earth, and the angle between their centres
+    to_sun = sun - r
+    sun_distance = np.linalg.norm(to_sun, axis=-1)
+    earth_distance = np.linalg.norm(r, axis=-1)
+    sun_radius = np.arcsin(np.minimum(SUN_RADIUS_KM / sun_distance, 1.0))
+    earth_radius = np.arcsin(np.minimum(EARTH_RADIUS_KM / earth_distance, 1.0))
+    cos_separation = -np.sum(r * to_sun, axis=-1) / (earth_distance * sun_distance)
+    separation = np.arccos(np.clip(cos_separation, -1.0, 1.0))
+    return sun_radius, earth_radius, separation
+
+
+def shadow(r, sun):
+    '''
+    Shadow of the Earth on satellites
+
+    Input : [positions [km] (..., 3), Sun positions in the same frame, broadcastable]
+    Ouput : SUNLIT, PENUMBRA or UMBRA (int8 array)
+    '''
+    sun_radius, earth_radius, separation = _disc_angles(r, sun)
+    states = np.full(separation.shape, SUNLIT, dtype=np.int8)
+    states[separation < earth_radius + sun_radius] = PENUMBRA
+    states[separation <= earth_radius - sun_radius] = UMBRA
+    return states
+
+
+def umbra_margin(r, sun):
+    '''
+    Angle by which the satellites are out of the umbra, continuous across its edge
+
+    Input : [positions [km] (..., 3), Sun positions in the same frame, broadcastable]
+    Ouput : angle [deg], positive outside the umbra
+    '''
+    sun_radius, earth_radius, separation = _disc_angles(r, sun)
+    return np.degrees(separation - earth_radius + sun_radius)